@@ -0,0 +1,143 @@
+"""
+Replays low, medium and bursty request traces against a simulated `@serve.batch` replica
+and compares the static BlipService settings (4 items, 1s wait) with AdaptiveBatchController.
+
+Service time is modelled as `fixed + per_item * batch_size`; pass measured values for
+the target hardware (defaults are in the range of BLIP VQA on a few CPU cores).
+
+    python -m benchmarks.adaptive_batching --slo-ms 1000 --fixed-ms 120 --per-item-ms 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from deployments.adaptive_batching import AdaptiveBatchController
+
+
+def poisson_trace(rate: float, duration_s: float, start_s: float = 0.0, rng=None):
+    rng = rng or random.Random(0)
+    arrivals, now = [], start_s
+    while True:
+        now += rng.expovariate(rate)
+        if now >= start_s + duration_s:
+            return arrivals
+        arrivals.append(now)
+
+
+def bursty_trace(duration_s: float, burst_rate: float, idle_rate: float, burst_s: float = 2.0, idle_s: float = 3.0):
+    rng = random.Random(0)
+    arrivals, start = [], 0.0
+    while start < duration_s:
+        arrivals += poisson_trace(burst_rate, burst_s, start, rng)
+        arrivals += poisson_trace(idle_rate, idle_s, start + burst_s, rng)
+        start += burst_s + idle_s
+    return [t for t in arrivals if t < duration_s]
+
+
+class SimulatedReplica:
+    """Mimics serve.batch: the first queued request opens a batch that closes when full or on timeout."""
+
+    def __init__(self, fixed_s: float, per_item_s: float, max_batch_size: int, wait_timeout_s: float, controller=None):
+        self.fixed_s = fixed_s
+        self.per_item_s = per_item_s
+        self.max_batch_size = max_batch_size
+        self.wait_timeout_s = wait_timeout_s
+        self.controller = controller
+        self.queue = asyncio.Queue()
+        self.batch_sizes = []
+
+    async def submit(self) -> float:
+        start = time.perf_counter()
+        done = asyncio.get_running_loop().create_future()
+        if self.controller is not None:
+            self.controller.record_arrival()
+        await self.queue.put(done)
+        await done
+        return time.perf_counter() - start
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.perf_counter() + self.wait_timeout_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            service_time_s = self.fixed_s + self.per_item_s * len(batch)
+            await asyncio.sleep(service_time_s)
+            self.batch_sizes.append(len(batch))
+            for done in batch:
+                done.set_result(None)
+            if self.controller is not None:
+                self.max_batch_size, self.wait_timeout_s = self.controller.record_batch(
+                    len(batch), service_time_s, self.queue.qsize()
+                )
+
+
+async def replay(trace, replica: SimulatedReplica) -> dict:
+    worker = asyncio.create_task(replica.run())
+    start = time.perf_counter()
+
+    async def fire(at: float):
+        await asyncio.sleep(max(at - (time.perf_counter() - start), 0))
+        return await replica.submit()
+
+    latencies = sorted(await asyncio.gather(*(fire(at) for at in trace)))
+    elapsed = time.perf_counter() - start
+    worker.cancel()
+
+    def percentile(p):
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_batch_size": statistics.mean(replica.batch_sizes),
+        "final_max_batch_size": replica.max_batch_size,
+        "final_wait_timeout_s": replica.wait_timeout_s,
+    }
+
+
+async def main_async(args):
+    fixed_s, per_item_s = args.fixed_ms / 1000, args.per_item_ms / 1000
+    traces = {
+        "low": poisson_trace(args.low_rps, args.duration_s),
+        "medium": poisson_trace(args.medium_rps, args.duration_s),
+        "bursty": bursty_trace(args.duration_s, burst_rate=args.burst_rps, idle_rate=args.low_rps),
+    }
+    for name, trace in traces.items():
+        static = SimulatedReplica(fixed_s, per_item_s, max_batch_size=4, wait_timeout_s=1.0)
+        controller = AdaptiveBatchController(latency_slo_s=args.slo_ms / 1000, max_batch_size=args.max_batch_size)
+        adaptive = SimulatedReplica(
+            fixed_s, per_item_s, controller.batch_size, controller.wait_timeout_s, controller=controller
+        )
+        for policy, replica in (("static", static), ("adaptive", adaptive)):
+            result = await replay(trace, replica)
+            print(json.dumps({"load": name, "policy": policy, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slo-ms", type=float, default=1000)
+    parser.add_argument("--fixed-ms", type=float, default=120, help="Per-batch overhead")
+    parser.add_argument("--per-item-ms", type=float, default=60, help="Incremental cost per batch item")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--duration-s", type=float, default=20)
+    parser.add_argument("--low-rps", type=float, default=1)
+    parser.add_argument("--medium-rps", type=float, default=8)
+    parser.add_argument("--burst-rps", type=float, default=20)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Messages sent per alert by `deployments/alerts.py` on a simulated camera fleet, against the
+naive policy of one message per alerting frame. Incidents last several frames and clients own
+several cameras, so cooldowns and per-client grouping should send far fewer messages. Runs on
+simulated time with a local stub notifier that fails a fraction of sends to exercise retries.
+
+    python -m benchmarks.alert_dispatch --clients 20 --cameras-per-client 8 --minutes 60
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from deployments.alerts import AlertDispatcher, AlertPolicy, AlertRule, Notifier
+
+
+class StubNotifier(Notifier):
+    def __init__(self, failure_rate: float, rng: random.Random):
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.messages = []
+
+    async def send(self, client_id, alerts, text):
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("stub send failure")
+        self.messages.append((client_id, len(alerts)))
+
+
+def simulate_frames(args, rng: random.Random):
+    """Yield (time, client, camera, alert) every frame; incidents start at random and last a while."""
+    incident_until = {}
+    for step in range(int(args.minutes * 60 / args.frame_interval_s)):
+        now = step * args.frame_interval_s
+        for client in range(args.clients):
+            for camera in range(args.cameras_per_client):
+                key = (f"client-{client}", f"cam-{camera}")
+                if incident_until.get(key, -1) < now and rng.random() < args.incident_rate:
+                    incident_until[key] = now + rng.expovariate(1 / args.incident_s)
+                if incident_until.get(key, -1) >= now:
+                    alert = {"severity": rng.choice(["medium", "high"]), "labels": ["person"], "description": "intruder"}
+                else:
+                    alert = {"severity": "none", "labels": [], "description": "all clear"}
+                yield now, key[0], key[1], alert
+
+
+async def run(args, cooldown_s: float, flush_interval_s: float) -> dict:
+    rng = random.Random(args.seed)
+    notifier = StubNotifier(args.failure_rate, rng)
+    policy = AlertPolicy([AlertRule("intrusion", min_severity="medium", cooldown_s=cooldown_s)])
+    # Flushed on simulated time below, so the background flush effectively never runs
+    dispatcher = AlertDispatcher(policy, notifier, flush_interval_s=1e9, queue_size=args.queue_size,
+                                 max_retries=args.max_retries, retry_backoff_s=0.0)
+    next_flush = flush_interval_s
+    for now, client_id, camera_id, alert in simulate_frames(args, rng):
+        while now >= next_flush:
+            await dispatcher.flush()
+            next_flush += flush_interval_s
+        dispatcher.submit(client_id, camera_id, alert, now=now)
+    await dispatcher.close()
+    return dispatcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--cameras-per-client", type=int, default=8)
+    parser.add_argument("--minutes", type=float, default=60.0)
+    parser.add_argument("--frame-interval-s", type=float, default=5.0)
+    parser.add_argument("--incident-rate", type=float, default=0.002, help="Chance per frame that an incident starts")
+    parser.add_argument("--incident-s", type=float, default=60.0, help="Mean incident duration")
+    parser.add_argument("--cooldown-s", type=float, default=300.0)
+    parser.add_argument("--flush-interval-s", type=float, default=10.0)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    naive = asyncio.run(run(args, cooldown_s=0.0, flush_interval_s=args.frame_interval_s / 2))
+    # Naive sends one message per alerting frame: no cooldown and no grouping across cameras
+    naive_messages = naive["alerts"]
+    dispatched = asyncio.run(run(args, cooldown_s=args.cooldown_s, flush_interval_s=args.flush_interval_s))
+    print(json.dumps({"policy": "one message per alerting frame", "messages": naive_messages,
+                      "alerting_frames": naive["alerts"]}))
+    print(json.dumps({"policy": "cooldown + per-client grouping", **dispatched}))
+    print(json.dumps({"message_reduction": naive_messages / max(dispatched["messages_sent"], 1)}))
+
+
+if __name__ == "__main__":
+    main()
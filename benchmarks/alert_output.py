@@ -0,0 +1,92 @@
+"""
+Output-token and parse-failure comparison between free-form prompting and the schema-constrained
+`output_mode="alert"` of a running deployment.
+
+    python -m benchmarks.alert_output --url http://127.0.0.1:8000 --api infer --repeats 3
+    python -m benchmarks.alert_output --url http://127.0.0.1:8000 --api vllm --repeats 3
+"""
+import argparse
+import base64
+import glob
+import json
+import statistics
+
+import httpx
+
+from deployments.alert_output import parse_alert
+
+FREE_FORM_SUFFIX = (
+    " Report the severity (none, low, medium or high), up to five labels and a short description as JSON."
+)
+
+
+def build_payload(api: str, image_b64: str, question: str, output_mode: str) -> dict:
+    if output_mode == "text":
+        question = question + FREE_FORM_SUFFIX
+    if api == "vllm":
+        return {"prompt": question, "image": image_b64, "output_mode": output_mode, "temperature": 0.0}
+    return {"question": question, "base64_image": image_b64, "output_mode": output_mode, "sampling": False}
+
+
+def read_result(api: str, body: dict):
+    """Return (text, output_tokens) from either response shape."""
+    if api == "vllm":
+        return body["text"][0], body.get("output_tokens")
+    return body["prediction"], body.get("output_tokens")
+
+
+def run_mode(client: httpx.Client, api: str, images, question: str, output_mode: str, repeats: int) -> dict:
+    output_tokens, failures, errors = [], 0, 0
+    for _ in range(repeats):
+        for image_b64 in images:
+            response = client.post("/infer", json=build_payload(api, image_b64, question, output_mode))
+            if response.status_code != 200:
+                errors += 1
+                continue
+            text, tokens = read_result(api, response.json())
+            if tokens is not None:
+                output_tokens.append(tokens)
+            # Parse both modes the same way so the failure rates are comparable
+            _, parse_error = parse_alert(text)
+            if parse_error is not None:
+                failures += 1
+    completed = repeats * len(images) - errors
+    return {
+        "output_mode": output_mode,
+        "requests": completed,
+        "errors": errors,
+        "mean_output_tokens": statistics.mean(output_tokens) if output_tokens else None,
+        "max_output_tokens": max(output_tokens) if output_tokens else None,
+        "parse_failure_rate": failures / completed if completed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--api", choices=["infer", "vllm"], default="infer",
+                        help="`infer` for the FastAPI deployments, `vllm` for the Ray vLLM deployment")
+    parser.add_argument("--images-glob", default="images/*.png")
+    parser.add_argument("--question", default="Is anything suspicious happening around the car?")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    images = []
+    for path in sorted(glob.glob(args.images_glob)):
+        with open(path, "rb") as f:
+            images.append(base64.b64encode(f.read()).decode("utf-8"))
+    if not images:
+        raise FileNotFoundError(f"No images match {args.images_glob}")
+
+    with httpx.Client(base_url=args.url, timeout=300.0) as client:
+        results = [run_mode(client, args.api, images, args.question, mode, args.repeats) for mode in ("text", "alert")]
+
+    free_form, alert = results
+    if free_form["mean_output_tokens"] and alert["mean_output_tokens"]:
+        saving = 1 - alert["mean_output_tokens"] / free_form["mean_output_tokens"]
+        results.append({"output_token_saving": saving})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
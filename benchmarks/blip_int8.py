@@ -0,0 +1,113 @@
+"""
+Accuracy, latency and memory of BLIP VQA in fp32 against dynamic int8 on CPU, over a small
+fixed question set built from the images in `images/`. Each mode runs in a fresh process.
+
+    python -m benchmarks.blip_int8 --model Salesforce/blip-vqa-base --repeats 3
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import psutil
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+# (image, question, accepted answers)
+VQA_SET = [
+    ("2 cars.png", "is it night?", ["yes"]),
+    ("2 cars.png", "is the photo black and white?", ["yes"]),
+    ("car stolen.png", "is it daytime?", ["yes"]),
+    ("car stolen.png", "what color is the grass?", ["green"]),
+    ("car stolen.png", "is there a person?", ["yes"]),
+    ("open driver.png", "is the car door open?", ["yes"]),
+    ("open driver.png", "is there a person?", ["yes"]),
+    ("open driver.png", "is it night?", ["yes"]),
+    ("open the car.png", "is there a man?", ["yes"]),
+    ("open the car.png", "is the photo black and white?", ["yes"]),
+    ("person comming.png", "is there a person?", ["yes"]),
+    ("person comming.png", "is it night?", ["yes"]),
+    ("person comming.png", "is the car door open?", ["no"]),
+]
+
+
+def measure(mode: str, model_name: str, repeats: int) -> dict:
+    """Runs inside the child process."""
+    import torch
+    from PIL import Image
+    from transformers import BlipForQuestionAnswering, BlipProcessor
+
+    from deployments.model_cache import load_model, load_processor
+    from deployments.quantization import apply_quantization
+
+    torch.set_grad_enabled(False)
+    rss_before = psutil.Process().memory_info().rss
+    processor = load_processor(BlipProcessor, model_name)
+    model = apply_quantization(load_model(BlipForQuestionAnswering, model_name), mode)
+    rss_loaded = psutil.Process().memory_info().rss
+
+    answers, latencies = [], []
+    for image_name, question, _ in VQA_SET:
+        image = Image.open(os.path.join(IMAGES_DIR, image_name)).convert("RGB")
+        inputs = processor(image, question, return_tensors="pt")
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = model.generate(**inputs)
+            timings.append(time.perf_counter() - start)
+        answers.append(processor.decode(output[0], skip_special_tokens=True).strip().lower())
+        latencies.append(statistics.median(timings))
+
+    return {
+        "mode": mode,
+        "answers": answers,
+        "latency_ms_mean": statistics.mean(latencies) * 1000,
+        "latency_ms_p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+        "model_rss_mb": (rss_loaded - rss_before) / 2**20,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Salesforce/blip-vqa-base")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed generations per question")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model, args.repeats)))
+        return
+
+    results = {}
+    for mode in ("none", "int8"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.blip_int8", "--model", args.model,
+             "--repeats", str(args.repeats), "--child", mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    expected = [accepted for _, _, accepted in VQA_SET]
+    for result in results.values():
+        answers = result.pop("answers")
+        result["accuracy"] = sum(a in ok for a, ok in zip(answers, expected)) / len(VQA_SET)
+        result["_answers"] = answers
+    fp32_answers, int8_answers = results["none"].pop("_answers"), results["int8"].pop("_answers")
+    agreement = sum(a == b for a, b in zip(fp32_answers, int8_answers)) / len(VQA_SET)
+
+    for result in results.values():
+        print(json.dumps(result))
+    print(json.dumps({"int8_fp32_agreement": agreement, "questions": len(VQA_SET)}))
+    for (image_name, question, _), a, b in zip(VQA_SET, fp32_answers, int8_answers):
+        if a != b:
+            print(f"  differs: {image_name!r} {question!r}: fp32={a!r} int8={b!r}")
+
+
+if __name__ == "__main__":
+    main()
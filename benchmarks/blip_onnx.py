@@ -0,0 +1,76 @@
+"""
+Parity and speed of the ONNX Runtime BLIP backend against PyTorch on the sample images.
+
+    python -m deployments.models.blip.onnx_export --model Salesforce/blip-vqa-base --output /tmp/blip-onnx
+    python -m benchmarks.blip_onnx --model Salesforce/blip-vqa-base --onnx-dir /tmp/blip-onnx
+"""
+import argparse
+import glob
+import json
+import statistics
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+from transformers import BlipForQuestionAnswering, BlipProcessor
+
+from deployments.models.blip.onnx_backend import BlipOnnxGenerator
+
+
+def time_generate(generate, inputs, repeats: int):
+    output = generate(**inputs)  # Warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = generate(**inputs)
+        timings.append(time.perf_counter() - start)
+    return np.asarray(output), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Salesforce/blip-vqa-base")
+    parser.add_argument("--onnx-dir", required=True)
+    parser.add_argument("--images-glob", default="images/*.png")
+    parser.add_argument("--question", default="is there a person?")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    processor = BlipProcessor.from_pretrained(args.model)
+    backends = {
+        "torch": BlipForQuestionAnswering.from_pretrained(args.model).eval().generate,
+        "onnx": BlipOnnxGenerator(args.onnx_dir).generate,
+    }
+
+    rows, latencies = [], {name: [] for name in backends}
+    for path in sorted(glob.glob(args.images_glob)):
+        inputs = processor(Image.open(path).convert("RGB"), args.question, return_tensors="pt")
+        outputs = {}
+        for name, generate in backends.items():
+            outputs[name], latency = time_generate(generate, inputs, args.repeats)
+            latencies[name].append(latency)
+        rows.append({
+            "image": path,
+            "torch": processor.decode(outputs["torch"][0], skip_special_tokens=True),
+            "onnx": processor.decode(outputs["onnx"][0], skip_special_tokens=True),
+            "same_tokens": outputs["torch"].tolist() == outputs["onnx"].tolist(),
+            "torch_ms": latencies["torch"][-1] * 1000,
+            "onnx_ms": latencies["onnx"][-1] * 1000,
+        })
+
+    for row in rows:
+        print(json.dumps(row))
+    torch_ms = statistics.mean(latencies["torch"]) * 1000
+    onnx_ms = statistics.mean(latencies["onnx"]) * 1000
+    print(json.dumps({
+        "parity": all(row["same_tokens"] for row in rows),
+        "torch_ms_mean": torch_ms,
+        "onnx_ms_mean": onnx_ms,
+        "speedup": torch_ms / onnx_ms,
+    }))
+
+
+if __name__ == "__main__":
+    main()
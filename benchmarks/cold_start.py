@@ -0,0 +1,80 @@
+"""
+Load time and peak RSS of BLIP on CPU: `from_pretrained` against the prepared local cache.
+Each mode runs in a fresh process so peak RSS is not shared between them.
+
+    python -m deployments.model_cache prepare Salesforce/blip-vqa-base
+    python -m benchmarks.cold_start --model Salesforce/blip-vqa-base
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import psutil
+
+
+def measure(mode: str, model_name: str, dtype: str) -> dict:
+    """Runs inside the child process."""
+    import torch
+    from transformers import BlipForQuestionAnswering
+
+    from deployments.model_cache import load_prepared, cache_path
+
+    start = time.perf_counter()
+    if mode == "from_pretrained":
+        model = BlipForQuestionAnswering.from_pretrained(model_name, torch_dtype=getattr(torch, dtype)).eval()
+    else:
+        model = load_prepared(BlipForQuestionAnswering, cache_path(model_name, dtype))
+    load_s = time.perf_counter() - start
+    after_load = psutil.Process().memory_full_info()
+
+    # One forward pass so lazily mapped pages are actually touched
+    with torch.no_grad():
+        pixel_values = torch.zeros(1, 3, 384, 384, dtype=getattr(torch, dtype))
+        input_ids = torch.tensor([[101, 2003, 2045, 1037, 2711, 102]])
+        start = time.perf_counter()
+        output = model.generate(pixel_values=pixel_values, input_ids=input_ids, max_new_tokens=5)
+        first_inference_s = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "load_s": load_s,
+        "first_inference_s": first_inference_s,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        # Private memory can't be shared between replicas; mapped weights show up as shared instead
+        "private_mb_after_load": after_load.uss / 2**20,
+        "shared_mb_after_load": after_load.shared / 2**20,
+        "output_ids": output[0].tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Salesforce/blip-vqa-base")
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model, args.dtype)))
+        return
+
+    results = []
+    for mode in ("from_pretrained", "local_cache"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--model", args.model, "--dtype", args.dtype, "--child", mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    same_output = results[0].pop("output_ids") == results[1].pop("output_ids")
+    for result in results:
+        print(json.dumps(result))
+    print(json.dumps({"same_output": same_output}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Payload size, estimated image tokens and encode time of `demo_ui/frame_encoder.py` targets
+against the demo's old encoding (full resolution at OpenCV's default JPEG quality), over the
+sample images and sampled video frames.
+
+    python -m benchmarks.frame_encoding --video-every-n 30 --video-max-frames 40
+"""
+import argparse
+import json
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import load_image_frames, load_video_frames
+from demo_ui.frame_encoder import EncodeTarget, encode_frame, estimate_image_tokens
+
+TARGETS = {
+    "long side 1024": EncodeTarget(max_long_side=1024),
+    "max 100 KB": EncodeTarget(max_bytes=100_000),
+    "max 2 tiles": EncodeTarget(max_tiles=2),
+    "max 2 tiles, 60 KB": EncodeTarget(max_tiles=2, max_bytes=60_000),
+    "low detail": EncodeTarget(max_tiles=0),
+    "low detail, IR auto-gray": EncodeTarget(max_tiles=0, grayscale="auto"),
+}
+
+
+def baseline(frame: np.ndarray) -> dict:
+    start = time.perf_counter()
+    ok, buffer = cv2.imencode(".jpg", frame)
+    encode_ms = (time.perf_counter() - start) * 1000
+    height, width = frame.shape[:2]
+    return {"bytes": len(buffer), "tokens": estimate_image_tokens(width, height), "encode_ms": encode_ms}
+
+
+def summarize(name: str, rows: list) -> dict:
+    return {
+        "target": name,
+        "frames": len(rows),
+        "bytes_mean": statistics.mean(row["bytes"] for row in rows),
+        "bytes_max": max(row["bytes"] for row in rows),
+        "base64_kb_mean": statistics.mean(row["bytes"] for row in rows) * 4 / 3 / 1024,
+        "tokens_mean": statistics.mean(row["tokens"] for row in rows),
+        "encode_ms_mean": statistics.mean(row["encode_ms"] for row in rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames-glob", default="images/*.png")
+    parser.add_argument("--videos-glob", default="videos/*.mp4")
+    parser.add_argument("--video-every-n", type=int, default=30)
+    parser.add_argument("--video-max-frames", type=int, default=40)
+    args = parser.parse_args()
+
+    # Decode once up front so only encoding is timed
+    encoded = load_image_frames(args.frames_glob) + load_video_frames(
+        args.videos_glob, args.video_every_n, args.video_max_frames
+    )
+    frames = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in encoded]
+
+    print(json.dumps(summarize("baseline (full size, default quality)", [baseline(frame) for frame in frames])))
+    for name, target in TARGETS.items():
+        rows = []
+        for frame in frames:
+            result = encode_frame(frame, target)
+            rows.append({"bytes": result.num_bytes, "tokens": result.image_tokens, "encode_ms": result.encode_ms})
+        print(json.dumps(summarize(name, rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Load-test harness for the FastAPI deployments in `deployments/models/`.
+
+Starts the chosen deployment locally (or targets `--url`), drives `/infer` with open-loop
+(fixed arrival rate) or closed-loop (fixed concurrency) load using frames from `images/` and
+`videos/`, and saves throughput, latency percentiles, error rate and server CPU/RSS as JSON.
+
+    python -m benchmarks.harness --deployment dummy --mode open --rps 50 --duration 30
+    python -m benchmarks.harness --deployment blip-tiny --mode closed --concurrency 4 --duration 30
+    python -m benchmarks.harness --compare benchmarks/results/*.json
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import psutil
+
+# name -> (ASGI app, extra environment). Tiny random checkpoints keep CPU runs fast.
+DEPLOYMENTS = {
+    "dummy": ("deployments.models.dummy.main:app", {}),
+    "blip": ("deployments.models.blip.main:app", {}),
+    "blip-tiny": (
+        "deployments.models.blip.main:app",
+        {"BLIP_MODEL_NAME": "hf-internal-testing/tiny-random-BlipForQuestionAnswering"},
+    ),
+    "minicpm-int4": ("deployments.models.MiniCPM-V-2_6-int4.main:app", {}),
+}
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def load_image_frames(pattern: str):
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def load_video_frames(pattern: str, every_n: int, max_frames: int):
+    """JPEG-encode every `every_n`-th frame of the matching videos, up to `max_frames` in total."""
+    import cv2
+
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        capture = cv2.VideoCapture(path)
+        index = 0
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if index % every_n == 0:
+                frames.append(cv2.imencode(".jpg", frame)[1].tobytes())
+            index += 1
+        capture.release()
+    return frames
+
+
+def percentile(ordered, fraction: float):
+    if not ordered:
+        return None
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of the server process (and its children) on a background thread."""
+
+    def __init__(self, pid: int, interval_s: float = 0.5):
+        self.process = psutil.Process(pid)
+        self.interval_s = interval_s
+        self.cpu_percent, self.rss_bytes = [], []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _processes(self):
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def _run(self):
+        for process in self._processes():
+            process.cpu_percent(None)  # The first call only sets the baseline
+        while not self._stop.wait(self.interval_s):
+            cpu, rss = 0.0, 0
+            for process in self._processes():
+                try:
+                    cpu += process.cpu_percent(None)
+                    rss += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu_percent.append(cpu)
+            self.rss_bytes.append(rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict:
+        return {
+            "cpu_percent_mean": sum(self.cpu_percent) / len(self.cpu_percent) if self.cpu_percent else None,
+            "cpu_percent_max": max(self.cpu_percent, default=None),
+            "rss_mb_max": max(self.rss_bytes) / 2**20 if self.rss_bytes else None,
+        }
+
+
+def start_server(deployment: str, port: int, startup_timeout_s: float, env_overrides: dict = None) -> subprocess.Popen:
+    app_path, extra_env = DEPLOYMENTS[deployment]
+    env = dict(os.environ, RESPONSE_CACHE_BACKEND="off", **extra_env, **(env_overrides or {}))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + startup_timeout_s
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Deployment '{deployment}' exited with code {server.returncode} during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health_check", timeout=1.0).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise TimeoutError(f"Deployment '{deployment}' was not healthy after {startup_timeout_s}s")
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies_s, self.errors = [], 0
+
+    def record(self, ok: bool, latency_s: float):
+        if ok:
+            self.latencies_s.append(latency_s)
+        else:
+            self.errors += 1
+
+
+async def send(client: httpx.AsyncClient, payload: bytes, result: LoadResult, start: float):
+    try:
+        response = await client.post("/infer", content=payload, headers={"Content-Type": "application/json"})
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    result.record(ok, time.perf_counter() - start)
+
+
+async def run_open_loop(client, payloads, rps: float, duration_s: float, poisson: bool) -> LoadResult:
+    """
+    Fixed arrival rate regardless of how fast the server answers. Latency is measured from the
+    scheduled send time, so queueing behind a slow server is counted instead of hidden.
+    """
+    result, tasks = LoadResult(), []
+    start = time.perf_counter()
+    next_send, index = start, 0
+    while next_send - start < duration_s:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(client, payloads[index % len(payloads)], result, next_send)))
+        index += 1
+        next_send += random.expovariate(rps) if poisson else 1.0 / rps
+    await asyncio.gather(*tasks)
+    return result
+
+
+async def run_closed_loop(client, payloads, concurrency: int, duration_s: float) -> LoadResult:
+    """`concurrency` clients each sending the next request as soon as the previous one returns."""
+    result = LoadResult()
+    deadline = time.perf_counter() + duration_s
+
+    async def worker(offset: int):
+        index = offset
+        while time.perf_counter() < deadline:
+            await send(client, payloads[index % len(payloads)], result, time.perf_counter())
+            index += concurrency
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return result
+
+
+async def drive(args, url: str, frames) -> dict:
+    payloads = [
+        json.dumps({"question": args.question, "base64_image": base64.b64encode(frame).decode("utf-8")}).encode()
+        for frame in frames
+    ]
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        # Warm up so model compilation and first-request allocations don't skew the run
+        for payload in payloads[:args.warmup]:
+            await send(client, payload, LoadResult(), time.perf_counter())
+        start = time.perf_counter()
+        if args.mode == "open":
+            result = await run_open_loop(client, payloads, args.rps, args.duration, args.poisson)
+        else:
+            result = await run_closed_loop(client, payloads, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+
+    ordered = sorted(result.latencies_s)
+    total = len(ordered) + result.errors
+    return {
+        "requests": total,
+        "errors": result.errors,
+        "error_rate": result.errors / total if total else None,
+        "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+        "p95_ms": percentile(ordered, 0.95) * 1000 if ordered else None,
+        "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+        "elapsed_s": elapsed,
+    }
+
+
+def run(args) -> dict:
+    frames = load_image_frames(args.frames_glob)
+    if args.videos_glob:
+        frames += load_video_frames(args.videos_glob, args.video_every_n, args.video_max_frames)
+    if not frames:
+        raise FileNotFoundError("No frames found; check --frames-glob / --videos-glob")
+
+    server = None
+    if args.url:
+        url, pid = args.url, None
+    else:
+        server = start_server(args.deployment, args.port, args.startup_timeout)
+        url, pid = f"http://127.0.0.1:{args.port}", server.pid
+    try:
+        if pid is not None:
+            with ResourceSampler(pid) as sampler:
+                summary = asyncio.run(drive(args, url, frames))
+            resources = sampler.summary()
+        else:
+            summary, resources = asyncio.run(drive(args, url, frames)), {}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "deployment": args.deployment if not args.url else args.url,
+        "mode": args.mode,
+        "config": {
+            "rps": args.rps if args.mode == "open" else None,
+            "poisson": args.poisson if args.mode == "open" else None,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "batch_size": args.batch_size,
+            "duration_s": args.duration,
+            "frames": len(frames),
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": summary,
+        "resources": resources,
+    }
+
+
+def compare(paths):
+    columns = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+    print(f"{'run':40} {'mode':6} " + " ".join(f"{c:>14}" for c in columns + ["rss_mb_max"]))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        values = [report["summary"].get(c) for c in columns] + [report["resources"].get("rss_mb_max")]
+        cells = " ".join(f"{v:>14.2f}" if isinstance(v, (int, float)) else f"{'-':>14}" for v in values)
+        print(f"{os.path.basename(path)[:40]:40} {report['mode']:6} {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployment", choices=sorted(DEPLOYMENTS), default="dummy")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--rps", type=float, default=10.0, help="Open loop: arrival rate")
+    parser.add_argument("--poisson", action="store_true", help="Open loop: exponential inter-arrival times")
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed loop: concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load after warm-up")
+    parser.add_argument("--warmup", type=int, default=3, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--frames-glob", default="images/*.png")
+    parser.add_argument("--videos-glob", default="", help="e.g. 'videos/*.mp4' to add sampled video frames")
+    parser.add_argument("--video-every-n", type=int, default=30)
+    parser.add_argument("--video-max-frames", type=int, default=50)
+    parser.add_argument("--question", default="Is there a person in the image?")
+    parser.add_argument("--batch-size", type=int, help="Server-side max batch size, recorded for pricing/capacity_planner.py")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<deployment>-<mode>-<time>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT", help="Print saved results side by side and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    report = run(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.deployment}-{args.mode}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Caller-side cost of a per-request log line with the handler setups `deployments/utils.py` can
+use: synchronous colored stream handler, queue-backed handler (formatting on the listener
+thread), JSON, and a per-call-site rate limit. Output goes to a file so the terminal isn't timed.
+
+    python -m benchmarks.logging_overhead --records 20000
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from colorlog import ColoredFormatter
+
+from deployments.structured_logging import JsonFormatter, RateLimitFilter, install_queue_handler
+
+COLOR_FORMAT = "%(log_color)s%(levelname)-8s%(reset)s %(message)s [%(module)s/%(funcName)s/line %(lineno)d]"
+
+
+def build_logger(name: str, path: str, formatter, queued: bool, rate_limit: float) -> logging.Logger:
+    logger = logging.getLogger(f"logging_overhead.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(formatter)
+    log_filter = RateLimitFilter(rate=rate_limit) if rate_limit else None
+    if queued:
+        install_queue_handler(logger, handler, queue_size=1_000_000, log_filter=log_filter)
+    else:
+        if log_filter is not None:
+            handler.addFilter(log_filter)
+        logger.addHandler(handler)
+    return logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    answers = ["a person is standing near the red car"] * 8
+    setups = {
+        "sync color f-string": (ColoredFormatter(COLOR_FORMAT), False, 0.0, True),
+        "sync color lazy": (ColoredFormatter(COLOR_FORMAT), False, 0.0, False),
+        "queued color lazy": (ColoredFormatter(COLOR_FORMAT), True, 0.0, False),
+        "queued json lazy": (JsonFormatter(), True, 0.0, False),
+        "queued json lazy, 10/s per call site": (JsonFormatter(), True, 10.0, False),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (formatter, queued, rate_limit, eager) in setups.items():
+            path = os.path.join(directory, f"{len(os.listdir(directory))}.log")
+            logger = build_logger(name, path, formatter, queued, rate_limit)
+            start = time.perf_counter()
+            for index in range(args.records):
+                if eager:
+                    logger.info(f"Batch {index} processed with answers: {answers}")
+                else:
+                    logger.info("Batch %d processed with answers: %s", index, answers)
+            caller_us = (time.perf_counter() - start) / args.records * 1e6
+            for handler in logger.handlers:
+                handler.flush()
+            print(json.dumps({"setup": name, "caller_us_per_record": round(caller_us, 2)}))
+
+
+if __name__ == "__main__":
+    main()
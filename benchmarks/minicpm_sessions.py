@@ -0,0 +1,81 @@
+"""
+Follow-up latency of a session turn (KV cache reused) against a stateless call that resends
+the image and the whole conversation, on a running MiniCPM-V-2_6-int4 deployment.
+
+    python -m benchmarks.minicpm_sessions --url http://127.0.0.1:8000
+"""
+import argparse
+import base64
+import glob
+import json
+import statistics
+import time
+
+import httpx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--images-glob", default="images/*.png")
+    parser.add_argument("--question", default="Is there a person in the image?")
+    parser.add_argument("--follow-up", default="Are they holding a tool?")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    rows = []
+    with httpx.Client(base_url=args.url, timeout=300.0) as client:
+        for path in sorted(glob.glob(args.images_glob)):
+            with open(path, "rb") as f:
+                image_b64 = base64.b64encode(f.read()).decode("utf-8")
+            generation = {"sampling": False, "max_new_tokens": args.max_new_tokens}
+
+            first = client.post("/sessions", json={"question": args.question, "base64_image": image_b64, **generation})
+            first.raise_for_status()
+            first = first.json()
+            turn = client.post(
+                f"/sessions/{first['session_id']}/turns", json={"question": args.follow_up, **generation}
+            )
+            turn.raise_for_status()
+            turn = turn.json()
+            client.delete(f"/sessions/{first['session_id']}")
+
+            # Stateless follow-up: the image and the first exchange are encoded again
+            messages = [
+                {"role": "user", "content": [
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}},
+                    {"type": "text", "text": args.question},
+                ]},
+                {"role": "assistant", "content": first["prediction"]},
+                {"role": "user", "content": args.follow_up},
+            ]
+            start = time.perf_counter()
+            stateless = client.post(
+                "/v1/chat/completions",
+                json={"messages": messages, "temperature": 0, "max_tokens": args.max_new_tokens},
+            )
+            stateless.raise_for_status()
+            stateless_s = time.perf_counter() - start
+
+            rows.append({
+                "image": path,
+                "first_turn_s": first["latency_s"],
+                "session_follow_up_s": turn["latency_s"],
+                "stateless_follow_up_s": stateless_s,
+                "follow_up_prefill_tokens": turn["prefill_tokens"],
+                "follow_up_cached_tokens": turn["cached_tokens"],
+            })
+
+    for row in rows:
+        print(json.dumps(row))
+    session_s = statistics.mean(row["session_follow_up_s"] for row in rows)
+    stateless_s = statistics.mean(row["stateless_follow_up_s"] for row in rows)
+    print(json.dumps({
+        "session_follow_up_s_mean": session_s,
+        "stateless_follow_up_s_mean": stateless_s,
+        "speedup": stateless_s / session_s,
+    }))
+
+
+if __name__ == "__main__":
+    main()
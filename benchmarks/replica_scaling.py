@@ -0,0 +1,87 @@
+"""
+Aggregate throughput with 1, 2 and 4 replicas of a deployment on one node. The node's cores
+are split evenly between replicas (`CPU_AFFINITY` + `TORCH_NUM_THREADS`), or left unpinned with
+`--no-pin` to reproduce the oversubscribed baseline.
+
+    python -m benchmarks.replica_scaling --deployment blip-tiny --replicas 1 2 4 --duration 30
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+import httpx
+
+from benchmarks.harness import DEPLOYMENTS, LoadResult, load_image_frames, percentile, send, start_server
+from deployments.runtime_profile import available_cpus
+
+
+def replica_env(index: int, replicas: int, cores: list, pin: bool) -> dict:
+    if not pin:
+        return {}
+    per_replica = max(len(cores) // replicas, 1)
+    own = cores[index * per_replica:(index + 1) * per_replica] or cores[-per_replica:]
+    return {"CPU_AFFINITY": ",".join(map(str, own)), "TORCH_NUM_THREADS": str(len(own))}
+
+
+async def drive(urls, payloads, concurrency_per_replica: int, duration_s: float) -> dict:
+    result = LoadResult()
+    deadline = time.perf_counter() + duration_s
+    clients = [httpx.AsyncClient(base_url=url, timeout=120.0) for url in urls]
+
+    async def worker(client, offset: int):
+        index = offset
+        while time.perf_counter() < deadline:
+            await send(client, payloads[index % len(payloads)], result, time.perf_counter())
+            index += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(c, i) for c in clients for i in range(concurrency_per_replica)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.aclose()
+
+    ordered = sorted(result.latencies_s)
+    return {
+        "throughput_rps": len(ordered) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+        "p95_ms": percentile(ordered, 0.95) * 1000 if ordered else None,
+        "errors": result.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployment", choices=sorted(DEPLOYMENTS), default="blip-tiny")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency-per-replica", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--no-pin", action="store_true", help="Don't split cores between replicas")
+    parser.add_argument("--frames-glob", default="images/*.png")
+    parser.add_argument("--question", default="Is there a person in the image?")
+    args = parser.parse_args()
+
+    payloads = [
+        json.dumps({"question": args.question, "base64_image": base64.b64encode(frame).decode("utf-8")}).encode()
+        for frame in load_image_frames(args.frames_glob)
+    ]
+    cores = list(range(available_cpus()))
+    for replicas in args.replicas:
+        servers = []
+        try:
+            for index in range(replicas):
+                env = replica_env(index, replicas, cores, not args.no_pin)
+                servers.append(start_server(args.deployment, args.base_port + index, 300.0, env))
+            urls = [f"http://127.0.0.1:{args.base_port + index}" for index in range(replicas)]
+            summary = asyncio.run(drive(urls, payloads, args.concurrency_per_replica, args.duration))
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait(timeout=30)
+        print(json.dumps({"replicas": replicas, "pinned": not args.no_pin, "cores": len(cores), **summary}))
+
+
+if __name__ == "__main__":
+    main()
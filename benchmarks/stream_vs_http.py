@@ -0,0 +1,121 @@
+"""
+Throughput comparison between per-frame HTTP `/infer` calls and the pipelined `/ws/infer`
+frame stream of a running deployment.
+
+    python -m benchmarks.stream_vs_http --url http://127.0.0.1:8000 --frames 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import statistics
+import time
+
+import httpx
+
+from deployments.streaming import FrameStreamClient, FRAME_HEADER
+
+
+def load_frames(pattern: str):
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    if not frames:
+        raise FileNotFoundError(f"No frames match {pattern}")
+    return frames
+
+
+def summarize(name: str, latencies_s, errors: int, elapsed_s: float, bytes_per_frame: float) -> dict:
+    ordered = sorted(latencies_s)
+    return {
+        "transport": name,
+        "frames": len(latencies_s) + errors,
+        "errors": errors,
+        "throughput_fps": len(latencies_s) / elapsed_s if elapsed_s else 0.0,
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else None,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000 if ordered else None,
+        "request_bytes_per_frame": bytes_per_frame,
+    }
+
+
+async def run_http(url: str, frames, num_frames: int, concurrency: int, question: str) -> dict:
+    payloads = [
+        json.dumps({"question": question, "base64_image": base64.b64encode(frame).decode("utf-8")})
+        for frame in frames
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+        async def one(index: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/infer", content=payloads[index % len(payloads)], headers={"Content-Type": "application/json"}
+                )
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_frames)))
+        elapsed = time.perf_counter() - start
+
+    bytes_per_frame = statistics.mean(len(p) for p in payloads)
+    return summarize("http", latencies, errors, elapsed, bytes_per_frame)
+
+
+async def run_stream(url: str, frames, num_frames: int, question: str, rate: float = 0.0) -> dict:
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://") + "/ws/infer"
+    sent_at, latencies, errors = {}, [], 0
+
+    async with FrameStreamClient(ws_url) as client:
+        async def sender():
+            for seq in range(num_frames):
+                sent_at[seq] = time.perf_counter()
+                await client.send(seq, question, frames[seq % len(frames)])
+                if rate > 0:
+                    await asyncio.sleep(1.0 / rate)
+
+        start = time.perf_counter()
+        send_task = asyncio.create_task(sender())
+        for _ in range(num_frames):
+            result = await client.receive()
+            if result["error"] is None:
+                latencies.append(time.perf_counter() - sent_at[result["seq"]])
+            else:
+                errors += 1
+        elapsed = time.perf_counter() - start
+        await send_task
+
+    bytes_per_frame = FRAME_HEADER.size + len(question.encode("utf-8")) + statistics.mean(len(f) for f in frames)
+    return summarize("websocket", latencies, errors, elapsed, bytes_per_frame)
+
+
+async def main_async(args):
+    frames = load_frames(args.frames_glob)
+    results = [
+        await run_http(args.url, frames, args.frames, args.concurrency, args.question),
+        await run_stream(args.url, frames, args.frames, args.question, args.rate),
+    ]
+    for result in results:
+        print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames to send per transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="In-flight HTTP requests")
+    parser.add_argument("--rate", type=float, default=0.0, help="Stream send rate in frames/s, 0 sends unpaced")
+    parser.add_argument("--frames-glob", default="images/*.png")
+    parser.add_argument("--question", default="Is there a person in the image?")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
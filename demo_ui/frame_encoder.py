@@ -0,0 +1,174 @@
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# OpenAI image token accounting: a flat base per image plus a price per 512px tile in high detail.
+BASE_IMAGE_TOKENS = 85
+TILE_TOKENS = 170
+TILE_SIDE = 512
+LOW_DETAIL_SIDE = 512
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high",
+                          base_tokens: int = BASE_IMAGE_TOKENS, tile_tokens: int = TILE_TOKENS) -> int:
+    """Tokens an image costs after the API's own resizing (fit in 2048x2048, shortest side to 768)."""
+    if detail == "low":
+        return base_tokens
+    return base_tokens + tile_tokens * count_tiles(width, height)
+
+
+def count_tiles(width: int, height: int) -> int:
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return math.ceil(width / TILE_SIDE) * math.ceil(height / TILE_SIDE)
+
+
+def is_infrared(frame: np.ndarray, tolerance: float = 4.0) -> bool:
+    """IR night frames come out as three near-identical channels."""
+    if frame.ndim == 2:
+        return True
+    sample = frame[::8, ::8].astype(np.int16)
+    return float(np.abs(sample[..., 0] - sample[..., 1]).mean() + np.abs(sample[..., 1] - sample[..., 2]).mean()) < tolerance
+
+
+@dataclass
+class EncodeTarget:
+    """
+    What an encoded frame must fit. `max_tiles=0` means low detail (one 512px image at the flat
+    base price); `grayscale` is "off", "on" or "auto" (only frames that look infrared). With nothing
+    set, frames are encoded as before: full size at OpenCV's default quality of 95, no `detail` sent.
+    """
+
+    max_long_side: Optional[int] = None
+    max_bytes: Optional[int] = None
+    max_tiles: Optional[int] = None
+    grayscale: str = "off"
+    max_quality: int = 95
+    min_quality: int = 40
+
+    @classmethod
+    def from_env(cls) -> "EncodeTarget":
+        def optional_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        return cls(
+            max_long_side=optional_int("FRAME_MAX_LONG_SIDE"),
+            max_bytes=optional_int("FRAME_MAX_BYTES"),
+            max_tiles=optional_int("FRAME_MAX_TILES"),
+            grayscale=os.getenv("FRAME_GRAYSCALE", "off"),
+            max_quality=int(os.getenv("FRAME_MAX_QUALITY", "95")),
+        )
+
+    @property
+    def detail(self) -> Optional[str]:
+        """Image detail to request, or None to leave the API default when no tile budget is set."""
+        if self.max_tiles is None:
+            return None
+        return "low" if self.max_tiles == 0 else "high"
+
+
+@dataclass
+class EncodedFrame:
+    data: bytes
+    width: int
+    height: int
+    quality: int
+    grayscale: bool
+    image_tokens: int
+    encode_ms: float
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.data)
+
+
+def to_bgr(image) -> np.ndarray:
+    """BGR (or single channel) array from a PIL image or an OpenCV frame."""
+    if isinstance(image, Image.Image):
+        return cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    if not isinstance(image, np.ndarray):
+        raise TypeError("Input must be a NumPy array or PIL image.")
+    return image
+
+
+def _long_side_limit(width: int, height: int, target: EncodeTarget) -> int:
+    long_side = max(width, height)
+    if target.max_long_side:
+        long_side = min(long_side, target.max_long_side)
+    if target.max_tiles == 0:
+        long_side = min(long_side, LOW_DETAIL_SIDE)
+    elif target.max_tiles:
+        # Shrink until the API would cut the frame into at most max_tiles tiles
+        while long_side > TILE_SIDE and count_tiles(
+            round(width * long_side / max(width, height)), round(height * long_side / max(width, height))
+        ) > target.max_tiles:
+            long_side = int(long_side * 0.95)
+    return long_side
+
+
+def _jpeg(frame: np.ndarray, quality: int) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Image encoding to JPEG failed.")
+    return buffer.tobytes()
+
+
+def encode_frame(image, target: Optional[EncodeTarget] = None) -> EncodedFrame:
+    """
+    Resize and JPEG-encode a frame to fit `target`: the long side and tile budget fix the size,
+    then the highest quality under `max_bytes` is found by bisection, shrinking further only if
+    even `min_quality` is too large.
+    """
+    target = target or EncodeTarget()
+    start = time.perf_counter()
+    frame = to_bgr(image)
+
+    grayscale = target.grayscale == "on" or (target.grayscale == "auto" and is_infrared(frame))
+    if grayscale and frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    height, width = frame.shape[:2]
+    long_side = _long_side_limit(width, height, target)
+    while True:
+        scale = long_side / max(width, height)
+        resized = frame if scale >= 1 else cv2.resize(
+            frame, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_AREA
+        )
+        data, quality = _jpeg(resized, target.max_quality), target.max_quality
+        if target.max_bytes is None or len(data) <= target.max_bytes:
+            break
+        low, high = target.min_quality, target.max_quality - 1
+        best = None
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = _jpeg(resized, middle)
+            if len(candidate) <= target.max_bytes:
+                best, low = (candidate, middle), middle + 1
+            else:
+                high = middle - 1
+        if best is not None:
+            data, quality = best
+            break
+        if long_side <= 64:
+            break  # Can't get under max_bytes; return the smallest attempt
+        long_side = int(long_side * 0.8)
+
+    out_height, out_width = resized.shape[:2]
+    return EncodedFrame(
+        data=data,
+        width=out_width,
+        height=out_height,
+        quality=quality,
+        grayscale=grayscale,
+        image_tokens=estimate_image_tokens(out_width, out_height, target.detail),
+        encode_ms=(time.perf_counter() - start) * 1000,
+    )
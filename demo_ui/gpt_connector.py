@@ -1,9 +1,10 @@
-
-import cv2
 import base64
-import numpy as np
-from PIL import Image
-import openai
+
+from frame_encoder import EncodeTarget, encode_frame
+from llm_client import chat, image_message
+
+FRAME_TARGET = EncodeTarget.from_env()
+
 
 def encode_image_to_base(image) -> str:
     """
@@ -20,47 +21,10 @@ def encode_image_to_base(image) -> str:
         TypeError: If the input is not a NumPy array or PIL Image.
         ValueError: If the encoding fails.
     """
-    try:
-        # Check if the image is a PIL Image and convert to NumPy array
-        if isinstance(image, Image.Image):
-            image = np.array(image)
-
-        # Ensure the image is a NumPy array
-        if not isinstance(image, np.ndarray):
-            raise TypeError("Input must be a NumPy array or PIL image.")
-
-        # Encode the image to JPEG format
-        success, buffer = cv2.imencode(".jpg", image)
-        if not success:
-            raise ValueError("Image encoding to JPEG failed.")
-
-        # Convert the encoded image to base64
-        image_base64 = base64.b64encode(buffer).decode("utf-8")
-        return image_base64
-
-    except Exception as e:
-        raise
+    # Resized and compressed to FRAME_MAX_LONG_SIDE / FRAME_MAX_BYTES / FRAME_MAX_TILES when set
+    encoded = encode_frame(image, FRAME_TARGET)
+    return base64.b64encode(encoded.data).decode("utf-8")
 
 default_prompt = f"Please provide a very detailed explanation of what is visible in this image, including objects, context, and any notable details."
 def analyze_image_with_chatgpt(image_base64, prompt = default_prompt):
-    response = openai.chat.completions.create(
-    model="gpt-4o",
-    messages=[
-        {
-        "role": "user",
-        "content": [
-            {
-            "type": "text",
-            "text": prompt,
-            },
-            {
-            "type": "image_url",
-            "image_url": {
-                "url":  f"data:image/jpeg;base64,{image_base64}"
-            },
-            },
-        ],
-        }
-    ],
-    )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    return chat(image_message(prompt, image_base64, FRAME_TARGET.detail))
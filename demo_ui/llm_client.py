@@ -0,0 +1,248 @@
+import asyncio
+import functools
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Optional
+
+import httpx
+
+# Point VISION_API_BASE_URL at a self-hosted deployment (e.g. http://localhost:8000/v1) or at
+# stub_server.py to run the demo without the OpenAI API.
+VISION_API_BASE_URL = os.getenv("VISION_API_BASE_URL") or "https://api.openai.com/v1"
+VISION_MODEL = os.getenv("VISION_MODEL", "gpt-4o")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds from an OpenAI-style reset header (`"1s"`, `"6m0s"`, `"250ms"`) or a plain number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    if not value:
+        return None
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+
+def retry_delay(headers: httpx.Headers) -> Optional[float]:
+    """How long the server asked us to wait, if it said."""
+    if "retry-after-ms" in headers:
+        return float(headers["retry-after-ms"]) / 1000
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        delay = parse_reset(headers.get(name))
+        if delay is not None:
+            return delay
+    return None
+
+
+@dataclass
+class CallRecord:
+    model: str
+    latency_s: float
+    attempts: int
+    status: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class CallStats:
+    """Running totals over every call; only the last `window` records are kept, for the latency percentile."""
+
+    window: int = 1000
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_max_s: Optional[float] = None
+    recent: Deque[CallRecord] = field(init=False)
+
+    def __post_init__(self):
+        self.recent = deque(maxlen=self.window)
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        self.retries += record.attempts - 1
+        self.failures += record.status != 200
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.latency_max_s = max(self.latency_max_s or 0.0, record.latency_s)
+        self.recent.append(record)
+
+    def summary(self) -> dict:
+        latencies = sorted(record.latency_s for record in self.recent)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "latency_max_s": self.latency_max_s,
+        }
+
+
+class LLMClientError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Chat completion failed with status {status}: {message}")
+        self.status = status
+
+
+class LLMClient:
+    """
+    Async OpenAI-compatible chat client shared by the demo connectors: one keep-alive connection
+    pool, at most `max_concurrency` calls in flight, retries with jittered exponential backoff on
+    429/5xx that wait at least as long as the rate-limit headers ask, and per-call latency and
+    token usage in `stats`.
+    """
+
+    def __init__(
+        self,
+        base_url: str = VISION_API_BASE_URL,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 4,
+        timeout_s: float = 60.0,
+        backoff_s: float = 0.5,
+        max_backoff_s: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout_s = timeout_s
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.transport = transport  # e.g. httpx.ASGITransport(app=stub_server.build_app(...)) in tests
+        self.stats = CallStats()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._paused_until = 0.0  # Monotonic time before which no call is started
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        return cls(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            timeout_s=float(os.getenv("LLM_TIMEOUT_S", "60")),
+        )
+
+    def _ensure_client(self):
+        # Created lazily so the pool and semaphore belong to the loop that uses them
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, headers=self.headers, timeout=self.timeout_s, limits=limits,
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _backoff(self, attempt: int, server_delay: Optional[float]) -> float:
+        delay = min(self.backoff_s * 2 ** attempt, self.max_backoff_s)
+        delay = random.uniform(delay / 2, delay)  # Jitter so parallel callers don't retry in lockstep
+        return max(delay, server_delay or 0.0)
+
+    async def achat(self, messages: list, model: Optional[str] = None, **params) -> str:
+        """Text of the first choice of a chat completion."""
+        self._ensure_client()
+        model = model or VISION_MODEL
+        payload = {"model": model, "messages": messages, **params}
+        start = time.perf_counter()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                try:
+                    response = await self._client.post("/chat/completions", json=payload)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        self._record(model, start, attempt + 1, 0)
+                        raise LLMClientError(0, str(e))
+                    await asyncio.sleep(self._backoff(attempt, None))
+                    continue
+
+                self._track_rate_limit(response.headers)
+                if response.status_code == 200:
+                    body = response.json()
+                    usage = body.get("usage") or {}
+                    self._record(model, start, attempt + 1, 200,
+                                 usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+                    # content is null when the model only returns a refusal or tool calls
+                    return (body["choices"][0]["message"].get("content") or "").strip()
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    self._record(model, start, attempt + 1, response.status_code)
+                    raise LLMClientError(response.status_code, response.text[:500])
+                await asyncio.sleep(self._backoff(attempt, retry_delay(response.headers)))
+
+    def _track_rate_limit(self, headers: httpx.Headers):
+        """Hold new calls back until the window resets once the server reports no requests left."""
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            reset = parse_reset(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self._paused_until = max(self._paused_until, time.monotonic() + reset)
+
+    def _record(self, model: str, start: float, attempts: int, status: int, prompt_tokens=0, completion_tokens=0):
+        self.stats.add(CallRecord(
+            model=model,
+            latency_s=time.perf_counter() - start,
+            attempts=attempts,
+            status=status,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        ))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class _LoopThread:
+    """A private event loop on a daemon thread, so synchronous Streamlit code can share one async client."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_client() -> LLMClient:
+    return LLMClient.from_env()
+
+
+@functools.lru_cache(maxsize=1)
+def _loop_thread() -> _LoopThread:
+    return _LoopThread()
+
+
+def chat(messages: list, model: Optional[str] = None, **params) -> str:
+    """Blocking wrapper around the shared client for the synchronous connectors."""
+    return _loop_thread().run(get_llm_client().achat(messages, model, **params))
+
+
+def image_message(prompt: str, image_base64: str, detail: Optional[str] = None) -> list:
+    image_url = {"url": f"data:image/jpeg;base64,{image_base64}"}
+    if detail:
+        image_url["detail"] = detail
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": image_url},
+        ],
+    }]
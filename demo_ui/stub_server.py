@@ -0,0 +1,70 @@
+"""
+Local stand-in for the OpenAI chat completions API, for running the demo and exercising
+llm_client.py without network access or cost. Answers after `--latency-ms` with a canned reply
+and fails a share of calls with 429 (with rate-limit headers) or 503.
+
+    python stub_server.py --port 8099 --rate-limit-rate 0.2 --error-rate 0.1
+    VISION_API_BASE_URL=http://127.0.0.1:8099/v1 streamlit run app.py
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_app(latency_ms: float, rate_limit_rate: float, error_rate: float, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(latency_ms / 1000)
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+                headers={"retry-after-ms": "200", "x-ratelimit-remaining-requests": "0",
+                         "x-ratelimit-reset-requests": "200ms"},
+            )
+        if roll < rate_limit_rate + error_rate:
+            return JSONResponse({"error": {"message": "Service unavailable"}}, status_code=503)
+
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in body["messages"])
+        reply = "A person is standing near the entrance."
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(reply) // 4,
+                "total_tokens": prompt_chars // 4 + len(reply) // 4,
+            },
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 503")
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms, args.rate_limit_rate, args.error_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-import os
 import cv2
 import base64
-import openai
+
+from frame_encoder import encode_frame
+from gpt_connector import FRAME_TARGET
+from llm_client import chat, image_message
 
 
 def get_video_frames_per_second(video_path):
@@ -33,10 +35,8 @@ def frame_to_base64(frame):
     """
     Convert a frame (numpy array) to a base64-encoded JPEG.
     """
-    ret, buffer = cv2.imencode('.jpg', frame)
-    if not ret:
-        raise RuntimeError("Failed to encode frame to JPEG.")
-    jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+    encoded = encode_frame(frame, FRAME_TARGET)
+    jpg_as_text = base64.b64encode(encoded.data).decode('utf-8')
     return jpg_as_text
 
 
@@ -60,43 +60,18 @@ def analyze_image_with_chatgpt(image_base64, second, previous_explanations="", f
         )
         # print(f'Prompt for second {second}: \n {prompt}')
 
-    # Use a ChatCompletion endpoint for GPT-4 (adjust model as needed)
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt,
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
-                        },
-                    },
-                ],
-            }
-        ],
-    )
-    return response.choices[0].message.content.strip()
+    return chat(image_message(prompt, image_base64, FRAME_TARGET.detail))
 
 
 def summarize_request(prompt):
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system",
-             "content": "Your task is to generate a summary of a video based on a prior second-by-second analysis."},
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ]
-    )
-    return response.choices[0].message.content.strip()
+    return chat([
+        {"role": "system",
+         "content": "Your task is to generate a summary of a video based on a prior second-by-second analysis."},
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ])
 
 
 def general_request(prompt, content=None):
@@ -105,11 +80,7 @@ def general_request(prompt, content=None):
         messages.append({"role": "system", "content": content})
     messages.append({"role": "user", "content": prompt})
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=messages
-    )
-    return response.choices[0].message.content.strip()
+    return chat(messages)
 
 
 def summarize_entire_video_prompt(previous_explanations):
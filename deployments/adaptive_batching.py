@@ -0,0 +1,116 @@
+import time
+from typing import Optional, Tuple
+
+
+class AdaptiveBatchController:
+    """
+    Picks the max batch size and batch wait timeout that keep request latency under
+    a latency SLO, from observed per-batch service times and arrival rate.
+
+    Service time is modelled as `fixed + per_item * batch_size`, fitted with
+    exponentially weighted least squares. A request may wait behind one batch that is
+    already running, so the batch size is the largest one whose worst case
+    (2 * service time + wait) fits in the SLO. While every batch so far had the same size the
+    fit can't tell fixed from per-item cost and charges it all per item, so the controller also
+    probes one size up whenever that would fit even if the cost were all fixed; the probe's
+    service time then separates the two. Waiting only pays off when at least one
+    more request is expected to arrive during the wait, so at low traffic the wait
+    drops to `min_wait_s` instead of adding idle latency.
+    """
+
+    def __init__(
+        self,
+        latency_slo_s: float,
+        min_batch_size: int = 1,
+        max_batch_size: int = 32,
+        min_wait_s: float = 0.001,
+        max_wait_s: float = 0.2,
+        decay: float = 0.9,
+    ):
+        self.latency_slo_s = latency_slo_s
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_wait_s = min_wait_s
+        self.max_wait_s = max_wait_s
+        self.decay = decay
+
+        self.batch_size = min_batch_size
+        self.wait_timeout_s = min_wait_s
+        self.queue_depth = 0
+
+        # Exponentially weighted sums for the least-squares fit of service time vs batch size.
+        self._w = self._sb = self._st = self._sbb = self._sbt = 0.0
+        self._mean_gap = None  # Exponentially weighted mean inter-arrival time
+        self._last_arrival = None
+
+    @property
+    def arrival_rate(self) -> float:
+        # Averaging the gaps and inverting, not averaging 1/gap: for Poisson arrivals the
+        # mean of 1/gap diverges, so short gaps would dominate and overstate the rate.
+        return 1.0 / self._mean_gap if self._mean_gap else 0.0
+
+    def record_arrival(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if self._last_arrival is not None:
+            gap = max(now - self._last_arrival, 1e-6)
+            if self._mean_gap is None:
+                self._mean_gap = gap
+            else:
+                self._mean_gap = self.decay * self._mean_gap + (1 - self.decay) * gap
+        self._last_arrival = now
+
+    def record_batch(self, batch_size: int, service_time_s: float, queue_depth: int) -> Tuple[int, float]:
+        """Feed one finished batch and return the updated (max_batch_size, wait_timeout_s)."""
+        d = self.decay
+        self._w = d * self._w + 1
+        self._sb = d * self._sb + batch_size
+        self._st = d * self._st + service_time_s
+        self._sbb = d * self._sbb + batch_size * batch_size
+        self._sbt = d * self._sbt + batch_size * service_time_s
+        self.queue_depth = queue_depth
+        self._update()
+        return self.batch_size, self.wait_timeout_s
+
+    def service_time(self, batch_size: int) -> float:
+        fixed, per_item = self._fit()
+        return fixed + per_item * batch_size
+
+    def _size_variance(self) -> float:
+        mean_b = self._sb / self._w
+        return self._sbb / self._w - mean_b * mean_b
+
+    def _fit(self) -> Tuple[float, float]:
+        if self._w == 0:
+            return 0.0, 0.0
+        mean_b = self._sb / self._w
+        mean_t = self._st / self._w
+        var_b = self._size_variance()
+        if var_b < 1e-6:
+            # Every batch had the same size: attribute all time to the items.
+            return 0.0, mean_t / max(mean_b, 1.0)
+        per_item = max((self._sbt / self._w - mean_b * mean_t) / var_b, 0.0)
+        fixed = max(mean_t - per_item * mean_b, 0.0)
+        return fixed, per_item
+
+    def _update(self):
+        batch_size = self.min_batch_size
+        for candidate in range(self.max_batch_size, self.min_batch_size - 1, -1):
+            if 2 * self.service_time(candidate) + self.min_wait_s <= self.latency_slo_s:
+                batch_size = candidate
+                break
+        if self._w and self._size_variance() < 1e-6:
+            mean_t = self._st / self._w
+            if 2 * mean_t + self.min_wait_s <= self.latency_slo_s:
+                probe = min(round(self._sb / self._w) + 1, self.max_batch_size)
+                batch_size = max(batch_size, probe)
+
+        slack = self.latency_slo_s - 2 * self.service_time(batch_size)
+        wait_timeout_s = self.min_wait_s
+        arrival_rate = self.arrival_rate
+        if self.queue_depth < batch_size and arrival_rate > 0:
+            usable_wait = min(slack, self.max_wait_s)
+            if arrival_rate * usable_wait >= 1:
+                time_to_fill = (batch_size - 1 - self.queue_depth) / arrival_rate
+                wait_timeout_s = min(usable_wait, time_to_fill)
+        self.batch_size = batch_size
+        self.wait_timeout_s = max(wait_timeout_s, self.min_wait_s)
@@ -0,0 +1,112 @@
+import json
+from typing import Optional, Tuple
+
+# Compact alert the orchestrator acts on; pricing budgets ~51 output tokens for it.
+ALERT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "severity": {"type": "string", "enum": ["none", "low", "medium", "high"]},
+        "labels": {"type": "array", "items": {"type": "string"}, "maxItems": 5},
+        "description": {"type": "string", "maxLength": 120},
+    },
+    "required": ["severity", "labels", "description"],
+    "additionalProperties": False,
+}
+
+# Enough for the schema above; generation is also cut as soon as the object closes.
+ALERT_MAX_TOKENS = 96
+
+
+def alert_instruction(schema: dict = ALERT_SCHEMA) -> str:
+    return (
+        "Answer only with one compact JSON object, no prose, matching this JSON schema: "
+        + json.dumps(schema, separators=(",", ":"))
+    )
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """Return the first complete top-level `{...}` in `text`, or None if it never closes."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
+def parse_alert(text: str, schema: dict = ALERT_SCHEMA) -> Tuple[Optional[dict], Optional[str]]:
+    """Post-process model output into an alert dict. Returns (alert, error)."""
+    candidate = extract_json_object(text)
+    if candidate is None:
+        return None, "no complete JSON object in output"
+    try:
+        alert = json.loads(candidate)
+    except json.JSONDecodeError as e:
+        return None, f"invalid JSON: {str(e)}"
+    error = validate(alert, schema)
+    if error is not None:
+        return None, error
+    return alert, None
+
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def validate(value, schema: dict, path: str = "$") -> Optional[str]:
+    """Check the subset of JSON schema used for alerts (type, enum, required, properties, items, limits)."""
+    expected = schema.get("type")
+    if expected:
+        if expected not in _JSON_TYPES:
+            return f"{path}: unsupported schema type {expected!r}"
+        # bool is an int subclass, but JSON true/false isn't a number
+        if not isinstance(value, _JSON_TYPES[expected]) or (isinstance(value, bool) and expected != "boolean"):
+            return f"{path}: expected {expected}"
+    if "enum" in schema and value not in schema["enum"]:
+        return f"{path}: {value!r} not in {schema['enum']}"
+    if isinstance(value, str) and len(value) > schema.get("maxLength", len(value)):
+        return f"{path}: longer than {schema['maxLength']} characters"
+    if isinstance(value, list):
+        if len(value) > schema.get("maxItems", len(value)):
+            return f"{path}: more than {schema['maxItems']} items"
+        for index, item in enumerate(value):
+            error = validate(item, schema.get("items", {}), f"{path}[{index}]")
+            if error:
+                return error
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value:
+                return f"{path}: missing '{key}'"
+        for key, item in value.items():
+            if key not in properties:
+                if schema.get("additionalProperties", True) is False:
+                    return f"{path}: unexpected '{key}'"
+                continue
+            error = validate(item, properties[key], f"{path}.{key}")
+            if error:
+                return error
+    return None
@@ -0,0 +1,259 @@
+import abc
+import asyncio
+import dataclasses
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from deployments.utils import logger
+
+SEVERITY_ORDER = ["none", "low", "medium", "high"]
+DEFAULT_RULES = [{"name": "default", "min_severity": "medium", "cooldown_s": 300}]
+
+
+@dataclasses.dataclass
+class AlertRule:
+    """Fires on alerts at or above `min_severity`, optionally only when one of `labels` is present."""
+
+    name: str
+    min_severity: str = "medium"
+    labels: Optional[List[str]] = None
+    cooldown_s: float = 300.0  # A camera doesn't repeat this rule's alert within the window
+
+    def __post_init__(self):
+        # Checked when ALERT_RULES is loaded rather than on the first alert the rule sees
+        if self.min_severity not in SEVERITY_ORDER:
+            raise ValueError(
+                f"Alert rule '{self.name}': min_severity must be one of {SEVERITY_ORDER}, got '{self.min_severity}'"
+            )
+
+    def matches(self, alert: dict) -> bool:
+        if SEVERITY_ORDER.index(alert.get("severity", "none")) < SEVERITY_ORDER.index(self.min_severity):
+            return False
+        return not self.labels or bool(set(self.labels) & set(alert.get("labels", [])))
+
+
+@dataclasses.dataclass
+class Alert:
+    client_id: str
+    camera_id: str
+    rule: str
+    severity: str
+    labels: List[str]
+    description: str
+    created_at: float
+
+
+class AlertPolicy:
+    """Evaluates severity rules against inference results and keeps per-camera alert state."""
+
+    def __init__(self, rules: List[AlertRule]):
+        self.rules = rules
+        self._last_fired: Dict[Tuple[str, str, str], float] = {}  # (client, camera, rule) -> time
+        self.camera_state: Dict[Tuple[str, str], dict] = {}  # (client, camera) -> last alert seen
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    @classmethod
+    def from_env(cls) -> "AlertPolicy":
+        # ALERT_RULES: JSON list of {"name", "min_severity", "labels", "cooldown_s"}
+        rules = json.loads(os.getenv("ALERT_RULES", json.dumps(DEFAULT_RULES)))
+        return cls([AlertRule(**rule) for rule in rules])
+
+    def evaluate(self, client_id: str, camera_id: str, alert: dict, now: Optional[float] = None) -> List[Alert]:
+        """Alerts to send for one result; matches still inside their cooldown are suppressed."""
+        now = time.time() if now is None else now
+        fired = []
+        with self._lock:
+            self.camera_state[(client_id, camera_id)] = {**alert, "seen_at": now}
+            for rule in self.rules:
+                if not rule.matches(alert):
+                    continue
+                key = (client_id, camera_id, rule.name)
+                last = self._last_fired.get(key)
+                if last is not None and now - last < rule.cooldown_s:
+                    self.suppressed += 1
+                    continue
+                self._last_fired[key] = now
+                fired.append(Alert(
+                    client_id=client_id,
+                    camera_id=camera_id,
+                    rule=rule.name,
+                    severity=alert["severity"],
+                    labels=list(alert.get("labels", [])),
+                    description=alert.get("description", ""),
+                    created_at=now,
+                ))
+        return fired
+
+    def release(self, alert: Alert):
+        """Undo the cooldown `alert` armed, when it was never delivered, so the next match fires."""
+        key = (alert.client_id, alert.camera_id, alert.rule)
+        with self._lock:
+            if self._last_fired.get(key) == alert.created_at:
+                del self._last_fired[key]
+
+
+def format_message(alerts: List[Alert]) -> str:
+    """One outbound message for a client, most severe alerts first."""
+    ordered = sorted(alerts, key=lambda a: SEVERITY_ORDER.index(a.severity), reverse=True)
+    return "\n".join(f"[{a.severity.upper()}] camera {a.camera_id}: {a.description}" for a in ordered)
+
+
+class Notifier(abc.ABC):
+    """Sends one grouped message to a client. Raise to have the dispatcher retry."""
+
+    @abc.abstractmethod
+    async def send(self, client_id: str, alerts: List[Alert], text: str):
+        pass
+
+    async def close(self):
+        pass
+
+
+class LogNotifier(Notifier):
+    async def send(self, client_id: str, alerts: List[Alert], text: str):
+        logger.info("Alert message to client %s (%s alerts):\n%s", client_id, len(alerts), text)
+
+
+class WebhookNotifier(Notifier):
+    """POSTs `{"client_id", "text", "alerts"}` to `url`, e.g. the WhatsApp sender."""
+
+    def __init__(self, url: str, timeout_s: float = 10.0):
+        import httpx
+
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout_s)
+
+    async def send(self, client_id: str, alerts: List[Alert], text: str):
+        response = await self.client.post(self.url, json={
+            "client_id": client_id,
+            "text": text,
+            "alerts": [dataclasses.asdict(alert) for alert in alerts],
+        })
+        response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def build_notifier(kind: Optional[str] = None) -> Optional[Notifier]:
+    """Notifier from ALERT_NOTIFIER: "log", "webhook" (ALERT_WEBHOOK_URL) or "off"."""
+    kind = (kind or os.getenv("ALERT_NOTIFIER", "off")).lower()
+    if kind == "off":
+        return None
+    if kind == "log":
+        return LogNotifier()
+    if kind == "webhook":
+        return WebhookNotifier(os.environ["ALERT_WEBHOOK_URL"])
+    raise ValueError(f"Unknown ALERT_NOTIFIER '{kind}'")
+
+
+class AlertDispatcher:
+    """
+    Turns inference results into outbound messages off the request path. Alerts go through a
+    bounded queue (dropped and counted when full); every `flush_interval_s` the queue is drained,
+    grouped into one message per client and sent with retries and exponential backoff.
+    """
+
+    def __init__(
+        self,
+        policy: AlertPolicy,
+        notifier: Notifier,
+        flush_interval_s: float = 5.0,
+        queue_size: int = 1000,
+        max_retries: int = 3,
+        retry_backoff_s: float = 0.5,
+    ):
+        self.policy = policy
+        self.notifier = notifier
+        self.flush_interval_s = flush_interval_s
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._worker: Optional[asyncio.Task] = None
+        self.results = 0
+        self.alerts = 0
+        self.dropped = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["AlertDispatcher"]:
+        notifier = build_notifier()
+        if notifier is None:
+            return None
+        return cls(
+            AlertPolicy.from_env(),
+            notifier,
+            flush_interval_s=float(os.getenv("ALERT_FLUSH_INTERVAL_S", "5")),
+            queue_size=int(os.getenv("ALERT_QUEUE_SIZE", "1000")),
+            max_retries=int(os.getenv("ALERT_MAX_RETRIES", "3")),
+        )
+
+    def submit(self, client_id: str, camera_id: str, alert: Optional[dict], now: Optional[float] = None) -> List[Alert]:
+        """Evaluate one result and queue its alerts without waiting on delivery. Needs a running loop."""
+        self.results += 1
+        if not alert:
+            return []
+        fired = self.policy.evaluate(client_id, camera_id, alert, now)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        for item in fired:
+            try:
+                self.queue.put_nowait(item)
+                self.alerts += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.policy.release(item)
+                logger.warning("Alert queue full; dropped alert for camera %s.", camera_id)
+        return fired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            await self.flush()
+
+    async def flush(self):
+        grouped = defaultdict(list)
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            grouped[item.client_id].append(item)
+        await asyncio.gather(*(self._send(client_id, items) for client_id, items in grouped.items()))
+
+    async def _send(self, client_id: str, alerts: List[Alert]):
+        text = format_message(alerts)
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.notifier.send(client_id, alerts, text)
+                self.messages_sent += 1
+                return
+            except Exception as e:
+                logger.warning("Sending alerts to client %s failed (attempt %s): %s", client_id, attempt + 1, e)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff_s * 2 ** attempt)
+        self.send_failures += 1
+        for alert in alerts:
+            self.policy.release(alert)
+        logger.error("Gave up sending %s alerts to client %s.", len(alerts), client_id)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        await self.flush()
+        await self.notifier.close()
+
+    def stats(self) -> dict:
+        return {
+            "results": self.results,
+            "alerts": self.alerts,
+            "suppressed": self.policy.suppressed,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+            "messages_per_alert": self.messages_sent / self.alerts if self.alerts else None,
+        }
@@ -0,0 +1,127 @@
+import json
+import os
+from typing import Callable, Iterator, List, Optional
+
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+from deployments.utils import logger, decode_base64_to_image
+
+INFER_BATCH_MAX_SIZE = int(os.getenv("INFER_BATCH_MAX_SIZE", "8"))
+
+
+class BatchItem(BaseModel):
+    question: str
+    base64_image: str
+    camera_id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    stream: bool = False
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    camera_id: Optional[str] = None
+    prediction: Optional[str] = None
+    error: Optional[str] = None
+    cache_hit: bool = False
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
+def iter_batch_results(
+    items: List[BatchItem],
+    infer_batch: Callable[[list, List[str]], List[str]],
+    max_batch_size: int = INFER_BATCH_MAX_SIZE,
+    response_cache=None,
+    cache_params: Optional[dict] = None,
+) -> Iterator[BatchItemResult]:
+    """
+    Run `items` through `infer_batch` in chunks of at most `max_batch_size`, yielding
+    per-item results chunk by chunk in request order. A bad image or a failing model
+    batch only marks the affected items as errors.
+    """
+    for start in range(0, len(items), max_batch_size):
+        chunk = items[start:start + max_batch_size]
+        results = {}
+        pending = []  # (index, cache_key, image, question)
+
+        for offset, item in enumerate(chunk):
+            index = start + offset
+            cache_key = None
+            if response_cache is not None:
+                cache_key = response_cache.make_key(item.base64_image, item.question, cache_params)
+                cached_prediction = response_cache.get(cache_key)
+                if cached_prediction is not None:
+                    results[index] = BatchItemResult(
+                        index=index, camera_id=item.camera_id, prediction=cached_prediction, cache_hit=True
+                    )
+                    continue
+            try:
+                image = decode_base64_to_image(item.base64_image)
+            except Exception as e:
+                results[index] = BatchItemResult(index=index, camera_id=item.camera_id, error=str(e))
+                continue
+            pending.append((index, cache_key, image, item.question))
+
+        if pending:
+            predictions = infer_with_fallback(
+                infer_batch,
+                [image for _, _, image, _ in pending],
+                [question for _, _, _, question in pending],
+            )
+            for (index, cache_key, _, _), (prediction, error) in zip(pending, predictions):
+                if error is None and cache_key is not None:
+                    response_cache.set(cache_key, prediction)
+                results[index] = BatchItemResult(
+                    index=index, camera_id=items[index].camera_id, prediction=prediction, error=error
+                )
+
+        for index in sorted(results):
+            yield results[index]
+
+
+def infer_with_fallback(infer_batch, images: list, questions: List[str]) -> List[tuple]:
+    """
+    Run one model batch and return (prediction, error) per item. If the batch fails, or
+    returns a different number of predictions than it got inputs (so they can't be matched
+    back to items), retry item by item to isolate the bad input.
+    """
+    try:
+        return [(prediction, None) for prediction in _checked_infer(infer_batch, images, questions)]
+    except Exception as e:
+        logger.error("Batch of %s failed, retrying items one by one: %s", len(images), e)
+
+    outcomes = []
+    for image, question in zip(images, questions):
+        try:
+            outcomes.append((_checked_infer(infer_batch, [image], [question])[0], None))
+        except Exception as e:
+            outcomes.append((None, str(e)))
+    return outcomes
+
+
+def _checked_infer(infer_batch, images: list, questions: List[str]) -> list:
+    predictions = list(infer_batch(images, questions))
+    if len(predictions) != len(images):
+        raise ValueError(f"Model returned {len(predictions)} predictions for {len(images)} inputs")
+    return predictions
+
+
+async def batch_response(results: Iterator[BatchItemResult], stream: bool):
+    """
+    Return NDJSON lines as chunks complete when streaming, otherwise one BatchResponse.
+    Either way the model runs in the threadpool (StreamingResponse iterates sync generators
+    there), so a batch doesn't block the event loop.
+    """
+    if stream:
+        return StreamingResponse(
+            (json.dumps(result.model_dump()) + "\n" for result in results),
+            media_type="application/x-ndjson",
+        )
+    return BatchResponse(results=await run_in_threadpool(list, results))
@@ -0,0 +1,204 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from deployments.utils import logger
+
+
+class InMemoryCacheBackend:
+    """Process-local LRU store bounded by entry count and total value size."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_s: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl_s, value)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._total_bytes -= len(value.encode("utf-8"))
+
+
+class DiskCacheBackend:
+    """
+    File-per-entry store in a local directory, so every uvicorn worker on the host
+    shares the same cache. Writes go through a temp file and `os.replace` to stay
+    atomic across processes; eviction removes the least recently written entries.
+
+    Eviction scans the directory, so it doesn't run on every write: each process keeps an
+    estimate of the totals from its last scan plus its own writes, and rescans when that
+    estimate passes a limit or every `scan_every` writes (to pick up other workers' writes).
+    """
+
+    def __init__(self, directory: str, max_entries: int = 10_000, max_bytes: int = 512 * 1024 * 1024,
+                 scan_every: int = 64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.scan_every = scan_every
+        self._estimated_entries: Optional[int] = None  # None until the first scan
+        self._estimated_bytes = 0
+        self._writes_since_scan = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry["expires_at"] < time.time():
+            self._unlink(path)
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: str, ttl_s: float):
+        payload = json.dumps({"expires_at": time.time() + ttl_s, "value": value})
+        if len(payload) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._writes_since_scan += 1
+            if self._estimated_entries is not None:
+                # Overwrites are counted as new entries, which only makes the next scan come sooner
+                self._estimated_entries += 1
+                self._estimated_bytes += len(payload)
+                if (self._writes_since_scan < self.scan_every and self._estimated_entries <= self.max_entries
+                        and self._estimated_bytes <= self.max_bytes):
+                    return
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+        remaining = len(entries)
+        if remaining > self.max_entries or total_bytes > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if remaining <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                self._unlink(path)
+                remaining -= 1
+                total_bytes -= size
+        self._estimated_entries = remaining
+        self._estimated_bytes = total_bytes
+        self._writes_since_scan = 0
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ResponseCache:
+    """
+    Caches deterministic predictions keyed by image content hash, question,
+    model name, model variant (backend / quantization) and generation parameters.
+    """
+
+    def __init__(self, backend, model_name: str, ttl_s: float = 300.0, variant: str = ""):
+        self.backend = backend
+        self.model_name = model_name
+        self.variant = variant
+        self.ttl_s = ttl_s
+
+    def make_key(self, base64_image: str, question: str, params: Optional[dict] = None) -> str:
+        try:
+            image_bytes = base64.b64decode(base64_image)
+        except (binascii.Error, ValueError):
+            image_bytes = base64_image.encode("utf-8")
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(image_bytes).digest())
+        digest.update(question.encode("utf-8"))
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(self.variant.encode("utf-8"))
+        digest.update(json.dumps(params or {}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self.backend.get(key)
+
+    def set(self, key: str, prediction: str):
+        self.backend.set(key, prediction, self.ttl_s)
+
+
+def build_response_cache(model_name: str, variant: str = "") -> Optional[ResponseCache]:
+    """
+    Build the response cache from environment variables. Returns None when the
+    cache is disabled (RESPONSE_CACHE_BACKEND=off). `variant` names how the model
+    is run (e.g. "onnx" or "torch-int8"), so a shared disk cache never returns one
+    variant's answers for another.
+    """
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    ttl_s = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+    if backend_name == "off":
+        logger.info("Response cache disabled.")
+        return None
+    if backend_name == "disk":
+        directory = os.getenv("RESPONSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "response_cache"))
+        # Disk has room for far more than a worker's memory, so it has its own size limit
+        max_bytes = int(os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+        backend = DiskCacheBackend(directory, max_entries=max_entries, max_bytes=max_bytes)
+    elif backend_name == "memory":
+        max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        backend = InMemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend_name}")
+
+    logger.info("Response cache enabled: backend=%s, ttl=%ss, max_entries=%s", backend_name, ttl_s, max_entries)
+    return ResponseCache(backend, model_name, ttl_s=ttl_s, variant=variant)
@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from PIL import Image
+
+# MiniCPM-V marks where each image's visual tokens go in the prompt.
+IMAGE_PLACEHOLDER = "(<image>./</image>)"
+
+
+def select_frames(frames: list, max_frames: int) -> list:
+    """Evenly subsample `frames` down to `max_frames`, always keeping the first and last frame."""
+    if len(frames) <= max_frames:
+        return frames
+    if max_frames == 1:
+        return frames[-1:]
+    step = (len(frames) - 1) / (max_frames - 1)
+    return [frames[round(i * step)] for i in range(max_frames)]
+
+
+def downscale(image: Image.Image, max_side: Optional[int]) -> Image.Image:
+    """Shrink `image` so its long side is at most `max_side`, keeping the aspect ratio."""
+    if not max_side or max(image.size) <= max_side:
+        return image
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.BICUBIC)
+    return image
+
+
+def build_clip_prompt(prompt: str, timestamps: List[Optional[float]]) -> str:
+    """
+    Prepend one image placeholder per frame, labelled with its timestamp when known. A prompt
+    that already places k placeholders itself (e.g. a template) keeps them for the last k frames
+    and gets labelled placeholders for the earlier ones; more placeholders than frames is an error.
+    """
+    placed = prompt.count(IMAGE_PLACEHOLDER)
+    if placed > len(timestamps):
+        raise ValueError(f"Prompt has {placed} image placeholders but the clip has {len(timestamps)} frames")
+    lines = []
+    for index, timestamp in enumerate(timestamps[:len(timestamps) - placed]):
+        label = f"Frame {index + 1}" if timestamp is None else f"Frame {index + 1} (t={timestamp:.2f}s)"
+        lines.append(f"{label}: {IMAGE_PLACEHOLDER}")
+    return "\n".join(lines + [prompt])
+
+
+def lower_limit(requested, limit: Optional[int], name: str) -> Optional[int]:
+    """A per-request limit that may only tighten the deployment's `limit` (None: no limit)."""
+    if requested is None:
+        return limit
+    if isinstance(requested, bool) or not isinstance(requested, int) or requested < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return requested if limit is None else min(requested, limit)
@@ -0,0 +1,94 @@
+import math
+import os
+from typing import Optional, Sequence
+
+from PIL import Image
+
+# MiniCPM-V cuts images into slices of about 448x448 pixels (its `scale_resolution`) plus one
+# downscaled overview image, and resamples every one of them to a fixed number of query tokens.
+SLICE_PIXELS = 448 * 448
+TOKENS_PER_SLICE = 64  # `query_num` of MiniCPM-V 2.6; MiniCPM-Llama3-V 2.5 uses 96
+DEFAULT_MAX_SLICES = 9  # `max_slice_nums` of the reference configs
+
+
+class ImageBudget:
+    """
+    Per-deployment cap on how much of a frame reaches the vision encoder.
+
+    `max_pixels` bounds the resized frame's area and `max_slices` the number of slices it is
+    cut into; both can be lowered per request but not raised.
+    """
+
+    def __init__(self, max_pixels: Optional[int] = None, max_slices: Optional[int] = None):
+        self.max_pixels = _lowest(max_pixels)
+        self.max_slices = _lowest(max_slices)
+
+    @classmethod
+    def from_env(cls) -> "ImageBudget":
+        return cls(
+            max_pixels=int(os.getenv("IMAGE_MAX_PIXELS", "0")),
+            max_slices=int(os.getenv("IMAGE_MAX_SLICES", "0")),
+        )
+
+    def resolve(self, max_pixels: Optional[int] = None, max_slices: Optional[int] = None) -> "ImageBudget":
+        """Combine the deployment limits with the (optional) request limits, keeping the lower of each."""
+        return ImageBudget(_lowest(self.max_pixels, max_pixels), _lowest(self.max_slices, max_slices))
+
+    def apply(self, image: Image.Image, roi: Optional[Sequence[float]] = None) -> Image.Image:
+        """Crop `image` to the region of interest, then resize it to fit the budget."""
+        if roi:
+            image = crop_to_roi(image, roi)
+        return limit_pixels(image, self.pixel_limit())
+
+    def pixel_limit(self) -> Optional[int]:
+        # Slices are counted from the image area, so capping the area caps the slice count too
+        slice_limit = self.max_slices * SLICE_PIXELS if self.max_slices else None
+        return _lowest(self.max_pixels, slice_limit)
+
+
+def _lowest(*values):
+    """The lowest limit set; None, 0 and negative values mean "no limit" and are ignored."""
+    values = [value for value in values if value is not None and value > 0]
+    return min(values) if values else None
+
+
+def crop_to_roi(image: Image.Image, roi: Sequence[float]) -> Image.Image:
+    """
+    Crop to `roi` = [x0, y0, x1, y1] given as fractions of the width and height, so a camera's
+    region of interest stays valid whatever resolution it streams at.
+    """
+    if len(roi) != 4:
+        raise ValueError("roi must be [x0, y0, x1, y1]")
+    x0, y0, x1, y1 = (min(max(float(value), 0.0), 1.0) for value in roi)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"Empty region of interest: {list(roi)}")
+    width, height = image.size
+    box = (round(x0 * width), round(y0 * height), round(x1 * width), round(y1 * height))
+    return image.crop(box)
+
+
+def limit_pixels(image: Image.Image, max_pixels: Optional[int]) -> Image.Image:
+    """Downscale `image` so that width * height <= `max_pixels`, keeping the aspect ratio."""
+    width, height = image.size
+    if not max_pixels or width * height <= max_pixels:
+        return image
+    scale = math.sqrt(max_pixels / (width * height))
+    size = (max(int(width * scale), 1), max(int(height * scale), 1))
+    return image.resize(size, Image.BICUBIC)
+
+
+def estimate_slices(image: Image.Image, max_slices: Optional[int] = None) -> int:
+    """Number of slices MiniCPM-V cuts `image` into (1 means it is encoded whole)."""
+    width, height = image.size
+    slices = min(math.ceil(width * height / SLICE_PIXELS), max_slices or DEFAULT_MAX_SLICES)
+    return max(slices, 1)
+
+
+def estimate_visual_tokens(
+    image: Image.Image, max_slices: Optional[int] = None, tokens_per_slice: int = TOKENS_PER_SLICE
+) -> int:
+    """Visual tokens MiniCPM-V spends on `image`: the overview image plus one block per slice."""
+    slices = estimate_slices(image, max_slices)
+    if slices == 1:
+        return tokens_per_slice
+    return tokens_per_slice * (1 + slices)
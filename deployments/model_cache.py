@@ -0,0 +1,153 @@
+"""
+Local cache of models pre-converted to the serving dtype as safetensors.
+
+Prepare once (at image build time or on the node) with:
+
+    python -m deployments.model_cache prepare Salesforce/blip-vqa-base --model-class blip-vqa --dtype float32
+
+Replicas then call `load_model`/`load_processor`, which memory-map the cached file instead of
+downloading, materialising and dtype-casting the checkpoint in every process.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+from transformers.modeling_utils import no_init_weights
+
+from deployments.utils import logger
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.expanduser("~/.cache/dummy_server/models"))
+# Serving dtype; replicas look the model up in the cache under this dtype
+MODEL_DTYPE = os.getenv("MODEL_DTYPE", "float32")
+WEIGHTS_FILE = "model.safetensors"
+_ALIASES_KEY = "aliases"
+
+
+def model_classes(name: str):
+    """(model class, processor class) for the `--model-class` names the CLI accepts."""
+    if name == "blip-vqa":
+        from transformers import BlipForQuestionAnswering, BlipProcessor
+        return BlipForQuestionAnswering, BlipProcessor
+    raise ValueError(f"Unknown model class '{name}'")
+
+
+def cache_path(model_name: str, dtype: str, cache_dir: str = None) -> str:
+    return os.path.join(cache_dir or MODEL_CACHE_DIR, model_name.replace("/", "--"), dtype)
+
+
+def is_prepared(model_name: str, dtype: str, cache_dir: str = None) -> bool:
+    return os.path.exists(os.path.join(cache_path(model_name, dtype, cache_dir), WEIGHTS_FILE))
+
+
+def prepare_model(model_cls, processor_cls, model_name: str, dtype: str = "float32", cache_dir: str = None) -> str:
+    """
+    Write `model_name` to the cache in `dtype`: config, processor and a single safetensors file
+    holding every parameter and buffer, so loading needs no cast and no re-initialisation.
+    """
+    path = cache_path(model_name, dtype, cache_dir)
+    model = model_cls.from_pretrained(model_name, torch_dtype=getattr(torch, dtype))
+    model.eval()
+
+    # safetensors refuses tensors that share storage (tied weights); store each once and
+    # record the other names as aliases.
+    tensors, aliases, seen = {}, {}, {}
+    for name, tensor in list(model.state_dict().items()) + list(model.named_buffers()):
+        if name in tensors or name in aliases:
+            continue
+        key = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape))
+        if key in seen:
+            aliases[name] = seen[key]
+            continue
+        seen[key] = name
+        tensors[name] = tensor.contiguous()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(path))
+    try:
+        model.config.save_pretrained(tmp_dir)
+        if processor_cls is not None:
+            processor_cls.from_pretrained(model_name).save_pretrained(tmp_dir)
+        save_file(tensors, os.path.join(tmp_dir, WEIGHTS_FILE), metadata={_ALIASES_KEY: json.dumps(aliases)})
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logger.info("Prepared %s (%s) in %s", model_name, dtype, path)
+    return path
+
+
+def load_prepared(model_cls, path: str):
+    """
+    Build the model on the meta device and assign the memory-mapped tensors to it directly,
+    so weights are neither initialised randomly nor copied.
+    """
+    config = model_cls.config_class.from_pretrained(path)
+    with no_init_weights(), torch.device("meta"):
+        model = model_cls(config)
+
+    with safe_open(os.path.join(path, WEIGHTS_FILE), framework="pt") as f:
+        aliases = json.loads((f.metadata() or {}).get(_ALIASES_KEY, "{}"))
+        tensors = {name: f.get_tensor(name) for name in f.keys()}
+    for alias, name in aliases.items():
+        tensors[alias] = tensors[name]
+
+    state_keys = set(model.state_dict().keys())
+    model.load_state_dict({k: v for k, v in tensors.items() if k in state_keys}, strict=True, assign=True)
+    # Non-persistent buffers (e.g. position ids) are not part of the state dict
+    for name, tensor in tensors.items():
+        if name not in state_keys:
+            module_name, _, buffer_name = name.rpartition(".")
+            model.get_submodule(module_name).register_buffer(buffer_name, tensor, persistent=False)
+    model.tie_weights()
+
+    named_tensors = list(model.named_parameters()) + list(model.named_buffers())
+    still_meta = [name for name, tensor in named_tensors if tensor.is_meta]
+    if still_meta:
+        raise ValueError(f"Cached model at {path} is missing tensors: {still_meta[:5]}")
+    return model.eval()
+
+
+def load_model(model_cls, model_name: str, dtype: str = MODEL_DTYPE, cache_dir: str = None):
+    """Load from the local cache when the model was prepared, otherwise fall back to `from_pretrained`."""
+    start = time.perf_counter()
+    if is_prepared(model_name, dtype, cache_dir):
+        model = load_prepared(model_cls, cache_path(model_name, dtype, cache_dir))
+        source = "local cache"
+    else:
+        logger.warning("%s (%s) is not in %s; loading from the hub.", model_name, dtype, cache_dir or MODEL_CACHE_DIR)
+        model = model_cls.from_pretrained(model_name, torch_dtype=getattr(torch, dtype))
+        model.eval()
+        source = "hub"
+    logger.info("Loaded %s from %s in %.2fs", model_name, source, time.perf_counter() - start)
+    return model
+
+
+def load_processor(processor_cls, model_name: str, dtype: str = MODEL_DTYPE, cache_dir: str = None):
+    if is_prepared(model_name, dtype, cache_dir):
+        return processor_cls.from_pretrained(cache_path(model_name, dtype, cache_dir))
+    return processor_cls.from_pretrained(model_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prepare = subparsers.add_parser("prepare", help="Convert a model into the local cache")
+    prepare.add_argument("model_name")
+    prepare.add_argument("--model-class", default="blip-vqa")
+    prepare.add_argument("--dtype", default=MODEL_DTYPE, choices=["float32", "float16", "bfloat16"])
+    prepare.add_argument("--cache-dir", default=None)
+    args = parser.parse_args()
+
+    model_cls, processor_cls = model_classes(args.model_class)
+    print(prepare_model(model_cls, processor_cls, args.model_name, args.dtype, args.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,34 @@
 from transformers import AutoModel, AutoTokenizer
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from deployments.utils import logger, decode_base64_to_image
-
+from deployments.prompt_templates import load_prompt_templates
+from deployments.vllm_metrics import EngineMetrics
+from deployments.clips import IMAGE_PLACEHOLDER, select_frames, downscale, build_clip_prompt, lower_limit
+from deployments.image_budget import ImageBudget
+from deployments.telemetry import TokenLog
+from deployments.alert_output import (
+    ALERT_SCHEMA, ALERT_MAX_TOKENS, alert_instruction, extract_json_object, parse_alert
+)
+from deployments.openai_compat import (
+    ChatCompletionRequest, parse_messages, chat_completion_response, chat_completion_chunk, SSE_DONE
+)
+
+import asyncio
 import json
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Optional
 
 from fastapi import BackgroundTasks
 from starlette.requests import Request
 from starlette.responses import StreamingResponse, Response
 from vllm.engine.arg_utils import AsyncEngineArgs
 from vllm.engine.async_llm_engine import AsyncLLMEngine
-from vllm.sampling_params import SamplingParams
+from vllm.sampling_params import SamplingParams, GuidedDecodingParams
 from vllm.utils import random_uuid
 
 from ray import serve
+from ray.serve import metrics
 
 from PIL import Image
 import base64
@@ -22,6 +36,10 @@ import io
 import os
 
 
+# Shipped templates, used unless PROMPT_TEMPLATES_PATH or the prompt_templates_path kwarg points elsewhere
+DEFAULT_PROMPT_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "prompt_templates.json")
+
+
 @serve.deployment(ray_actor_options={"num_gpus": 1})
 class VLLMPredictDeployment:
     def __init__(self, **kwargs):
@@ -29,12 +47,109 @@ class VLLMPredictDeployment:
         Initialize VLLM with support for multimodal (text + image) input.
         """
         os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
+        # Templates are registered at startup; requests then reference them by id
+        self.prompt_templates = load_prompt_templates(
+            kwargs.pop("prompt_templates_path", None), default=DEFAULT_PROMPT_TEMPLATES_PATH
+        )
+        # Multi-frame clips: requests may lower these limits but not raise them
+        self.max_frames_per_request = kwargs.pop(
+            "max_frames_per_request", int(os.getenv("MAX_FRAMES_PER_REQUEST", "8"))
+        )
+        self.frame_max_side = kwargs.pop("frame_max_side", int(os.getenv("FRAME_MAX_SIDE", "0"))) or None
+        # Visual-token budget: frames are cropped/resized before reaching the engine
+        env_budget = ImageBudget.from_env()
+        self.image_budget = ImageBudget(
+            max_pixels=kwargs.pop("max_pixels", env_budget.max_pixels),
+            max_slices=kwargs.pop("max_slices", env_budget.max_slices),
+        )
+        kwargs["limit_mm_per_prompt"] = kwargs.get("limit_mm_per_prompt", {"image": self.max_frames_per_request})
         kwargs["gpu_memory_utilization"] = kwargs.get("gpu_memory_utilization", 0.8)
         kwargs["trust_remote_code"] = True
+        # Reuse KV blocks of shared prompt prefixes (e.g. a tenant's fixed system prompt). Off by
+        # default: vLLM releases whose block hashes don't cover image inputs would hand a request
+        # the KV cache of another image behind the same placeholder tokens.
+        kwargs["enable_prefix_caching"] = kwargs.get(
+            "enable_prefix_caching", os.getenv("VLLM_ENABLE_PREFIX_CACHING", "0") == "1"
+        )
         args = AsyncEngineArgs(**kwargs)
         self.engine = AsyncLLMEngine.from_engine_args(args)
         self.model_name = kwargs.get('model')
 
+        self.engine_metrics = EngineMetrics()
+        self.alert_parse_failures_counter = metrics.Counter(
+            "vllm_alert_parse_failures", description="Alert-mode outputs that did not parse against the schema."
+        )
+        # Per-request token counts for pricing calibration when TELEMETRY_DIR is set
+        self.token_log = TokenLog.from_env(self.model_name)
+        self.visual_tokens_histogram = metrics.Histogram(
+            "vllm_visual_tokens_per_request",
+            description="Prompt tokens taken by image inputs per request.",
+            boundaries=[64, 128, 256, 512, 1024, 2048, 4096, 8192],
+        )
+
+    def prepare_image(self, image_base64: str, budget: ImageBudget, roi=None):
+        try:
+            return budget.apply(decode_base64_to_image(image_base64), roi)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+
+    def prepare_clip(self, prompt: str, frames: list, max_frames: int, max_side, budget: ImageBudget, roi=None):
+        """
+        Turn an ordered clip (a list of {"image", "timestamp"} dicts or plain base64 strings)
+        into one multimodal input. Clips longer than `max_frames` are evenly subsampled and
+        every frame is downscaled to `max_side` and fitted to the image budget.
+        """
+        frames = [frame if isinstance(frame, dict) else {"image": frame} for frame in frames]
+        frames = select_frames(frames, max_frames)
+        try:
+            images = [
+                budget.apply(downscale(decode_base64_to_image(frame["image"]), max_side), roi) for frame in frames
+            ]
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid frame: {str(e)}")
+        try:
+            return images, build_clip_prompt(prompt, [frame.get("timestamp") for frame in frames])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def count_visual_tokens(self, prompt: str, prompt_token_ids) -> int:
+        """Prompt tokens minus the tokens of the prompt text without image placeholders."""
+        tokenizer = await self.engine.get_tokenizer()
+        text_tokens = len(tokenizer.encode(prompt.replace(IMAGE_PLACEHOLDER, "")))
+        return max(len(prompt_token_ids or []) - text_tokens, 0)
+
+    def resolve_prompt(self, request_dict: dict) -> str:
+        """Return the raw `prompt`, or render `template_id` with `variables`."""
+        try:
+            return self.prompt_templates.resolve(request_dict)
+        except (KeyError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+
+    async def log_tokens(self, final_output, prompt: str, camera_id: Optional[str] = None) -> int:
+        """Observe a finished request's visual tokens and add it to the token log; returns the visual tokens."""
+        visual_tokens = await self.count_visual_tokens(prompt, final_output.prompt_token_ids)
+        self.visual_tokens_histogram.observe(visual_tokens)
+        if self.token_log is not None:
+            output = final_output.outputs[0]
+            self.token_log.record(
+                prompt_tokens=len(final_output.prompt_token_ids or []) - visual_tokens,
+                visual_tokens=visual_tokens,
+                output_tokens=len(output.token_ids),
+                prompt_chars=len(prompt),
+                output_chars=len(output.text),
+                camera_id=camera_id,
+            )
+        return visual_tokens
+
+    async def log_tokens_when_done(self, results_generator, prompt: str, camera_id: Optional[str] = None):
+        """Pass outputs through and log the tokens once a streamed generation completes."""
+        final_output = None
+        async for request_output in results_generator:
+            final_output = request_output
+            yield request_output
+        if final_output is not None:
+            await self.log_tokens(final_output, prompt, camera_id)
+
     async def stream_results(self, results_generator) -> AsyncGenerator[bytes, None]:
         num_returned = 0
         async for request_output in results_generator:
@@ -45,42 +160,193 @@ class VLLMPredictDeployment:
             yield (json.dumps(ret) + "\n").encode("utf-8")
             num_returned += len(text_output)
 
+    @staticmethod
+    def sampling_params(params: dict) -> SamplingParams:
+        try:
+            return SamplingParams(**params)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid sampling parameters: {str(e)}")
+
     async def may_abort_request(self, request_id) -> None:
         await self.engine.abort(request_id)
 
+    async def generate_batch(self, request_dict: dict) -> Response:
+        """
+        Generate completions for a list of items ({"prompt" or "template_id" + "variables",
+        "image", "camera_id"}).
+        All items are submitted to the engine at once so continuous batching schedules
+        them together; the remaining request fields are shared sampling parameters.
+        """
+        items = request_dict.pop("items", None)
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPException(status_code=400, detail="'items' must be a list of objects")
+        stream = request_dict.pop("stream", False)
+        sampling_params = self.sampling_params(request_dict)
+
+        async def run_item(index, item):
+            result = {"index": index, "camera_id": item.get("camera_id")}
+            try:
+                image = self.image_budget.apply(decode_base64_to_image(item["image"]), item.get("roi"))
+                inputs = {"prompt": self.resolve_prompt(dict(item)), "multi_modal_data": {"image": image}}
+                stats = {}
+                results_generator = self.engine_metrics.track_first_token(
+                    self.engine.generate(inputs, sampling_params, random_uuid()), time.perf_counter(), stats
+                )
+                final_output = None
+                async for request_output in results_generator:
+                    final_output = request_output
+                result["text"] = [output.text for output in final_output.outputs]
+                result.update(stats)
+                result["visual_tokens"] = await self.log_tokens(final_output, inputs["prompt"], item.get("camera_id"))
+            except Exception as e:
+                logger.error("Batch item %s failed: %s", index, e)
+                result["error"] = str(e)
+            return result
+
+        tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+
+        if stream:
+            async def stream_items() -> AsyncGenerator[bytes, None]:
+                for task in asyncio.as_completed(tasks):
+                    yield (json.dumps(await task) + "\n").encode("utf-8")
+
+            return StreamingResponse(stream_items(), media_type="application/x-ndjson")
+
+        results = await asyncio.gather(*tasks)
+        return Response(content=json.dumps({"results": results}))
+
+    async def chat_completions(self, request: Request, request_dict: dict) -> Response:
+        """
+        OpenAI-compatible chat completions. Images arrive as `image_url` data URIs and
+        `stream=true` returns `chat.completion.chunk` server-sent events.
+        """
+        try:
+            chat_request = ChatCompletionRequest(**request_dict)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        conversation, images = parse_messages(chat_request.messages)
+        images = [self.image_budget.apply(image) for image in images]
+        tokenizer = await self.engine.get_tokenizer()
+        prompt = tokenizer.apply_chat_template(
+            [{"role": m["role"], "content": m["content"]} for m in conversation],
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+
+        sampling_kwargs = {"max_tokens": chat_request.max_tokens or 512}
+        for name in ("temperature", "top_p", "stop"):
+            if getattr(chat_request, name) is not None:
+                sampling_kwargs[name] = getattr(chat_request, name)
+        sampling_params = SamplingParams(**sampling_kwargs)
+
+        inputs = {"prompt": prompt}
+        if images:
+            inputs["multi_modal_data"] = {"image": images if len(images) > 1 else images[0]}
+
+        request_id = random_uuid()
+        model_name = chat_request.model or self.model_name
+        stats = {}
+        results_generator = self.engine_metrics.track_first_token(
+            self.engine.generate(inputs, sampling_params, request_id), time.perf_counter(), stats
+        )
+
+        if chat_request.stream:
+            async def stream_chunks() -> AsyncGenerator[str, None]:
+                num_returned = 0
+                finish_reason = "stop"
+                async for request_output in self.log_tokens_when_done(results_generator, prompt):
+                    output = request_output.outputs[0]
+                    if len(output.text) > num_returned:
+                        yield chat_completion_chunk(request_id, model_name, output.text[num_returned:])
+                        num_returned = len(output.text)
+                    finish_reason = output.finish_reason or finish_reason
+                yield chat_completion_chunk(request_id, model_name, finish_reason=finish_reason)
+                yield SSE_DONE
+
+            background_tasks = BackgroundTasks()
+            background_tasks.add_task(self.may_abort_request, request_id)
+            return StreamingResponse(stream_chunks(), media_type="text/event-stream", background=background_tasks)
+
+        final_output = None
+        async for request_output in results_generator:
+            if await request.is_disconnected():
+                await self.engine.abort(request_id)
+                return Response(status_code=499)
+            final_output = request_output
+
+        await self.log_tokens(final_output, prompt)
+        output = final_output.outputs[0]
+        body = chat_completion_response(
+            request_id,
+            model_name,
+            output.text,
+            prompt_tokens=len(final_output.prompt_token_ids or []),
+            completion_tokens=len(output.token_ids),
+            finish_reason=output.finish_reason or "stop",
+        )
+        return Response(content=json.dumps(body), media_type="application/json")
+
     async def __call__(self, request: Request) -> Response:
         """
         Generate completion for multimodal input (text + image).
         """
         request_dict = await request.json()
-        prompt = request_dict.pop("prompt")  # Text prompt
+        if request.url.path.endswith("/infer_batch"):
+            return await self.generate_batch(request_dict)
+        if request.url.path.endswith("/v1/chat/completions"):
+            return await self.chat_completions(request, request_dict)
+        prompt = self.resolve_prompt(request_dict)  # Text prompt, raw or rendered from a template
         image_base64 = request_dict.pop("image", None)  # Base64 image data
+        frames = request_dict.pop("frames", None)  # Ordered clip of frames, optionally timestamped
+        try:
+            # Requests may lower the deployment's clip limits but not raise or disable them
+            max_frames = lower_limit(request_dict.pop("max_frames", None), self.max_frames_per_request, "max_frames")
+            frame_max_side = lower_limit(request_dict.pop("frame_max_side", None), self.frame_max_side, "frame_max_side")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         stream = request_dict.pop("stream", False)  # Streaming option
-
-        if image_base64:
-            image = decode_base64_to_image(image_base64)  # Decode image
+        output_mode = request_dict.pop("output_mode", "text")  # "alert" constrains output to a JSON schema
+        alert_schema = request_dict.pop("schema", ALERT_SCHEMA)
+        # Per-request budget; can only lower the deployment's max_pixels / max_slices
+        budget = self.image_budget.resolve(request_dict.pop("max_pixels", None), request_dict.pop("max_slices", None))
+        roi = request_dict.pop("roi", None)  # [x0, y0, x1, y1] as fractions of the frame
+        camera_id = request_dict.pop("camera_id", None)  # Only used for token accounting
+
+        if output_mode == "alert":
+            prompt = f"{prompt}\n{alert_instruction(alert_schema)}"
+            request_dict.setdefault("max_tokens", ALERT_MAX_TOKENS)
+            request_dict["guided_decoding"] = GuidedDecodingParams(json=alert_schema)
+
+        if frames:
+            image, prompt = self.prepare_clip(prompt, frames, max_frames, frame_max_side, budget, roi)
+        elif image_base64:
+            image = self.prepare_image(image_base64, budget, roi)  # Decode, crop and resize image
         else:
             raise HTTPException(status_code=400, detail="Image data is required.")
 
-        sampling_params = SamplingParams(**request_dict)
+        sampling_params = self.sampling_params(request_dict)
         request_id = random_uuid()
 
         # Combine text and image as multimodal input
         inputs = {
             "prompt": prompt,
             "multi_modal_data": {
-                "image": image  # Pass decoded image
+                "image": image  # Pass decoded image, or the list of clip frames
             }
         }
 
         # Generate using the multimodal inputs
-        results_generator = self.engine.generate(inputs, sampling_params, request_id)
+        stats = {}
+        results_generator = self.engine_metrics.track_first_token(
+            self.engine.generate(inputs, sampling_params, request_id), time.perf_counter(), stats
+        )
 
         if stream:
             background_tasks = BackgroundTasks()
             background_tasks.add_task(self.may_abort_request, request_id)
             return StreamingResponse(
-                self.stream_results(results_generator), background=background_tasks
+                self.stream_results(self.log_tokens_when_done(results_generator, prompt, camera_id)),
+                background=background_tasks,
             )
 
         # Non-streaming case
@@ -90,10 +356,21 @@ class VLLMPredictDeployment:
                 await self.engine.abort(request_id)
                 return Response(status_code=499)
             final_output = request_output
+            if output_mode == "alert" and extract_json_object(request_output.outputs[0].text):
+                # The alert object is closed; anything decoded after it is wasted
+                await self.engine.abort(request_id)
+                break
 
         assert final_output is not None
         text_outputs = [output.text for output in final_output.outputs]
-        return Response(content=json.dumps({"text": text_outputs}))
+        stats["output_tokens"] = len(final_output.outputs[0].token_ids)
+        if output_mode == "alert":
+            stats["alert"], stats["parse_error"] = parse_alert(text_outputs[0], alert_schema)
+            if stats["parse_error"] is not None:
+                self.alert_parse_failures_counter.inc()
+        stats["num_frames"] = len(image) if isinstance(image, list) else 1
+        stats["visual_tokens"] = await self.log_tokens(final_output, prompt, camera_id)
+        return Response(content=json.dumps({"text": text_outputs, **stats}))
 
 
 ########################### old code #########################
@@ -104,9 +381,9 @@ class MiniCPM_V_2_6_Int4:
             self.model = AutoModel.from_pretrained(self.model_name, trust_remote_code=True)
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, trust_remote_code=True)
             self.model.eval()
-            logger.info(f"Model {self.model_name} loaded successfully.")
+            logger.info("Model %s loaded successfully.", self.model_name)
         except Exception as e:
-            logger.error(f"Failed to load model {self.model_name}: {str(e)}")
+            logger.error("Failed to load model %s: %s", self.model_name, e)
             raise e
 
     def infer(self, base64_image: str, question: str):
@@ -117,7 +394,7 @@ class MiniCPM_V_2_6_Int4:
             logger.info("Inference completed successfully.")
             return result
         except Exception as e:
-            logger.error(f"Inference failed: {str(e)}")
+            logger.error("Inference failed: %s", e)
             raise e
 
 
@@ -148,7 +425,7 @@ async def infer(infer_request: MultimodalRequest):
         logger.info("Returning inference result.")
         return MultimodalResponse(prediction=prediction)
     except Exception as e:
-        logger.error(f"Error during inference request: {str(e)}")
+        logger.error("Error during inference request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1,44 +1,240 @@
-from transformers import AutoModel, AutoTokenizer
-from fastapi import FastAPI, HTTPException
+import json
+import time
+import uuid
+from typing import List, Optional
+import torch
+from transformers import AutoModel, AutoProcessor, AutoTokenizer
+from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from deployments.utils import logger, decode_base64_to_image
+from deployments.cache import build_response_cache
+from deployments.batching import BatchRequest, iter_batch_results, batch_response
+from deployments.streaming import serve_frame_stream
+from deployments.clips import IMAGE_PLACEHOLDER
+from deployments.image_budget import DEFAULT_MAX_SLICES, ImageBudget, estimate_visual_tokens
+from deployments.sessions import ChatSession, SessionStore, cache_length, decode_with_cache
+from deployments.alert_output import ALERT_MAX_TOKENS, alert_instruction, extract_json_object, parse_alert
+from deployments.alerts import AlertDispatcher
+from deployments.telemetry import TokenLog
+from deployments.profiling import profiler, router as profiling_router
+from deployments.openai_compat import (
+    ChatCompletionRequest, parse_messages, chat_completion_response, chat_completion_chunk, SSE_DONE
+)
 
 
 class MiniCPM_V_2_6_Int4:
     def load(self):
         self.model_name = "openbmb/MiniCPM-V-2_6-int4"
+        # IMAGE_MAX_PIXELS / IMAGE_MAX_SLICES bound the visual tokens spent per frame
+        self.image_budget = ImageBudget.from_env()
         try:
             self.model = AutoModel.from_pretrained(self.model_name, trust_remote_code=True)
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, trust_remote_code=True)
+            self.processor = AutoProcessor.from_pretrained(self.model_name, trust_remote_code=True)
             self.model.eval()
-            logger.info(f"Model {self.model_name} loaded successfully.")
+            logger.info("Model %s loaded successfully.", self.model_name)
         except Exception as e:
-            logger.error(f"Failed to load model {self.model_name}: {str(e)}")
+            logger.error("Failed to load model %s: %s", self.model_name, e)
             raise e
 
-    def infer(self, base64_image: str, question: str):
+    def preprocess(self, base64_image: str, budget: Optional[ImageBudget] = None, roi: Optional[List[float]] = None):
+        """Decode the frame, crop it to `roi` and resize it to fit the image budget."""
+        budget = budget or self.image_budget
+        return budget.apply(decode_base64_to_image(base64_image), roi)
+
+    def infer(
+        self,
+        image,
+        question: str,
+        sampling: bool = True,
+        temperature: float = 0.7,
+        max_new_tokens: int = 2048,
+        max_slices: Optional[int] = None,
+    ):
         try:
-            image = decode_base64_to_image(base64_image)
             msgs = [{'role': 'user', 'content': [image, question]}]
-            result = self.model.chat(image=None, msgs=msgs, tokenizer=self.tokenizer)
+            result = self.model.chat(
+                image=None,
+                msgs=msgs,
+                tokenizer=self.tokenizer,
+                sampling=sampling,
+                temperature=temperature,
+                max_new_tokens=max_new_tokens,
+                max_slice_nums=max_slices or self.image_budget.max_slices,
+            )
             logger.info("Inference completed successfully.")
             return result
         except Exception as e:
-            logger.error(f"Inference failed: {str(e)}")
+            logger.error("Inference failed: %s", e)
             raise e
 
+    def infer_batch(self, images, questions, sampling: bool = True, temperature: float = 0.7):
+        # model.chat runs a single padded generate when given a list of conversations.
+        msgs = [
+            [{'role': 'user', 'content': [self.image_budget.apply(image), question]}]
+            for image, question in zip(images, questions)
+        ]
+        results = self.model.chat(
+            image=None,
+            msgs=msgs,
+            tokenizer=self.tokenizer,
+            sampling=sampling,
+            temperature=temperature,
+            max_slice_nums=self.image_budget.max_slices,
+        )
+        logger.info("Batch inference of %d items completed successfully.", len(results))
+        return results
+
+    def start_session(self, session_id: str, image, question: str, max_slices: Optional[int] = None, **decode_kwargs):
+        """
+        First turn of a session: encode the image, prefill the prompt and decode, keeping the
+        past key values. Returns (session, answer, prefilled token count).
+        """
+        messages = [{'role': 'user', 'content': f"{IMAGE_PLACEHOLDER}\n{question}"}]
+        prompt = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        inputs = self.processor(
+            [prompt], [[image]], max_slice_nums=max_slices, return_tensors="pt", max_length=8192
+        ).to(self.model.device)
+        with torch.inference_mode():
+            inputs_embeds, _ = self.model.get_vllm_embedding({
+                "input_ids": inputs["input_ids"],
+                "pixel_values": inputs["pixel_values"],
+                "tgt_sizes": inputs["tgt_sizes"],
+                "image_bound": inputs["image_bound"],
+            })
+        tokens, past_key_values = decode_with_cache(
+            self.model.llm, None, self.terminator_ids(), inputs_embeds=inputs_embeds, **decode_kwargs
+        )
+        answer, cached_text = self._turn_text(prompt, tokens)
+        messages.append({'role': 'assistant', 'content': answer})
+        session = ChatSession(session_id, past_key_values, cached_text, messages, cache_length(past_key_values))
+        return session, answer, inputs["input_ids"].shape[1]
+
+    def continue_session(self, session: ChatSession, question: str, **decode_kwargs):
+        """Follow-up turn: only the new user turn is prefilled on top of the cached conversation."""
+        messages = session.messages + [{'role': 'user', 'content': question}]
+        prompt = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        if not prompt.startswith(session.cached_text):
+            raise ValueError("Chat template output no longer extends the cached conversation")
+        new_ids = self.tokenizer(
+            prompt[len(session.cached_text):], return_tensors="pt", add_special_tokens=False
+        ).input_ids.to(self.model.device)
+        tokens, past_key_values = decode_with_cache(
+            self.model.llm, session.past_key_values, self.terminator_ids(), input_ids=new_ids, **decode_kwargs
+        )
+        answer, cached_text = self._turn_text(prompt, tokens)
+        session.messages = messages + [{'role': 'assistant', 'content': answer}]
+        session.update(past_key_values, cached_text, cache_length(past_key_values))
+        return answer, new_ids.shape[1]
+
+    def terminator_ids(self):
+        return [self.tokenizer.convert_tokens_to_ids(token) for token in self.model.terminators]
+
+    def _turn_text(self, prompt: str, tokens):
+        """The answer, and the exact text now covered by the KV cache (prompt, answer and terminator)."""
+        terminated = tokens and tokens[-1] in self.terminator_ids()
+        answer = self.tokenizer.decode(tokens[:-1] if terminated else tokens)
+        terminator = self.tokenizer.convert_ids_to_tokens(tokens[-1]) if terminated else ""
+        return answer, prompt + answer + terminator
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def chat(self, msgs, system_prompt="", sampling=True, temperature=0.7, max_new_tokens=2048, stream=False):
+        """Multi-turn chat; with `stream=True` returns a generator of text chunks."""
+        return self.model.chat(
+            image=None,
+            msgs=msgs,
+            tokenizer=self.tokenizer,
+            system_prompt=system_prompt,
+            sampling=sampling,
+            temperature=temperature,
+            max_new_tokens=max_new_tokens,
+            stream=stream,
+        )
+
 
 app = FastAPI()
+app.include_router(profiling_router)
 model_instance = MiniCPM_V_2_6_Int4()
 model_instance.load()
+response_cache = build_response_cache(model_instance.model_name)
+# Per-camera conversations keep their KV cache between turns (SESSION_TTL_S, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES)
+session_store = SessionStore.from_env()
+# Alert-mode results are turned into client notifications when ALERT_NOTIFIER is set, see deployments/alerts.py
+alert_dispatcher = AlertDispatcher.from_env()
+# Per-request token counts for pricing calibration when TELEMETRY_DIR is set, see deployments/telemetry.py
+token_log = TokenLog.from_env(model_instance.model_name)
+
+
+def log_tokens(prompt: str, output: str, visual_tokens: int = 0, camera_id: Optional[str] = None):
+    """Record one generation in the token log; a no-op unless TELEMETRY_DIR is set."""
+    if token_log is None:
+        return
+    token_log.record(
+        prompt_tokens=model_instance.count_tokens(prompt),
+        visual_tokens=visual_tokens,
+        output_tokens=model_instance.count_tokens(output),
+        prompt_chars=len(prompt),
+        output_chars=len(output),
+        camera_id=camera_id,
+    )
+
 
 class MultimodalRequest(BaseModel):
     question: str
     base64_image: str
+    sampling: bool = True
+    temperature: float = 0.7
+    output_mode: str = "text"  # "alert" returns a compact JSON alert, see deployments/alert_output.py
+    # Per-request image budget; can only lower the deployment's IMAGE_MAX_PIXELS / IMAGE_MAX_SLICES
+    max_pixels: Optional[int] = None
+    max_slices: Optional[int] = None
+    roi: Optional[List[float]] = None  # [x0, y0, x1, y1] as fractions of the frame
+    # Alert mode: who gets notified about this frame
+    client_id: Optional[str] = None
+    camera_id: Optional[str] = None
 
 
 class MultimodalResponse(BaseModel):
     prediction: str
+    cache_hit: bool = False
+    output_tokens: Optional[int] = None
+    alert: Optional[dict] = None
+    parse_error: Optional[str] = None
+    visual_tokens: Optional[int] = None
+    alerts_fired: Optional[List[str]] = None  # Rules that queued a notification for this frame
+
+
+class SessionRequest(BaseModel):
+    question: str
+    base64_image: str
+    session_id: Optional[str] = None  # e.g. the camera id; generated when omitted
+    sampling: bool = True
+    temperature: float = 0.7
+    max_new_tokens: int = 512
+    max_slices: Optional[int] = None
+
+
+class SessionTurnRequest(BaseModel):
+    question: str
+    sampling: bool = True
+    temperature: float = 0.7
+    max_new_tokens: int = 512
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    prediction: str
+    prefill_tokens: int  # Tokens computed for this turn
+    cached_tokens: int  # Tokens reused from the session's KV cache
+    latency_s: float
+
+
+class MiniCPMBatchRequest(BatchRequest):
+    sampling: bool = True
+    temperature: float = 0.7
 
 
 @app.get("/health_check")
@@ -49,16 +245,244 @@ async def health_check():
 
 @app.post("/infer")
 async def infer(infer_request: MultimodalRequest):
+    # Covers cache hits too, so `requests=K` counts requests rather than model calls
+    with profiler.request():
+        try:
+            logger.info("Received inference request.")
+            alert_mode = infer_request.output_mode == "alert"
+            question = infer_request.question
+            if alert_mode:
+                question = f"{question}\n{alert_instruction()}"
+
+            budget = model_instance.image_budget.resolve(infer_request.max_pixels, infer_request.max_slices)
+
+            # Sampled generations are not reproducible, so only greedy requests use the cache.
+            # The key hashes the raw base64, so a hit skips decoding and resizing the frame.
+            cache_key = None
+            cached = None
+            if response_cache is not None and not infer_request.sampling:
+                cache_params = {
+                    "sampling": False,
+                    "max_pixels": budget.max_pixels,
+                    "max_slices": budget.max_slices,
+                    "roi": infer_request.roi,
+                }
+                cache_key = response_cache.make_key(infer_request.base64_image, question, cache_params)
+                cached = response_cache.get(cache_key)
+            cache_hit = cached is not None
+
+            if cache_hit:
+                # Stored with its visual token count, which would otherwise need the decoded frame
+                entry = json.loads(cached)
+                prediction, visual_tokens = entry["prediction"], entry["visual_tokens"]
+                logger.info("Returning cached inference result.")
+            else:
+                try:
+                    image = model_instance.preprocess(infer_request.base64_image, budget, infer_request.roi)
+                except (ValueError, OSError) as e:  # Bad base64, bytes PIL can't identify, or a bad roi
+                    raise HTTPException(status_code=400, detail=str(e))
+                visual_tokens = estimate_visual_tokens(image, budget.max_slices)
+                prediction = model_instance.infer(
+                    image,
+                    question,
+                    sampling=infer_request.sampling,
+                    temperature=infer_request.temperature,
+                    max_new_tokens=ALERT_MAX_TOKENS if alert_mode else 2048,
+                    max_slices=budget.max_slices,
+                )
+                if cache_key is not None:
+                    response_cache.set(cache_key, json.dumps({"prediction": prediction, "visual_tokens": visual_tokens}))
+                logger.info("Returning inference result.")
+
+            response = MultimodalResponse(prediction=prediction, cache_hit=cache_hit, visual_tokens=visual_tokens)
+            if alert_mode:
+                # model.chat doesn't forward stopping criteria to generate, so the output is bounded
+                # by ALERT_MAX_TOKENS and anything after the closed object is dropped here.
+                response.prediction = extract_json_object(prediction) or prediction
+                response.alert, response.parse_error = parse_alert(prediction)
+                if alert_dispatcher is not None and infer_request.client_id and infer_request.camera_id:
+                    fired = alert_dispatcher.submit(infer_request.client_id, infer_request.camera_id, response.alert)
+                    response.alerts_fired = [alert.rule for alert in fired]
+            # Counted on the untrimmed output: trimming doesn't give back tokens that were generated
+            response.output_tokens = model_instance.count_tokens(prediction)
+            if not cache_hit:
+                log_tokens(question, prediction, response.visual_tokens, infer_request.camera_id)
+            return response
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Error during inference request: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/infer_batch")
+async def infer_batch(batch_request: MiniCPMBatchRequest):
+    logger.info("Received batch inference request with %d items.", len(batch_request.items))
+
+    def run_batch(images, questions):
+        return model_instance.infer_batch(
+            images, questions, sampling=batch_request.sampling, temperature=batch_request.temperature
+        )
+
+    results = iter_batch_results(
+        batch_request.items,
+        run_batch,
+        response_cache=None if batch_request.sampling else response_cache,
+        cache_params={"sampling": False},
+    )
+    return await batch_response(results, batch_request.stream)
+
+
+@app.post("/sessions")
+async def create_session(session_request: SessionRequest):
     try:
-        logger.info("Received inference request.")
-        prediction = model_instance.infer(infer_request.base64_image, infer_request.question)
-        logger.info("Returning inference result.")
-        return MultimodalResponse(prediction=prediction)
+        logger.info("Received session request.")
+        start = time.perf_counter()
+        # Same budget as /infer: a request can lower IMAGE_MAX_SLICES but not raise it
+        budget = model_instance.image_budget.resolve(None, session_request.max_slices)
+        try:
+            image = model_instance.preprocess(session_request.base64_image, budget)
+        except (ValueError, OSError) as e:  # Bad base64 or bytes PIL can't identify
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+        session_id = session_request.session_id or session_store.new_id()
+        session, answer, prefill_tokens = model_instance.start_session(
+            session_id,
+            image,
+            session_request.question,
+            max_slices=budget.max_slices or DEFAULT_MAX_SLICES,
+            max_new_tokens=session_request.max_new_tokens,
+            sampling=session_request.sampling,
+            temperature=session_request.temperature,
+        )
+        session_store.put(session)
+        log_tokens(session_request.question, answer, estimate_visual_tokens(image, budget.max_slices))
+        return SessionResponse(
+            session_id=session_id,
+            prediction=answer,
+            prefill_tokens=prefill_tokens,
+            cached_tokens=0,
+            latency_s=time.perf_counter() - start,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error during inference request: {str(e)}")
+        logger.error("Error during session request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/sessions/{session_id}/turns")
+async def session_turn(session_id: str, turn_request: SessionTurnRequest):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    try:
+        logger.info("Received follow-up turn for session %s.", session_id)
+        start = time.perf_counter()
+        with session.lock:
+            cached_tokens = session.num_tokens
+            answer, prefill_tokens = model_instance.continue_session(
+                session,
+                turn_request.question,
+                max_new_tokens=turn_request.max_new_tokens,
+                sampling=turn_request.sampling,
+                temperature=turn_request.temperature,
+            )
+        # Re-insert so the store re-checks the memory cap with the grown cache
+        session_store.put(session)
+        # The frame is already in the session's KV cache, so a follow-up turn spends no visual tokens
+        log_tokens(turn_request.question, answer)
+        return SessionResponse(
+            session_id=session_id,
+            prediction=answer,
+            prefill_tokens=prefill_tokens,
+            cached_tokens=cached_tokens,
+            latency_s=time.perf_counter() - start,
+        )
+    except Exception as e:
+        # A failed turn may have partially extended the cache, so the session can't be trusted
+        session_store.delete(session_id)
+        logger.error("Error during session turn: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return {"deleted": session_id}
+
+
+@app.get("/sessions")
+async def session_stats():
+    return session_store.stats()
+
+
+@app.on_event("shutdown")
+async def close_alert_dispatcher():
+    # Delivers whatever is still queued before the process exits
+    if alert_dispatcher is not None:
+        await alert_dispatcher.close()
+
+
+@app.get("/alerts")
+async def alert_stats():
+    if alert_dispatcher is None:
+        raise HTTPException(status_code=404, detail="Alert dispatch is disabled (ALERT_NOTIFIER=off).")
+    return alert_dispatcher.stats()
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(chat_request: ChatCompletionRequest):
+    try:
+        logger.info("Received chat completion request.")
+        conversation, images = parse_messages(chat_request.messages)
+        system_prompt = "\n".join(m["content"] for m in conversation if m["role"] == "system")
+        # MiniCPM takes images as separate content items ahead of the text
+        msgs = [
+            {"role": m["role"], "content": m["images"] + [m["content"].replace(IMAGE_PLACEHOLDER, "").strip()]}
+            for m in conversation if m["role"] != "system"
+        ]
+        chat_kwargs = {
+            "system_prompt": system_prompt,
+            "sampling": chat_request.temperature is None or chat_request.temperature > 0,
+            "temperature": chat_request.temperature or 0.7,
+            "max_new_tokens": chat_request.max_tokens or 2048,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model_name = chat_request.model or model_instance.model_name
+        prompt_text = "\n".join(m["content"].replace(IMAGE_PLACEHOLDER, "").strip() for m in conversation)
+        visual_tokens = sum(estimate_visual_tokens(image) for image in images)
+
+        if chat_request.stream:
+            def stream_chunks():
+                chunks = []
+                for text in model_instance.chat(msgs, stream=True, **chat_kwargs):
+                    chunks.append(text)
+                    yield chat_completion_chunk(completion_id, model_name, text)
+                yield chat_completion_chunk(completion_id, model_name, finish_reason="stop")
+                yield SSE_DONE
+                log_tokens(prompt_text, "".join(chunks), visual_tokens)
+
+            return StreamingResponse(stream_chunks(), media_type="text/event-stream")
+
+        text = model_instance.chat(msgs, **chat_kwargs)
+        completion_tokens = model_instance.count_tokens(text)
+        log_tokens(prompt_text, text, visual_tokens)
+        logger.info("Returning chat completion.")
+        return chat_completion_response(completion_id, model_name, text, completion_tokens=completion_tokens)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error during chat completion request: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.websocket("/ws/infer")
+async def ws_infer(websocket: WebSocket):
+    logger.info("Frame stream connected.")
+    await serve_frame_stream(websocket, model_instance.infer_batch)
+
+
 def main():
     import uvicorn
     logger.info("Starting FastAPI server...")
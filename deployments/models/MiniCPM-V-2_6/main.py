@@ -1,6 +1,8 @@
-from fastapi import FastAPI, HTTPException
+import os
+import time
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from PIL import Image
 import base64
 import io
@@ -8,9 +10,11 @@ import ray
 import ray.serve as serve
 from transformers import AutoTokenizer, AutoModel
 import torch
+from deployments.tracing import TRACE_HEADER, StageTimer, TraceContext, Tracer, make_span
 
 # Initialize FastAPI app
 app = FastAPI()
+tracer = Tracer.from_env()
 
 # Define the request schema
 class RequestModel(BaseModel):
@@ -47,24 +51,39 @@ class MiniCPMService:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = self.model.eval().to(self.device)
 
+    async def __call__(self, request: RequestModel, trace: Optional[TraceContext] = None):
+        # Arrival time rides along so the batch can report how long each request waited for it
+        return await self.handle_batch((request, trace, time.time()))
+
     @serve.batch(max_batch_size=8, batch_wait_timeout_s=0.1)
-    async def __call__(self, request_list: List[RequestModel]):
+    async def handle_batch(self, request_list: List[tuple]):
         # Since model.chat might not support batch processing directly,
         # we'll process each request individually
+        stages = StageTimer(len(request_list))
         results = []
-        for request in request_list:
+        for position, (request, trace, arrived_at) in enumerate(request_list):
+            decode_start = time.time()
             text = request.text
             image = decode_image(request.image_base64)
             msgs = [{'role': 'user', 'content': [image, text]}]
 
             # Perform inference using model.chat
+            chat_start = time.time()
             with torch.no_grad():
                 response = self.model.chat(
                     image=None,
                     msgs=msgs,
                     tokenizer=self.tokenizer
                 )
-            results.append(response)
+            if trace is None:
+                results.append(response)
+                continue
+            # Requests run one after another, so later ones in the batch also wait on earlier ones
+            attributes = {"position": position, "replica": os.getpid()}
+            spans = stages.spans_for(trace, arrived_at, **attributes)
+            spans.append(make_span(trace, "decode", decode_start, chat_start, **attributes))
+            spans.append(make_span(trace, "generate", chat_start, time.time(), **attributes))
+            results.append({"response": response, "spans": spans})
 
         return results
 
@@ -73,11 +92,26 @@ MiniCPMService.deploy()
 
 # FastAPI Route
 @app.post("/predict")
-async def predict(request: RequestModel):
+async def predict(request: RequestModel, response: Response, x_trace_id: Optional[str] = Header(None)):
+    trace = tracer.start_trace(x_trace_id)
     # Forward the request to the Ray Serve deployment
     handle = serve.get_deployment("MiniCPMService").get_handle()
-    result = await handle.remote(request)
-    return {"result": await result}
+    with tracer.span(trace, "ingress", route="/predict") as ingress:
+        result = await handle.remote(request, ingress and ingress.handoff())
+        output = await result
+    if trace is not None:
+        tracer.record(output["spans"])
+        response.headers[TRACE_HEADER] = trace.trace_id
+        output = output["response"]
+    return {"result": output}
+
+
+@app.get("/traces")
+async def traces(limit: int = 50, trace_id: Optional[str] = None, min_duration_ms: float = 0.0):
+    return {
+        "stages": tracer.stage_summary(),
+        "traces": tracer.traces(limit=limit, trace_id=trace_id, min_duration_ms=min_duration_ms),
+    }
 
 # Run the app
 if __name__ == "__main__":
@@ -1,16 +1,18 @@
 import os
 import json
 import logging
-from fastapi import FastAPI, HTTPException
+import time
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from PIL import Image
 import base64
 import io
 import ray
 import ray.serve as serve
 from transformers import BlipProcessor, BlipForQuestionAnswering
-from utils.logger import Logger
+from deployments.utils import Logger
+from deployments.tracing import TRACE_HEADER, StageTimer, TraceContext, Tracer
 import torch
 
 # Disable Ray's log deduplication
@@ -18,6 +20,7 @@ os.environ["RAY_DEDUP_LOGS"] = "0"
 
 # Initialize FastAPI app
 app = FastAPI()
+tracer = Tracer.from_env()
 
 
 # Define the request schema with image and text
@@ -56,7 +59,7 @@ serve.start()
 class BlipService:
     def __init__(self):
         # Initialize custom logger for each replica
-        self.logger = Logger(logging.DEBUG).get_logger()
+        self.logger = Logger().get_logger()
         self.logger.info("Initializing BlipService")
 
         # Load BLIP model for Visual Question Answering
@@ -64,33 +67,46 @@ class BlipService:
         self.model = BlipForQuestionAnswering.from_pretrained("Salesforce/blip-vqa-base")
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = self.model.eval().to(self.device)
-        self.logger.info(f"BLIP model loaded and moved to {self.device}")
+        self.logger.info("BLIP model loaded and moved to %s", self.device)
+
+    async def __call__(self, request, trace: Optional[TraceContext] = None):
+        # Arrival time rides along so the batch can report how long each request waited for it
+        return await self.handle_batch((request, trace, time.time()))
 
     @serve.batch(max_batch_size=4, batch_wait_timeout_s=1.0)
-    async def __call__(self, request_list):
-        self.logger.info(f"Replica {os.getpid()} processing batch of size: {len(request_list)}")
+    async def handle_batch(self, request_list):
+        self.logger.info("Replica %d processing batch of size: %d", os.getpid(), len(request_list))
+        stages = StageTimer(len(request_list))
 
-        # Use the RequestModel's helper to process Ray's Request objects
-        request_models = [await RequestModel.from_request(request) for request in request_list]
+        with stages.stage("decode"):
+            # Use the RequestModel's helper to process Ray's Request objects
+            request_models = [await RequestModel.from_request(request) for request, _, _ in request_list]
 
-        # Decode images and extract questions
-        images = [decode_image(req_model.image_base64) for req_model in request_models]
-        questions = [req_model.question for req_model in request_models]
+            # Decode images and extract questions
+            images = [decode_image(req_model.image_base64) for req_model in request_models]
+            questions = [req_model.question for req_model in request_models]
 
         # Process the inputs using the BLIP processor
-        inputs = self.processor(images, questions, return_tensors="pt").to(self.device)
-        self.logger.info(f"Processed inputs: {inputs}")
+        with stages.stage("processor"):
+            inputs = self.processor(images, questions, return_tensors="pt").to(self.device)
+        # Only shapes: formatting whole tensors costs more than the batch itself
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Processed inputs: %s", {name: tuple(tensor.shape) for name, tensor in inputs.items()})
 
         # Perform inference
-        with torch.no_grad():
+        with stages.stage("generate"), torch.no_grad():
             outputs = self.model.generate(**inputs)
 
         # Decode outputs to human-readable answers
-        answers = [self.processor.decode(output, skip_special_tokens=True) for output in outputs]
-        self.logger.info(f"Batch processed with answers: {answers}")
+        with stages.stage("postprocess"):
+            answers = [self.processor.decode(output, skip_special_tokens=True) for output in outputs]
+        self.logger.debug("Batch processed with answers: %s", answers)
 
         # Return results as list of dictionaries
         results = [{"question": question, "answer": answer} for question, answer in zip(questions, answers)]
+        for result, (_, trace, arrived_at) in zip(results, request_list):
+            if trace is not None:
+                result["spans"] = stages.spans_for(trace, arrived_at, replica=os.getpid())
         return results
 
 
@@ -100,11 +116,25 @@ serve.run(BlipService.bind())
 
 # FastAPI Route
 @app.post("/predict")
-async def predict(request: RequestModel):
+async def predict(request: RequestModel, response: Response, x_trace_id: Optional[str] = Header(None)):
+    trace = tracer.start_trace(x_trace_id)
     # Forward the request to the Ray Serve deployment
     handle = serve.get_deployment("BlipService").get_handle()
-    result = await handle.remote(request)
-    return {"result": await result}
+    with tracer.span(trace, "ingress", route="/predict") as ingress:
+        result = await handle.remote(request, ingress and ingress.handoff())
+        output = await result
+    if trace is not None:
+        tracer.record(output.pop("spans", []))
+        response.headers[TRACE_HEADER] = trace.trace_id
+    return {"result": output}
+
+
+@app.get("/traces")
+async def traces(limit: int = 50, trace_id: Optional[str] = None, min_duration_ms: float = 0.0):
+    return {
+        "stages": tracer.stage_summary(),
+        "traces": tracer.traces(limit=limit, trace_id=trace_id, min_duration_ms=min_duration_ms),
+    }
 
 
 # Run the app
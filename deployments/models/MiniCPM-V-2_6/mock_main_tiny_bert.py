@@ -68,7 +68,7 @@ class TinyBERTService:
 
     @serve.batch(max_batch_size=8, batch_wait_timeout_s=0.5)
     async def __call__(self, request_list):
-        self.logger.info(f"Replica {os.getpid()} processing batch of size: {len(request_list)}")
+        self.logger.info("Replica %d processing batch of size: %d", os.getpid(), len(request_list))
 
         # Use the RequestModel's helper to process Ray's Request objects
         request_models = [await RequestModel.from_request(request) for request in request_list]
@@ -76,17 +76,17 @@ class TinyBERTService:
 
         # Tokenize the batch of texts
         inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True).to(self.device)
-        self.logger.info(f"Tokenized inputs: {inputs}")
+        self.logger.debug("Tokenized inputs: %s", {name: tuple(tensor.shape) for name, tensor in inputs.items()})
 
         # Perform inference
         with torch.no_grad():
             outputs = self.model(**inputs)
-        self.logger.info(f"Inference outputs: {outputs.logits}")
+        self.logger.debug("Inference outputs: logits %s", tuple(outputs.logits.shape))
 
         # Generate results for each input
         predictions = torch.argmax(outputs.logits, dim=-1)
         results = [{"text": text, "prediction": int(pred)} for text, pred in zip(texts, predictions)]
-        self.logger.info(f"Batch processed with results: {results}")
+        self.logger.debug("Batch processed with results: %s", results)
 
         return results
 
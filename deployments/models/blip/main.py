@@ -1,36 +1,19 @@
-from transformers import BlipProcessor, BlipForQuestionAnswering
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket
 from pydantic import BaseModel
-from deployments.utils import logger, decode_base64_to_image
-
-
-class BLIPVQAModel:
-    def load(self):
-        self.model_name = "Salesforce/blip-vqa-base"
-        try:
-            self.processor = BlipProcessor.from_pretrained(self.model_name)
-            self.model = BlipForQuestionAnswering.from_pretrained(self.model_name)
-            logger.info(f"Model {self.model_name} loaded successfully.")
-        except Exception as e:
-            logger.error(f"Failed to load model {self.model_name}: {str(e)}")
-            raise e
-
-    def infer(self, base64_image: str, question: str):
-        try:
-            image = decode_base64_to_image(base64_image)
-            inputs = self.processor(image, question, return_tensors="pt")
-            output = self.model.generate(**inputs)
-            answer = self.processor.decode(output[0], skip_special_tokens=True)
-            logger.info("Inference completed successfully.")
-            return answer
-        except Exception as e:
-            logger.error(f"Inference failed: {str(e)}")
-            raise e
+from deployments.utils import logger
+from deployments.cache import build_response_cache
+from deployments.batching import BatchRequest, iter_batch_results, batch_response
+from deployments.streaming import serve_frame_stream
+from deployments.profiling import profiler, router as profiling_router
+from deployments.models.blip.model import BLIPVQAModel
 
 
 app = FastAPI()
+app.include_router(profiling_router)
 model_instance = BLIPVQAModel()
 model_instance.load()
+# BLIP VQA decodes greedily, so every prediction is cacheable.
+response_cache = build_response_cache(model_instance.model_name, variant=model_instance.variant)
 
 
 class MultimodalRequest(BaseModel):
@@ -40,6 +23,7 @@ class MultimodalRequest(BaseModel):
 
 class MultimodalResponse(BaseModel):
     prediction: str
+    cache_hit: bool = False
 
 
 @app.get("/health_check")
@@ -50,16 +34,42 @@ async def health_check():
 
 @app.post("/infer")
 async def infer(infer_request: MultimodalRequest):
-    try:
-        logger.info("Received inference request.")
-        prediction = model_instance.infer(
-            infer_request.base64_image, infer_request.question
-        )
-        logger.info("Returning inference result.")
-        return MultimodalResponse(prediction=prediction)
-    except Exception as e:
-        logger.error(f"Error during inference request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Covers cache hits too, so `requests=K` counts requests rather than model calls
+    with profiler.request():
+        try:
+            logger.info("Received inference request.")
+            cache_key = None
+            if response_cache is not None:
+                cache_key = response_cache.make_key(infer_request.base64_image, infer_request.question)
+                cached_prediction = response_cache.get(cache_key)
+                if cached_prediction is not None:
+                    logger.info("Returning cached inference result.")
+                    return MultimodalResponse(prediction=cached_prediction, cache_hit=True)
+            prediction = model_instance.infer(
+                infer_request.base64_image, infer_request.question
+            )
+            if cache_key is not None:
+                response_cache.set(cache_key, prediction)
+            logger.info("Returning inference result.")
+            return MultimodalResponse(prediction=prediction)
+        except Exception as e:
+            logger.error("Error during inference request: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/infer_batch")
+async def infer_batch(batch_request: BatchRequest):
+    logger.info("Received batch inference request with %d items.", len(batch_request.items))
+    results = iter_batch_results(
+        batch_request.items, model_instance.infer_batch, response_cache=response_cache
+    )
+    return await batch_response(results, batch_request.stream)
+
+
+@app.websocket("/ws/infer")
+async def ws_infer(websocket: WebSocket):
+    logger.info("Frame stream connected.")
+    await serve_frame_stream(websocket, model_instance.infer_batch)
 
 
 def main():
@@ -0,0 +1,90 @@
+import os
+import torch
+from transformers import BlipProcessor, BlipForQuestionAnswering
+from deployments.utils import logger, decode_base64_to_image
+from deployments.model_cache import load_model, load_processor
+from deployments.quantization import BLIP_QUANTIZATION, apply_quantization
+from deployments.runtime_profile import RuntimeProfile
+
+
+class BLIPVQAModel:
+    def load(self):
+        # BLIP_MODEL_NAME lets benchmarks swap in a tiny randomly initialised checkpoint on CPU
+        self.model_name = os.getenv("BLIP_MODEL_NAME", "Salesforce/blip-vqa-base")
+        # Thread pools sized to this replica's CPUs (TORCH_NUM_THREADS / CPU_AFFINITY), see runtime_profile.py
+        # Applied before loading so the thread pools created while loading inherit the settings
+        self.runtime_profile = RuntimeProfile.from_env()
+        self.runtime_profile.apply()
+        try:
+            # Memory-mapped from MODEL_CACHE_DIR when prepared, see deployments/model_cache.py
+            self.processor = load_processor(BlipProcessor, self.model_name)
+            self.model = self.load_onnx() if os.getenv("BLIP_BACKEND", "torch") == "onnx" else None
+            # What actually serves the requests, which the ONNX fallback can change; part of the cache key
+            self.variant = "onnx"
+            if self.model is None:
+                self.model = load_model(BlipForQuestionAnswering, self.model_name)
+                # BLIP_QUANTIZATION=int8 quantizes the linear layers for the CPU-only edge nodes
+                self.model = apply_quantization(self.model)
+                self.variant = f"torch-{BLIP_QUANTIZATION}"
+            self.model = self.runtime_profile.compile(self.model)
+            logger.info("Model %s loaded successfully.", self.model_name)
+        except Exception as e:
+            logger.error("Failed to load model %s: %s", self.model_name, e)
+            raise e
+
+    def load_onnx(self):
+        """ONNX Runtime generator from BLIP_ONNX_DIR (see onnx_export.py), or None to fall back to PyTorch."""
+        export_dir = os.getenv("BLIP_ONNX_DIR", "")
+        try:
+            from deployments.models.blip.onnx_backend import BlipOnnxGenerator
+            return BlipOnnxGenerator(export_dir, num_threads=self.runtime_profile.num_threads)
+        except Exception as e:
+            logger.warning("ONNX backend unavailable (%s); falling back to PyTorch.", e)
+            return None
+
+    def infer(self, base64_image: str, question: str):
+        try:
+            image = decode_base64_to_image(base64_image)
+            inputs = self.processor(image, question, return_tensors="pt")
+            with self.runtime_profile.inference_context():
+                output = self.model.generate(**inputs)
+            answer = self.processor.decode(output[0], skip_special_tokens=True)
+            logger.info("Inference completed successfully.")
+            return answer
+        except Exception as e:
+            logger.error("Inference failed: %s", e)
+            raise e
+
+    def infer_batch(self, images, questions):
+        inputs = self.processor(images, questions, return_tensors="pt", padding=True)
+        with self.runtime_profile.inference_context():
+            outputs = self.model.generate(**inputs)
+        answers = self.processor.batch_decode(outputs, skip_special_tokens=True)
+        logger.info("Batch inference of %d items completed successfully.", len(answers))
+        return answers
+
+    def yes_probability(self, images, questions):
+        """
+        P("yes") against P("no") for yes/no gate questions, from the decoder's first step, so a
+        threshold can trade recall for escalations. The ONNX backend only returns answers, so
+        it scores 1.0 for "yes" and 0.0 otherwise.
+        """
+        if not isinstance(self.model, BlipForQuestionAnswering):
+            return [1.0 if answer.strip().lower() == "yes" else 0.0 for answer in self.infer_batch(images, questions)]
+        inputs = self.processor(images, questions, return_tensors="pt", padding=True)
+        with self.runtime_profile.inference_context():
+            image_embeds = self.model.vision_model(pixel_values=inputs["pixel_values"])[0]
+            question_embeds = self.model.text_encoder(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                encoder_hidden_states=image_embeds,
+                encoder_attention_mask=torch.ones(image_embeds.shape[:-1], dtype=torch.long),
+            )[0]
+            bos_ids = torch.full((len(questions), 1), self.model.decoder_start_token_id, dtype=torch.long)
+            logits = self.model.text_decoder(
+                input_ids=bos_ids,
+                encoder_hidden_states=question_embeds,
+                encoder_attention_mask=torch.ones(question_embeds.shape[:-1], dtype=torch.long),
+            ).logits[:, -1, :]
+        yes_no_ids = self.processor.tokenizer.convert_tokens_to_ids(["yes", "no"])
+        return torch.softmax(logits[:, yes_no_ids].float(), dim=-1)[:, 0].tolist()
@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+import onnxruntime as ort
+
+from deployments.utils import logger
+from deployments.models.blip.onnx_export import CONFIG_FILE
+
+
+class BlipOnnxGenerator:
+    """
+    Greedy BLIP VQA generation on ONNX Runtime, a drop-in for `BlipForQuestionAnswering.generate`.
+
+    The decoder loop runs on IO bindings: each step's present key/value OrtValues are bound
+    directly as the next step's past inputs, so the cache never round-trips through numpy.
+    """
+
+    def __init__(self, export_dir: str, providers=None, num_threads: int = 0):
+        with open(os.path.join(export_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.providers = providers or default_providers()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads  # 0 lets ONNX Runtime use every core
+
+        def session(name):
+            return ort.InferenceSession(os.path.join(export_dir, name), options, providers=self.providers)
+
+        self.vision_encoder = session("vision_encoder.onnx")
+        self.text_encoder = session("text_encoder.onnx")
+        self.text_decoder = session("text_decoder.onnx")
+        self.past_names = [i.name for i in self.text_decoder.get_inputs() if i.name.startswith("past.")]
+        self.present_names = [o.name for o in self.text_decoder.get_outputs() if o.name.startswith("present.")]
+        # The provider the session actually got: ONNX Runtime falls back when a requested one can't load
+        provider = self.vision_encoder.get_providers()[0]
+        self.device = "cuda" if provider == "CUDAExecutionProvider" else "cpu"
+        logger.info("Loaded BLIP ONNX graphs from %s on %s", export_dir, provider)
+
+    def _ortvalue(self, array: np.ndarray):
+        return ort.OrtValue.ortvalue_from_numpy(np.ascontiguousarray(array), self.device, 0)
+
+    def _run(self, session, inputs: dict, output_names):
+        binding = session.io_binding()
+        for name, value in inputs.items():
+            binding.bind_ortvalue_input(name, value)
+        for name in output_names:
+            binding.bind_output(name, self.device)
+        session.run_with_iobinding(binding)
+        return binding.get_outputs()
+
+    def generate(self, pixel_values, input_ids, attention_mask=None, max_length: int = None, **_) -> np.ndarray:
+        pixel_values = _to_numpy(pixel_values).astype(np.float32)
+        input_ids = _to_numpy(input_ids).astype(np.int64)
+        attention_mask = np.ones_like(input_ids) if attention_mask is None else _to_numpy(attention_mask).astype(np.int64)
+        max_length = max_length or self.config["max_length"]
+        batch = input_ids.shape[0]
+
+        image_embeds, = self._run(self.vision_encoder, {"pixel_values": self._ortvalue(pixel_values)}, ["image_embeds"])
+        question_embeds, = self._run(
+            self.text_encoder,
+            {
+                "input_ids": self._ortvalue(input_ids),
+                "attention_mask": self._ortvalue(attention_mask),
+                "image_embeds": image_embeds,
+            },
+            ["question_embeds"],
+        )
+
+        empty = np.zeros((batch, self.config["num_heads"], 0, self.config["head_dim"]), dtype=np.float32)
+        past = {name: self._ortvalue(empty) for name in self.past_names}
+        tokens = np.full((batch, 1), self.config["decoder_start_token_id"], dtype=np.int64)
+        sequences = [tokens]
+        finished = np.zeros(batch, dtype=bool)
+
+        while len(sequences) < max_length and not finished.all():
+            outputs = self._run(
+                self.text_decoder,
+                {"input_ids": self._ortvalue(tokens), "encoder_hidden_states": question_embeds, **past},
+                ["logits", *self.present_names],
+            )
+            next_tokens = outputs[0].numpy().argmax(axis=-1)
+            next_tokens = np.where(finished, self.config["pad_token_id"], next_tokens)
+            finished |= next_tokens == self.config["eos_token_id"]
+            tokens = next_tokens[:, None].astype(np.int64)
+            sequences.append(tokens)
+            past = dict(zip(self.past_names, outputs[1:]))
+        return np.concatenate(sequences, axis=1)
+
+
+def default_providers() -> list:
+    """
+    CUDA with CPU fallback when the CUDA provider is installed, otherwise CPU. Not every available
+    provider: some builds list AzureExecutionProvider first, which doesn't run the graphs locally.
+    """
+    if "CUDAExecutionProvider" in ort.get_available_providers():
+        return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+
+def _to_numpy(value) -> np.ndarray:
+    if hasattr(value, "detach"):
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
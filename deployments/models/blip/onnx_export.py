@@ -0,0 +1,164 @@
+"""
+Export BLIP VQA to three ONNX graphs for `onnx_backend.BlipOnnxGenerator`:
+
+- vision_encoder.onnx: pixel_values -> image_embeds
+- text_encoder.onnx: input_ids, attention_mask, image_embeds -> question_embeds
+- text_decoder.onnx: one decoding step with the self-attention past key values as inputs and outputs
+
+    python -m deployments.models.blip.onnx_export --model Salesforce/blip-vqa-base --output /app/model_cache/blip-onnx
+"""
+import argparse
+import inspect
+import json
+import os
+
+import torch
+from transformers import BlipForQuestionAnswering
+
+from deployments.utils import logger
+
+CONFIG_FILE = "blip_onnx.json"
+OPSET = 17
+
+
+class VisionEncoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+
+    def forward(self, pixel_values):
+        return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+
+class TextEncoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.text_encoder = model.text_encoder
+
+    def forward(self, input_ids, attention_mask, image_embeds):
+        image_attention_mask = torch.ones(image_embeds.shape[:-1], dtype=torch.long)
+        return self.text_encoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            encoder_hidden_states=image_embeds,
+            encoder_attention_mask=image_attention_mask,
+            return_dict=False,
+        )[0]
+
+
+class DecoderStep(torch.nn.Module):
+    """
+    The text decoder with its cache flattened into positional tensors. Only self-attention is
+    cached (BLIP recomputes cross-attention every step), so there are 2 tensors per layer.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.text_decoder = model.text_decoder
+
+    def forward(self, input_ids, encoder_hidden_states, *past):
+        past_key_values = tuple((past[i], past[i + 1]) for i in range(0, len(past), 2))
+        past_length = past[0].shape[2]
+        attention_mask = torch.ones((input_ids.shape[0], past_length + input_ids.shape[1]), dtype=torch.long)
+        encoder_attention_mask = torch.ones(encoder_hidden_states.shape[:-1], dtype=torch.long)
+        outputs = self.text_decoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            past_key_values=past_key_values,
+            use_cache=True,
+            return_dict=True,
+        )
+        present = [tensor for layer in outputs.past_key_values for tensor in layer]
+        return (outputs.logits[:, -1, :], *present)
+
+
+def _export(module, args, path, input_names, output_names, dynamic_axes):
+    kwargs = {}
+    # Newer torch releases default to the dynamo exporter; these graphs are traced with the TorchScript one
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        module,
+        args,
+        path,
+        input_names=input_names,
+        output_names=output_names,
+        dynamic_axes=dynamic_axes,
+        opset_version=OPSET,
+        do_constant_folding=True,
+        **kwargs,
+    )
+    logger.info("Exported %s", path)
+
+
+def export(model_name: str, output_dir: str):
+    model = BlipForQuestionAnswering.from_pretrained(model_name).eval()
+    text_config = model.config.text_config
+    num_layers = text_config.num_hidden_layers
+    num_heads = text_config.num_attention_heads
+    head_dim = text_config.hidden_size // num_heads
+    image_size = model.config.vision_config.image_size
+    os.makedirs(output_dir, exist_ok=True)
+
+    batch, seq = 2, 6
+    pixel_values = torch.randn(batch, 3, image_size, image_size)
+    input_ids = torch.randint(1000, 2000, (batch, seq))
+    attention_mask = torch.ones(batch, seq, dtype=torch.long)
+    past_names = [f"past.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+    present_names = [f"present.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+
+    with torch.no_grad():
+        _export(
+            VisionEncoder(model), (pixel_values,), os.path.join(output_dir, "vision_encoder.onnx"),
+            ["pixel_values"], ["image_embeds"], {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        )
+        image_embeds = VisionEncoder(model)(pixel_values)
+        _export(
+            TextEncoder(model), (input_ids, attention_mask, image_embeds), os.path.join(output_dir, "text_encoder.onnx"),
+            ["input_ids", "attention_mask", "image_embeds"], ["question_embeds"],
+            {
+                "input_ids": {0: "batch", 1: "question_length"},
+                "attention_mask": {0: "batch", 1: "question_length"},
+                "image_embeds": {0: "batch"},
+                "question_embeds": {0: "batch", 1: "question_length"},
+            },
+        )
+        question_embeds = TextEncoder(model)(input_ids, attention_mask, image_embeds)
+        # Trace with a non-empty past; at runtime the first step feeds a zero-length one
+        past = [torch.randn(batch, num_heads, 1, head_dim) for _ in past_names]
+        decoder_axes = {"input_ids": {0: "batch"}, "encoder_hidden_states": {0: "batch", 1: "question_length"}}
+        decoder_axes["logits"] = {0: "batch"}
+        decoder_axes.update({name: {0: "batch", 2: "past_length"} for name in past_names})
+        decoder_axes.update({name: {0: "batch", 2: "total_length"} for name in present_names})
+        _export(
+            DecoderStep(model), (input_ids[:, :1], question_embeds, *past), os.path.join(output_dir, "text_decoder.onnx"),
+            ["input_ids", "encoder_hidden_states", *past_names], ["logits", *present_names], decoder_axes,
+        )
+
+    config = {
+        "model_name": model_name,
+        "num_layers": num_layers,
+        "num_heads": num_heads,
+        "head_dim": head_dim,
+        "decoder_start_token_id": model.decoder_start_token_id,
+        "eos_token_id": text_config.sep_token_id,
+        "pad_token_id": text_config.pad_token_id,
+        "max_length": model.generation_config.max_length,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Salesforce/blip-vqa-base")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    print(export(args.model, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
 import os
 import json
-import logging
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
+import asyncio
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from PIL import Image
 import base64
 import io
 import ray
 import ray.serve as serve
+from ray.serve import metrics
 from transformers import BlipProcessor, BlipForQuestionAnswering
 from deployments.utils import Logger
+from deployments.batching import BatchRequest, BatchItemResult, BatchResponse
+from deployments.adaptive_batching import AdaptiveBatchController
+from deployments.model_cache import load_model, load_processor
+from deployments.quantization import apply_quantization
+from deployments.runtime_profile import RuntimeProfile
+from deployments.tracing import TRACE_HEADER, StageTimer, TraceContext, Tracer
 import torch
 
 # Disable Ray's log deduplication
@@ -17,6 +27,8 @@ os.environ["RAY_DEDUP_LOGS"] = "0"
 
 # Initialize FastAPI app
 app = FastAPI()
+# Spans from the replicas come back with each result and are kept here, see /traces
+tracer = Tracer.from_env()
 
 
 # Define the request schema with image and text
@@ -27,12 +39,20 @@ class RequestModel(BaseModel):
     @classmethod
     async def from_request(cls, request) -> "RequestModel":
         """Helper function to extract data from Ray's Request object."""
+        if isinstance(request, cls):
+            return request
         body = await request.body()
         try:
             data = json.loads(body)
-            return cls(**data)  # Automatically map to RequestModel
         except json.JSONDecodeError as e:
             raise HTTPException(status_code=400, detail="Invalid JSON body") from e
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+        try:
+            return cls(**data)  # Automatically map to RequestModel
+        except ValidationError as e:
+            # Surfaces as this item's error instead of failing every request in the batch
+            raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}") from e
 
 
 # Function to decode image from Base64 string
@@ -54,6 +74,8 @@ if not ray.is_initialized():
 
 num_replicas = int(os.getenv("NUM_REPLICAS", "1"))
 num_cpu = int(os.getenv("NUM_CPU", "2"))
+latency_slo_ms = float(os.getenv("LATENCY_SLO_MS", "1000"))
+max_batch_size = int(os.getenv("MAX_BATCH_SIZE", "16"))
 
 
 @serve.deployment(num_replicas=num_replicas, ray_actor_options={"num_cpus": num_cpu})
@@ -61,50 +83,123 @@ class BlipService:
     def __init__(self):
         try:
             # Initialize custom logger for each replica
-            self.logger = Logger(logging.DEBUG).get_logger()
+            self.logger = Logger().get_logger()
             self.logger.info("Initializing BlipService")
 
+            # Size thread pools from this replica's num_cpus so co-located replicas don't oversubscribe.
+            # Applied before loading so threads created while loading inherit it; CPU_AFFINITY is
+            # ignored because the same env would pin every replica on the node to the same cores.
+            self.runtime_profile = RuntimeProfile.from_env(cpu_allocation=num_cpu, allow_affinity=False)
+            self.runtime_profile.apply()
+
             # Load BLIP model for Visual Question Answering
-            self.processor = BlipProcessor.from_pretrained("Salesforce/blip-vqa-base")
-            self.model = BlipForQuestionAnswering.from_pretrained("Salesforce/blip-vqa-base")
+            # Memory-mapped from MODEL_CACHE_DIR when prepared, see deployments/model_cache.py
+            self.processor = load_processor(BlipProcessor, "Salesforce/blip-vqa-base")
+            self.model = load_model(BlipForQuestionAnswering, "Salesforce/blip-vqa-base")
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             if torch.cuda.is_available():
-                self.logger.info(f"Using CUDA for inference.")
+                self.logger.info("Using CUDA for inference.")
             else:
                 self.logger.warning("CUDA not available, using CPU for inference.")
             self.model = self.model.eval().to(self.device)
-            self.logger.info(f"BLIP model loaded and moved to {self.device}")
+            # BLIP_QUANTIZATION=int8 quantizes the linear layers (CPU only)
+            self.model = apply_quantization(self.model, device=self.device)
+            self.model = self.runtime_profile.compile(self.model)
+            self.logger.info("BLIP model loaded and moved to %s", self.device)
+
+            # Batch size and wait timeout are tuned at runtime to meet the latency SLO
+            self.pending_requests = 0
+            self.batch_controller = AdaptiveBatchController(
+                latency_slo_s=latency_slo_ms / 1000, max_batch_size=max_batch_size
+            )
+            self.max_batch_size_gauge = metrics.Gauge(
+                "blip_max_batch_size", description="Max batch size chosen by the adaptive batch controller."
+            )
+            self.batch_wait_timeout_gauge = metrics.Gauge(
+                "blip_batch_wait_timeout_s", description="Batch wait timeout chosen by the adaptive batch controller."
+            )
+            self.queue_depth_gauge = metrics.Gauge(
+                "blip_queue_depth", description="Requests waiting for a batch when the last batch started."
+            )
+            self.batch_service_time = metrics.Histogram(
+                "blip_batch_service_time_s",
+                description="Time to process one batch.",
+                boundaries=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0],
+            )
+            self._apply_batch_settings()
         except Exception as e:
             self.logger.exception("Failed to initialize BlipService")
             raise e
 
-    @serve.batch(max_batch_size=4, batch_wait_timeout_s=1.0)
-    async def __call__(self, request_list):
-        self.logger.info(f"Replica {os.getpid()} processing batch of size: {len(request_list)}")
+    def _apply_batch_settings(self):
+        batch_size = self.batch_controller.batch_size
+        wait_timeout_s = self.batch_controller.wait_timeout_s
+        self.handle_batch.set_max_batch_size(batch_size)
+        self.handle_batch.set_batch_wait_timeout_s(wait_timeout_s)
+        self.max_batch_size_gauge.set(batch_size)
+        self.batch_wait_timeout_gauge.set(wait_timeout_s)
 
-        # Use the RequestModel's helper to process Ray's Request objects
-        request_models = [await RequestModel.from_request(request) for request in request_list]
+    async def __call__(self, request, trace: Optional[TraceContext] = None):
+        self.pending_requests += 1
+        self.batch_controller.record_arrival()
+        try:
+            # Arrival time rides along so the batch can report how long each request waited for it
+            return await self.handle_batch((request, trace, time.time()))
+        finally:
+            self.pending_requests -= 1
 
-        # Decode images and extract questions
-        images = [decode_image(req_model.image_base64) for req_model in request_models]
-        questions = [req_model.question for req_model in request_models]
+    @serve.batch(max_batch_size=1, batch_wait_timeout_s=0.001)
+    async def handle_batch(self, request_list):
+        self.logger.info("Replica %d processing batch of size: %d", os.getpid(), len(request_list))
+        start_time = time.perf_counter()
+        stages = StageTimer(len(request_list))
+        queue_depth = self.pending_requests - len(request_list)
+        self.queue_depth_gauge.set(queue_depth)
 
-        # Process the inputs using the BLIP processor
-        inputs = self.processor(images, questions, return_tensors="pt").to(self.device)
-        self.logger.info(f"Processed {len(inputs)} inputs.")
+        # Parse and decode each request on its own so one bad input doesn't fail the whole batch
+        results = [None] * len(request_list)
+        images, questions, valid_indices = [], [], []
+        with stages.stage("decode"):
+            for index, (request, _, _) in enumerate(request_list):
+                try:
+                    req_model = await RequestModel.from_request(request)
+                    images.append(decode_image(req_model.image_base64))
+                    questions.append(req_model.question)
+                    valid_indices.append(index)
+                except HTTPException as e:
+                    results[index] = {"question": None, "error": e.detail}
 
-        # Perform inference
-        with torch.no_grad():
-            outputs = self.model.generate(**inputs)
+        if valid_indices:
+            # Process the inputs using the BLIP processor
+            with stages.stage("processor"):
+                inputs = self.processor(images, questions, return_tensors="pt", padding=True).to(self.device)
+            self.logger.debug("Processed %d inputs.", len(inputs))
 
-        # Decode outputs to human-readable answers
-        answers = [self.processor.decode(output, skip_special_tokens=True) for output in outputs]
-        self.logger.info(f"Batch processed with answers: {answers}")
+            # Perform inference
+            with stages.stage("generate"), self.runtime_profile.inference_context():
+                outputs = self.model.generate(**inputs)
 
-        # Return results as list of dictionaries
-        results = [{"question": question, "answer": answer} for question, answer in zip(questions, answers)]
+            # Decode outputs to human-readable answers
+            with stages.stage("postprocess"):
+                answers = [self.processor.decode(output, skip_special_tokens=True) for output in outputs]
+            self.logger.debug("Batch processed with answers: %s", answers)
+
+            # Return results as list of dictionaries
+            for index, question, answer in zip(valid_indices, questions, answers):
+                results[index] = {"question": question, "answer": answer}
+
+        self._record_batch(len(request_list), start_time, queue_depth)
+        for result, (_, trace, arrived_at) in zip(results, request_list):
+            if trace is not None:
+                result["spans"] = stages.spans_for(trace, arrived_at, replica=os.getpid())
         return results
 
+    def _record_batch(self, batch_size, start_time, queue_depth):
+        service_time_s = time.perf_counter() - start_time
+        self.batch_service_time.observe(service_time_s)
+        self.batch_controller.record_batch(batch_size, service_time_s, queue_depth)
+        self._apply_batch_settings()
+
 
 # Deploy the BLIP service
 serve.run(BlipService.bind())
@@ -112,11 +207,63 @@ serve.run(BlipService.bind())
 
 # FastAPI Route
 @app.post("/predict")
-async def predict(request: RequestModel):
+async def predict(request: RequestModel, response: Response, x_trace_id: Optional[str] = Header(None)):
+    trace = tracer.start_trace(x_trace_id)
     # Forward the request to the Ray Serve deployment
     handle = serve.get_deployment("BlipService").get_handle()
-    result = await handle.remote(request)
-    return {"result": await result}
+    with tracer.span(trace, "ingress", route="/predict") as ingress:
+        result = await handle.remote(request, ingress and ingress.handoff())
+        output = await result
+    if trace is not None:
+        tracer.record(output.pop("spans", []))
+        response.headers[TRACE_HEADER] = trace.trace_id
+    return {"result": output}
+
+
+@app.post("/infer_batch")
+async def infer_batch(batch_request: BatchRequest, response: Response, x_trace_id: Optional[str] = Header(None)):
+    # One trace per call; each item's spans carry its index
+    trace = tracer.start_trace(x_trace_id)
+    if trace is not None:
+        response.headers[TRACE_HEADER] = trace.trace_id
+    # Fan the items out concurrently so @serve.batch groups them into model batches
+    handle = serve.get_deployment("BlipService").get_handle()
+
+    async def run_item(index, item):
+        try:
+            with tracer.span(trace, "ingress", route="/infer_batch", index=index) as ingress:
+                request = RequestModel(question=item.question, image_base64=item.base64_image)
+                result = await handle.remote(request, ingress and ingress.handoff())
+                output = await result
+            spans = output.pop("spans", [])
+            for span in spans:
+                span["attributes"]["index"] = index
+            tracer.record(spans)
+            return BatchItemResult(
+                index=index, camera_id=item.camera_id, prediction=output.get("answer"), error=output.get("error")
+            )
+        except Exception as e:
+            return BatchItemResult(index=index, camera_id=item.camera_id, error=str(e))
+
+    tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(batch_request.items)]
+
+    if batch_request.stream:
+        async def stream_items():
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps((await task).model_dump()) + "\n"
+
+        return StreamingResponse(stream_items(), media_type="application/x-ndjson")
+
+    return BatchResponse(results=list(await asyncio.gather(*tasks)))
+
+
+@app.get("/traces")
+async def traces(limit: int = 50, trace_id: Optional[str] = None, min_duration_ms: float = 0.0):
+    """Recent request traces (slowest hops show up as the longest spans) and per-stage percentiles."""
+    return {
+        "stages": tracer.stage_summary(),
+        "traces": tracer.traces(limit=limit, trace_id=trace_id, min_duration_ms=min_duration_ms),
+    }
 
 
 # Run the app
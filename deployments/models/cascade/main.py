@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import io
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from PIL import Image
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from deployments.utils import logger, decode_base64_to_image
+from deployments.batching import BatchRequest, BatchItemResult
+from deployments.models.blip.model import BLIPVQAModel
+from deployments.profiling import profiler, router as profiling_router
+
+# Yes/no questions BLIP answers on every frame; a frame escalates when any gate's P("yes") reaches its threshold.
+DEFAULT_GATES = [{"question": "is there a person?", "threshold": 0.5}]
+CASCADE_GATES = json.loads(os.getenv("CASCADE_GATES", json.dumps(DEFAULT_GATES)))
+# Answer returned for frames no gate lets through
+CASCADE_GATE_ANSWER = os.getenv("CASCADE_GATE_ANSWER", "Nothing relevant detected.")
+# The expensive model behind an OpenAI-compatible API: a MiniCPM/vLLM deployment or GPT-4o
+CASCADE_HEAVY_URL = os.getenv("CASCADE_HEAVY_URL", "http://MiniCPM-V-2_6-int4-server-service:8000/v1")
+CASCADE_HEAVY_MODEL = os.getenv("CASCADE_HEAVY_MODEL", "openbmb/MiniCPM-V-2_6-int4")
+CASCADE_HEAVY_API_KEY = os.getenv("CASCADE_HEAVY_API_KEY", "")
+CASCADE_HEAVY_MAX_TOKENS = int(os.getenv("CASCADE_HEAVY_MAX_TOKENS", "512"))
+# Escalations in flight at once, so a burst of positive frames queues here instead of overloading the heavy model
+CASCADE_HEAVY_MAX_CONCURRENCY = int(os.getenv("CASCADE_HEAVY_MAX_CONCURRENCY", "8"))
+
+
+class CascadeStats:
+    """Counts frames per stage; every frame the gate answers is a heavy-model call saved."""
+
+    def __init__(self):
+        self.frames = 0
+        self.escalated = 0
+        self.heavy_errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, escalated: bool, heavy_error: bool = False):
+        with self._lock:
+            self.frames += 1
+            self.escalated += int(escalated)
+            self.heavy_errors += int(heavy_error)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "escalated": self.escalated,
+                "heavy_calls_saved": self.frames - self.escalated,
+                "escalation_rate": self.escalated / self.frames if self.frames else 0.0,
+                "heavy_errors": self.heavy_errors,
+            }
+
+
+def image_mime_type(base64_image: str) -> str:
+    """MIME type for the data URL, read from the image header (frames may be PNG or WebP, not just JPEG)."""
+    with Image.open(io.BytesIO(base64.b64decode(base64_image))) as image:
+        return Image.MIME.get(image.format, "image/jpeg")
+
+
+class HeavyModelClient:
+    def __init__(self, base_url: str, model: str, api_key: str = "", max_tokens: int = 512, max_concurrency: int = 8,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=300.0, transport=transport)
+        self.model = model
+        self.max_tokens = max_tokens
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def ask(self, base64_image: str, question: str) -> str:
+        image_url = f"data:{image_mime_type(base64_image)};base64,{base64_image}"
+        async with self._semaphore:
+            response = await self.client.post("/chat/completions", json={
+                "model": self.model,
+                "max_tokens": self.max_tokens,
+                "messages": [{"role": "user", "content": [
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                    {"type": "text", "text": question},
+                ]}],
+            })
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def close(self):
+        await self.client.aclose()
+
+
+app = FastAPI()
+app.include_router(profiling_router)
+gate_model = BLIPVQAModel()
+gate_model.load()
+heavy_model = HeavyModelClient(
+    CASCADE_HEAVY_URL, CASCADE_HEAVY_MODEL, CASCADE_HEAVY_API_KEY, CASCADE_HEAVY_MAX_TOKENS, CASCADE_HEAVY_MAX_CONCURRENCY
+)
+stats = CascadeStats()
+logger.info("Cascade gates: %s; heavy model %s at %s", CASCADE_GATES, CASCADE_HEAVY_MODEL, CASCADE_HEAVY_URL)
+
+
+class MultimodalRequest(BaseModel):
+    question: str
+    base64_image: str
+
+
+class CascadeResponse(BaseModel):
+    prediction: str
+    stage: str  # "gate" when BLIP answered, "heavy" when the frame was escalated
+    gate_scores: Dict[str, float]
+
+
+class CascadeItemResult(BatchItemResult):
+    stage: Optional[str] = None
+    gate_scores: Optional[Dict[str, float]] = None
+
+
+class CascadeBatchResponse(BaseModel):
+    results: List[CascadeItemResult]
+
+
+def score_gates(images) -> List[Dict[str, float]]:
+    """Run every gate question on every frame as one BLIP batch."""
+    questions = [gate["question"] for gate in CASCADE_GATES]
+    # Runs in the threadpool, so the profile is taken on the thread doing the work; each frame counts as a request
+    with profiler.request(len(images)):
+        scores = gate_model.yes_probability(
+            [image for image in images for _ in questions], questions * len(images)
+        )
+    return [dict(zip(questions, scores[i * len(questions):(i + 1) * len(questions)])) for i in range(len(images))]
+
+
+def should_escalate(gate_scores: Dict[str, float]) -> bool:
+    return any(gate_scores[gate["question"]] >= gate["threshold"] for gate in CASCADE_GATES)
+
+
+@app.get("/health_check")
+async def health_check():
+    logger.info("Health check called.")
+    return {"status": "Healthy"}
+
+
+@app.get("/stats")
+async def cascade_stats():
+    return stats.snapshot()
+
+
+@app.on_event("shutdown")
+async def close_heavy_model():
+    await heavy_model.close()
+
+
+@app.post("/infer")
+async def infer(infer_request: MultimodalRequest):
+    try:
+        image = decode_base64_to_image(infer_request.base64_image)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    try:
+        logger.info("Received cascade inference request.")
+        gate_scores, = await run_in_threadpool(score_gates, [image])
+    except Exception as e:
+        logger.error("Gate stage failed: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not should_escalate(gate_scores):
+        stats.record(escalated=False)
+        return CascadeResponse(prediction=CASCADE_GATE_ANSWER, stage="gate", gate_scores=gate_scores)
+    try:
+        prediction = await heavy_model.ask(infer_request.base64_image, infer_request.question)
+    except Exception as e:
+        stats.record(escalated=True, heavy_error=True)
+        logger.error("Heavy stage failed: %s", e)
+        raise HTTPException(status_code=502, detail=f"Heavy model failed: {str(e)}")
+    stats.record(escalated=True)
+    return CascadeResponse(prediction=prediction, stage="heavy", gate_scores=gate_scores)
+
+
+@app.post("/infer_batch")
+async def infer_batch(batch_request: BatchRequest):
+    logger.info("Received cascade batch request with %d items.", len(batch_request.items))
+    results = [CascadeItemResult(index=i, camera_id=item.camera_id) for i, item in enumerate(batch_request.items)]
+    images, valid = [], []
+    for index, item in enumerate(batch_request.items):
+        try:
+            images.append(decode_base64_to_image(item.base64_image))
+            valid.append(index)
+        except Exception as e:
+            results[index].error = f"Invalid image: {str(e)}"
+    if not valid:
+        return CascadeBatchResponse(results=results)
+
+    try:
+        all_scores = await run_in_threadpool(score_gates, images)
+    except Exception as e:
+        logger.error("Gate stage failed: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def escalate(index: int):
+        item = batch_request.items[index]
+        try:
+            results[index].prediction = await heavy_model.ask(item.base64_image, item.question)
+            stats.record(escalated=True)
+        except Exception as e:
+            results[index].error = f"Heavy model failed: {str(e)}"
+            stats.record(escalated=True, heavy_error=True)
+
+    escalations = []
+    for index, gate_scores in zip(valid, all_scores):
+        results[index].gate_scores = gate_scores
+        if should_escalate(gate_scores):
+            results[index].stage = "heavy"
+            escalations.append(escalate(index))
+        else:
+            results[index].stage = "gate"
+            results[index].prediction = CASCADE_GATE_ANSWER
+            stats.record(escalated=False)
+    await asyncio.gather(*escalations)
+    return CascadeBatchResponse(results=results)
+
+
+def main():
+    import uvicorn
+    logger.info("Starting FastAPI server...")
+    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,27 @@
+import uuid
+from typing import Optional
 from transformers import AutoModel, AutoTokenizer
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from deployments.utils import logger, decode_base64_to_image
+from deployments.cache import build_response_cache
+from deployments.batching import BatchRequest, iter_batch_results, batch_response
+from deployments.streaming import serve_frame_stream
+from deployments.profiling import profiler, router as profiling_router
+from deployments.tracing import TRACE_HEADER, Tracer
+from deployments.openai_compat import (
+    ChatCompletionRequest, parse_messages, chat_completion_response, chat_completion_chunk, SSE_DONE
+)
 
 
 class DummyModel():
     def load(self):
         self.model_name = "dummy model"
         try:
-            logger.info(f"Model {self.model_name} loaded successfully.")
+            logger.info("Model %s loaded successfully.", self.model_name)
         except Exception as e:
-            logger.error(f"Failed to load model {self.model_name}: {str(e)}")
+            logger.error("Failed to load model %s: %s", self.model_name, e)
             raise e
 
     def infer(self, base64_image: str, question: str):
@@ -20,13 +31,19 @@ class DummyModel():
             logger.info("Inference completed successfully.")
             return result
         except Exception as e:
-            logger.error(f"Inference failed: {str(e)}")
+            logger.error("Inference failed: %s", e)
             raise e
 
+    def infer_batch(self, images, questions):
+        return ["this is a dummy response" for _ in images]
+
 
 app = FastAPI()
+app.include_router(profiling_router)
 model_instance = DummyModel()
 model_instance.load()
+response_cache = build_response_cache(model_instance.model_name)
+tracer = Tracer.from_env()
 
 class MultimodalRequest(BaseModel):
     question: str
@@ -35,6 +52,7 @@ class MultimodalRequest(BaseModel):
 
 class MultimodalResponse(BaseModel):
     prediction: str
+    cache_hit: bool = False
 
 
 @app.get("/health_check")
@@ -44,15 +62,73 @@ async def health_check():
 
 
 @app.post("/infer")
-async def infer(infer_request: MultimodalRequest):
-    try:
-        logger.info("Received inference request.")
-        prediction = model_instance.infer(infer_request.base64_image, infer_request.question)
-        logger.info("Returning inference result.")
-        return MultimodalResponse(prediction=prediction)
-    except Exception as e:
-        logger.error(f"Error during inference request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def infer(infer_request: MultimodalRequest, response: Response, x_trace_id: Optional[str] = Header(None)):
+    trace = tracer.start_trace(x_trace_id)
+    if trace is not None:
+        response.headers[TRACE_HEADER] = trace.trace_id
+    # Covers cache hits too, so `requests=K` counts requests rather than model calls
+    with profiler.request(), tracer.span(trace, "ingress", route="/infer") as ingress:
+        try:
+            logger.info("Received inference request.")
+            cache_key = None
+            if response_cache is not None:
+                cache_key = response_cache.make_key(infer_request.base64_image, infer_request.question)
+                cached_prediction = response_cache.get(cache_key)
+                if cached_prediction is not None:
+                    logger.info("Returning cached inference result.")
+                    return MultimodalResponse(prediction=cached_prediction, cache_hit=True)
+            with tracer.span(ingress, "infer"):
+                prediction = model_instance.infer(infer_request.base64_image, infer_request.question)
+            if cache_key is not None:
+                response_cache.set(cache_key, prediction)
+            logger.info("Returning inference result.")
+            return MultimodalResponse(prediction=prediction)
+        except Exception as e:
+            logger.error("Error during inference request: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/traces")
+async def traces(limit: int = 50, trace_id: Optional[str] = None, min_duration_ms: float = 0.0):
+    return {
+        "stages": tracer.stage_summary(),
+        "traces": tracer.traces(limit=limit, trace_id=trace_id, min_duration_ms=min_duration_ms),
+    }
+
+
+@app.post("/infer_batch")
+async def infer_batch(batch_request: BatchRequest):
+    logger.info("Received batch inference request with %d items.", len(batch_request.items))
+    results = iter_batch_results(
+        batch_request.items, model_instance.infer_batch, response_cache=response_cache
+    )
+    return await batch_response(results, batch_request.stream)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(chat_request: ChatCompletionRequest):
+    logger.info("Received chat completion request.")
+    parse_messages(chat_request.messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model_name = chat_request.model or model_instance.model_name
+    text = "this is a dummy response"
+
+    if chat_request.stream:
+        def stream_chunks():
+            for word in text.split(" "):
+                yield chat_completion_chunk(completion_id, model_name, word + " ")
+            yield chat_completion_chunk(completion_id, model_name, finish_reason="stop")
+            yield SSE_DONE
+
+        return StreamingResponse(stream_chunks(), media_type="text/event-stream")
+
+    return chat_completion_response(completion_id, model_name, text, completion_tokens=len(text.split(" ")))
+
+
+@app.websocket("/ws/infer")
+async def ws_infer(websocket: WebSocket):
+    logger.info("Frame stream connected.")
+    await serve_frame_stream(websocket, model_instance.infer_batch)
 
 
 def main():
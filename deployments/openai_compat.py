@@ -0,0 +1,107 @@
+import json
+import time
+from typing import List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict
+
+from deployments.utils import decode_base64_to_image
+from deployments.clips import IMAGE_PLACEHOLDER
+
+SSE_DONE = "data: [DONE]\n\n"
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: Union[str, List[dict]]
+
+
+class ChatCompletionRequest(BaseModel):
+    """Subset of the OpenAI chat-completions request that the deployments understand."""
+
+    model_config = ConfigDict(extra="allow")
+
+    model: Optional[str] = None
+    messages: List[ChatMessage]
+    stream: bool = False
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    stop: Optional[Union[str, List[str]]] = None
+
+
+def parse_messages(messages: List[ChatMessage]) -> Tuple[List[dict], list]:
+    """
+    Split OpenAI-style messages into text-only messages and the decoded images.
+    Each `image_url` part must be a base64 data URI; it is replaced in the text by the
+    image placeholder so the caller can keep its position in the prompt. The deployments answer
+    questions about frames, so a request without any image is rejected with a 400.
+    """
+    conversation, images = [], []
+    for message in messages:
+        if isinstance(message.content, str):
+            conversation.append({"role": message.role, "content": message.content, "images": []})
+            continue
+        texts, message_images = [], []
+        for part in message.content:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                image = decode_data_uri(part.get("image_url", {}).get("url", ""))
+                message_images.append(image)
+                texts.append(IMAGE_PLACEHOLDER)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unsupported content part type: {part.get('type')}")
+        conversation.append({"role": message.role, "content": "\n".join(texts), "images": message_images})
+        images.extend(message_images)
+    if not images:
+        raise HTTPException(status_code=400, detail="The messages must include at least one image_url part.")
+    return conversation, images
+
+
+def decode_data_uri(url: str):
+    if not url.startswith("data:") or ";base64," not in url:
+        raise HTTPException(status_code=400, detail="Only base64 data URIs are supported for image_url.")
+    try:
+        return decode_base64_to_image(url.split(";base64,", 1)[1])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image data: {str(e)}")
+
+
+def chat_completion_response(
+    completion_id: str,
+    model: str,
+    text: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    finish_reason: str = "stop",
+) -> dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chat_completion_chunk(
+    completion_id: str, model: str, delta_text: Optional[str] = None, finish_reason: Optional[str] = None
+) -> str:
+    """One server-sent event carrying a `chat.completion.chunk`."""
+    delta = {"role": "assistant", "content": delta_text} if delta_text is not None else {}
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+
+from deployments.utils import logger
+
+# Returned by Profiler.request() while nothing is being captured, so the hot path pays one attribute check
+_INACTIVE = contextlib.nullcontext()
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """`thread;outer;...;inner` in the folded format flamegraph.pl and speedscope read."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class _Capture:
+    """cProfile state for one `mode=cprofile` run: a profile per thread while any captured request is on it."""
+
+    def __init__(self, requests: int, deadline: float):
+        self.remaining = requests or None
+        self.deadline = deadline
+        self.closed = False
+        self.profiled_requests = 0
+        self.stats: Optional[pstats.Stats] = None
+        self._active: Dict[int, list] = {}  # thread id -> [profile, requests in flight]
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def request(self, requests: int = 1):
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._active.get(ident)
+            if entry is None:
+                # One profile per thread: concurrent coroutines on the event loop share it
+                entry = self._active[ident] = [cProfile.Profile(), 0]
+                entry[0].enable()
+            entry[1] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    entry[0].disable()
+                    del self._active[ident]
+                    if not self.closed:
+                        # Profiles still running when the capture closes are dropped
+                        if self.stats is None:
+                            self.stats = pstats.Stats(entry[0])
+                        else:
+                            self.stats.add(entry[0])
+                if not self.closed:
+                    self.profiled_requests += requests
+                    if self.remaining is not None:
+                        self.remaining -= requests
+
+    @property
+    def done(self) -> bool:
+        return (self.remaining is not None and self.remaining <= 0) or time.monotonic() >= self.deadline
+
+
+class Profiler:
+    """
+    On-demand profiling for a running model server, behind an admin token (`PROFILING_TOKEN`;
+    the endpoints answer 404 when it isn't set). `mode=sample` samples every thread's stack for
+    `seconds` and returns collapsed stacks; `mode=cprofile` profiles the handlers of the next
+    `requests` requests (or those within `seconds`) and returns a pstats file or a text report.
+    Nothing is installed while no run is active: no sampler thread and no profile hooks.
+    """
+
+    def __init__(self, token: Optional[str] = None, max_seconds: float = 120.0):
+        self.token = token
+        self.max_seconds = max_seconds
+        self._capture: Optional[_Capture] = None
+        self._running = False
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(
+            token=os.getenv("PROFILING_TOKEN") or None,
+            max_seconds=float(os.getenv("PROFILING_MAX_SECONDS", "120")),
+        )
+
+    def check_token(self, token: Optional[str]):
+        if not self.token:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if not token or not secrets.compare_digest(token, self.token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    def request(self, requests: int = 1):
+        """
+        Wrap a request handler; a shared no-op unless a cProfile run is capturing. `requests` is
+        how many requests the wrapped work serves, for code that handles a batch of them at once.
+        """
+        capture = self._capture
+        if capture is None or capture.closed:
+            return _INACTIVE
+        return capture.request(requests)
+
+    async def run(self, mode: str = "sample", seconds: float = 10.0, requests: int = 0,
+                  interval_ms: float = 5.0, output: str = "pstats") -> Response:
+        if mode not in ("sample", "cprofile"):
+            raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+        if output not in ("pstats", "text"):
+            raise HTTPException(status_code=400, detail="output must be 'pstats' or 'text'")
+        if not 0 < seconds <= self.max_seconds:
+            raise HTTPException(status_code=400, detail=f"seconds must be in (0, {self.max_seconds}]")
+        if interval_ms <= 0:
+            raise HTTPException(status_code=400, detail="interval_ms must be positive")
+        if requests < 0:
+            raise HTTPException(status_code=400, detail="requests must not be negative")
+        if self._running:
+            raise HTTPException(status_code=409, detail="A profiling run is already in progress")
+        self._running = True
+        logger.warning("Profiling started: mode=%s seconds=%s requests=%s", mode, seconds, requests)
+        try:
+            if mode == "sample":
+                stacks = await asyncio.to_thread(self.sample, seconds, interval_ms / 1000)
+                return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+            return await self._run_cprofile(seconds, requests, output)
+        finally:
+            self._running = False
+            logger.warning("Profiling finished: mode=%s", mode)
+
+    async def _run_cprofile(self, seconds: float, requests: int, output: str) -> Response:
+        capture = self._capture = _Capture(requests, time.monotonic() + seconds)
+        try:
+            while not capture.done:
+                await asyncio.sleep(0.05)
+        finally:
+            capture.closed = True
+            self._capture = None
+
+        if capture.stats is None:
+            raise HTTPException(status_code=504, detail="No requests completed while profiling")
+        if output == "text":
+            buffer = io.StringIO()
+            buffer.write(f"{capture.profiled_requests} requests profiled\n")
+            capture.stats.stream = buffer
+            capture.stats.sort_stats("cumulative").print_stats(50)
+            return PlainTextResponse(buffer.getvalue())
+        # Same bytes pstats.Stats.dump_stats writes; load with pstats.Stats("profile.pstats")
+        return Response(
+            marshal.dumps(capture.stats.stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{int(time.time())}.pstats"'},
+        )
+
+    @staticmethod
+    def sample(seconds: float, interval_s: float) -> Counter:
+        """Count of collapsed stacks over all threads but the sampler's own, one sample per `interval_s`."""
+        own = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+            time.sleep(interval_s)
+        return stacks
+
+    @staticmethod
+    def dump_stacks() -> str:
+        """Current stack of every thread and, when called on the event loop, of every asyncio task."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        sections: List[str] = []
+        for ident, frame in sys._current_frames().items():
+            sections.append(f"Thread {names.get(ident, ident)} ({ident}):\n" + "".join(traceback.format_stack(frame)))
+        try:
+            tasks = asyncio.all_tasks()
+        except RuntimeError:
+            tasks = set()
+        for task in tasks:
+            buffer = io.StringIO()
+            task.print_stack(file=buffer)
+            sections.append(buffer.getvalue())
+        return "\n".join(sections)
+
+
+# One profiler per server process; deployments mount the endpoints with app.include_router(router)
+profiler = Profiler.from_env()
+router = APIRouter(prefix="/admin")
+
+
+@router.post("/profile")
+async def admin_profile(mode: str = "sample", seconds: float = 10.0, requests: int = 0, interval_ms: float = 5.0,
+                        output: str = "pstats", x_admin_token: Optional[str] = Header(None)):
+    profiler.check_token(x_admin_token)
+    return await profiler.run(mode, seconds, requests, interval_ms, output)
+
+
+@router.get("/stacks")
+async def admin_stacks(x_admin_token: Optional[str] = Header(None)):
+    profiler.check_token(x_admin_token)
+    return PlainTextResponse(profiler.dump_stacks())
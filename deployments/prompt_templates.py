@@ -0,0 +1,69 @@
+import json
+import os
+from typing import Optional
+
+from deployments.utils import logger
+
+
+class PromptTemplateRegistry:
+    """
+    Named prompt templates rendered with `str.format` variables.
+
+    Keep the long fixed part (the tenant's system prompt) at the start of the template
+    and the variables after it: with prefix caching enabled the engine then reuses the
+    KV blocks of the shared prefix across requests instead of prefilling it every time.
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, template_id: str, template: str):
+        self._templates[template_id] = template
+        logger.info("Registered prompt template '%s'.", template_id)
+
+    def render(self, template_id: str, variables: Optional[dict] = None) -> str:
+        if template_id not in self._templates:
+            raise KeyError(f"Unknown prompt template '{template_id}'")
+        if variables is not None and not isinstance(variables, dict):
+            raise ValueError(f"Variables for prompt template '{template_id}' must be an object")
+        try:
+            return self._templates[template_id].format(**(variables or {}))
+        except KeyError as e:
+            raise ValueError(f"Missing variable {e} for prompt template '{template_id}'") from e
+        except (IndexError, AttributeError, ValueError) as e:
+            # Positional fields, attribute lookups, or unescaped literal braces (write `{{` / `}}`)
+            raise ValueError(f"Prompt template '{template_id}' cannot be rendered: {str(e)}") from e
+
+    def resolve(self, request_dict: dict) -> str:
+        """Pop and return the raw `prompt`, or render `template_id` with `variables`, from a request body."""
+        template_id = request_dict.pop("template_id", None)
+        variables = request_dict.pop("variables", None)
+        if template_id is None:
+            if "prompt" not in request_dict:
+                raise ValueError("Either 'prompt' or 'template_id' is required")
+            return request_dict.pop("prompt")
+        return self.render(template_id, variables)
+
+    def __contains__(self, template_id: str) -> bool:
+        return template_id in self._templates
+
+    @classmethod
+    def from_mapping(cls, templates: dict) -> "PromptTemplateRegistry":
+        registry = cls()
+        for template_id, template in templates.items():
+            registry.register(template_id, template)
+        return registry
+
+    @classmethod
+    def from_file(cls, path: str) -> "PromptTemplateRegistry":
+        """Load templates from a JSON file mapping template id to template string."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_mapping(json.load(f))
+
+
+def load_prompt_templates(path: Optional[str] = None, default: Optional[str] = None) -> PromptTemplateRegistry:
+    """Templates from `path`, else PROMPT_TEMPLATES_PATH, else the deployment's `default` file."""
+    path = path or os.getenv("PROMPT_TEMPLATES_PATH") or default
+    if not path:
+        return PromptTemplateRegistry()
+    return PromptTemplateRegistry.from_file(path)
@@ -0,0 +1,29 @@
+import os
+
+import torch
+
+from deployments.utils import logger
+
+# "none" or "int8"; int8 only applies on CPU
+BLIP_QUANTIZATION = os.getenv("BLIP_QUANTIZATION", "none")
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Dynamic int8 quantization of every `nn.Linear` (vision encoder, text encoder and decoder):
+    weights are stored as int8 and activations are quantized on the fly per batch.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def apply_quantization(model: torch.nn.Module, mode: str = BLIP_QUANTIZATION, device: str = "cpu") -> torch.nn.Module:
+    if mode in ("", "none"):
+        return model
+    if mode != "int8":
+        raise ValueError(f"Unknown quantization mode '{mode}', expected 'none' or 'int8'")
+    if str(device) != "cpu":
+        logger.warning("int8 dynamic quantization only runs on CPU; keeping the fp model on %s.", device)
+        return model
+    model = quantize_int8(model.eval())
+    logger.info("Quantized linear layers to int8.")
+    return model
@@ -0,0 +1,101 @@
+import os
+from typing import List, Optional
+
+import torch
+
+from deployments.utils import logger
+
+
+def parse_core_set(spec: str) -> List[int]:
+    """Parse a core list such as "0-3,8,10-11"."""
+    cores = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.extend(range(int(start), int(end) + 1))
+        else:
+            cores.append(int(part))
+    return sorted(set(cores))
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class RuntimeProfile:
+    """
+    CPU runtime settings applied once per replica, before the model is loaded.
+
+    Thread pools are sized from the replica's CPU allocation rather than the whole node, so
+    several replicas on one node don't oversubscribe the cores.
+    """
+
+    def __init__(
+        self,
+        num_threads: int,
+        interop_threads: int = 1,
+        cpu_affinity: Optional[List[int]] = None,
+        inference_mode: bool = True,
+        compile_vision: bool = False,
+    ):
+        self.num_threads = max(num_threads, 1)
+        self.interop_threads = max(interop_threads, 1)
+        self.cpu_affinity = cpu_affinity
+        self.inference_mode = inference_mode
+        self.compile_vision = compile_vision
+
+    @classmethod
+    def from_env(cls, cpu_allocation: Optional[int] = None, allow_affinity: bool = True) -> "RuntimeProfile":
+        """
+        `cpu_allocation` is the replica's CPU share (e.g. Ray `num_cpus`); `TORCH_NUM_THREADS`,
+        `TORCH_INTEROP_THREADS`, `CPU_AFFINITY`, `TORCH_INFERENCE_MODE` and `TORCH_COMPILE_VISION` override it.
+        Pass `allow_affinity=False` where one environment is shared by several replicas on a node.
+        """
+        cpu_affinity = parse_core_set(os.getenv("CPU_AFFINITY", "")) or None
+        if cpu_affinity and not allow_affinity:
+            logger.warning("Ignoring CPU_AFFINITY: every replica on the node would be pinned to the same cores.")
+            cpu_affinity = None
+        default_threads = len(cpu_affinity) if cpu_affinity else (cpu_allocation or available_cpus())
+        return cls(
+            num_threads=int(os.getenv("TORCH_NUM_THREADS", str(default_threads))),
+            interop_threads=int(os.getenv("TORCH_INTEROP_THREADS", "1")),
+            cpu_affinity=cpu_affinity,
+            inference_mode=os.getenv("TORCH_INFERENCE_MODE", "1") == "1",
+            compile_vision=os.getenv("TORCH_COMPILE_VISION", "0") == "1",
+        )
+
+    def apply(self):
+        """
+        Pin the CPUs and size the thread pools. Call before loading the model: on Linux the
+        affinity applies to the calling thread and only to threads it starts afterwards, so
+        torch / OpenMP / ONNX Runtime workers created during loading would keep the full mask.
+        """
+        if self.cpu_affinity:
+            os.sched_setaffinity(0, self.cpu_affinity)
+        torch.set_num_threads(self.num_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError as e:
+            # Can only be set before any inter-op parallel work has started in this process
+            logger.warning("Could not set inter-op threads: %s", e)
+
+    def compile(self, model: torch.nn.Module, vision_attr: str = "vision_model") -> torch.nn.Module:
+        """Compile the vision encoder of a loaded `model` when TORCH_COMPILE_VISION is on, and log the profile."""
+        if self.compile_vision and hasattr(model, vision_attr):
+            setattr(model, vision_attr, torch.compile(getattr(model, vision_attr)))
+        self.log()
+        return model
+
+    def inference_context(self):
+        return torch.inference_mode() if self.inference_mode else torch.no_grad()
+
+    def log(self):
+        affinity = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+        logger.info(
+            f"Runtime profile: intra-op threads={torch.get_num_threads()}, "
+            f"inter-op threads={torch.get_num_interop_threads()}, cpu affinity={affinity}, "
+            f"inference_mode={self.inference_mode}, compile_vision={self.compile_vision}"
+        )
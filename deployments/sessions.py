@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+import torch
+from transformers import DynamicCache
+
+from deployments.utils import logger
+
+
+class ChatSession:
+    """
+    One camera conversation: the LLM's past key values plus the exact prompt text they cover,
+    so a follow-up turn only has to prefill the text that comes after it.
+    """
+
+    def __init__(self, session_id: str, past_key_values, cached_text: str, messages: List[dict], num_tokens: int):
+        self.session_id = session_id
+        self.past_key_values = past_key_values
+        self.cached_text = cached_text
+        self.messages = messages
+        self.num_tokens = num_tokens
+        self.nbytes = cache_nbytes(past_key_values)
+        self.last_used = time.time()
+        # Turns of one session must not interleave, they extend the same cache
+        self.lock = threading.Lock()
+
+    def update(self, past_key_values, cached_text: str, num_tokens: int):
+        self.past_key_values = past_key_values
+        self.cached_text = cached_text
+        self.num_tokens = num_tokens
+        self.nbytes = cache_nbytes(past_key_values)
+
+
+class SessionStore:
+    """Sessions evicted least-recently-used first when over `max_sessions` or `max_bytes`, or after `ttl_s` idle."""
+
+    def __init__(self, max_sessions: int = 32, max_bytes: int = 4 * 1024**3, ttl_s: float = 300.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._sessions = OrderedDict()  # session_id -> ChatSession
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "32")),
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(4 * 1024**3))),
+            ttl_s=float(os.getenv("SESSION_TTL_S", "300")),
+        )
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session: ChatSession):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            session.last_used = time.time()
+            self._expire()
+            while len(self._sessions) > self.max_sessions or self.total_bytes() > self.max_bytes:
+                oldest_id = next(iter(self._sessions))
+                if oldest_id == session.session_id:
+                    break
+                self._evict(oldest_id, "memory cap")
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def total_bytes(self) -> int:
+        return sum(session.nbytes for session in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "cache_bytes": self.total_bytes(),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "evictions": self.evictions,
+            }
+
+    def _expire(self):
+        deadline = time.time() - self.ttl_s
+        for session_id in [sid for sid, s in self._sessions.items() if s.last_used < deadline]:
+            self._evict(session_id, "ttl")
+
+    def _evict(self, session_id: str, reason: str):
+        self._sessions.pop(session_id)
+        self.evictions += 1
+        logger.info("Evicted chat session %s (%s).", session_id, reason)
+
+
+def cache_nbytes(past_key_values) -> int:
+    """Size of a `DynamicCache` or legacy tuple-of-tuples KV cache."""
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "key_cache"):
+        tensors = list(past_key_values.key_cache) + list(past_key_values.value_cache)
+    else:
+        tensors = [tensor for layer in past_key_values for tensor in layer]
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def cache_length(past_key_values) -> int:
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "get_seq_length"):
+        return past_key_values.get_seq_length()
+    return past_key_values[0][0].shape[2]
+
+
+def decode_with_cache(
+    llm,
+    past_key_values,
+    terminators: List[int],
+    max_new_tokens: int,
+    input_ids: Optional[torch.Tensor] = None,
+    inputs_embeds: Optional[torch.Tensor] = None,
+    sampling: bool = False,
+    temperature: float = 0.7,
+    top_p: float = 0.8,
+):
+    """
+    Prefill `input_ids`/`inputs_embeds` on top of `past_key_values`, then decode one token at a
+    time. The terminator is fed back too, so the returned cache covers the whole turn.
+    Returns (generated token ids, past key values).
+    """
+    generated = []
+    if past_key_values is None:
+        past_key_values = DynamicCache()
+    with torch.inference_mode():
+        outputs = llm(input_ids=input_ids, inputs_embeds=inputs_embeds, past_key_values=past_key_values, use_cache=True)
+        while True:
+            logits = outputs.logits[:, -1, :].float()
+            next_token = _sample(logits, temperature, top_p) if sampling else logits.argmax(dim=-1)
+            generated.append(int(next_token))
+            outputs = llm(input_ids=next_token.view(1, 1), past_key_values=outputs.past_key_values, use_cache=True)
+            if generated[-1] in terminators or len(generated) >= max_new_tokens:
+                return generated, outputs.past_key_values
+
+
+def _sample(logits: torch.Tensor, temperature: float, top_p: float) -> torch.Tensor:
+    probs = torch.softmax(logits / max(temperature, 1e-5), dim=-1)
+    sorted_probs, sorted_indices = probs.sort(dim=-1, descending=True)
+    # Keep the smallest prefix whose mass reaches top_p
+    keep = sorted_probs.cumsum(dim=-1) - sorted_probs < top_p
+    sorted_probs = sorted_probs * keep
+    choice = torch.multinomial(sorted_probs / sorted_probs.sum(dim=-1, keepdim=True), 1)
+    return sorted_indices.gather(-1, choice).view(-1)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import struct
+from typing import Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from deployments.batching import INFER_BATCH_MAX_SIZE, infer_with_fallback
+from deployments.utils import logger, decode_bytes_to_image
+
+# Binary frame layout: header (sequence number, question length, image length) followed by
+# the UTF-8 question and the raw encoded image (JPEG/PNG), all in network byte order.
+FRAME_HEADER = struct.Struct("!IHI")
+STREAM_MAX_IN_FLIGHT = int(os.getenv("STREAM_MAX_IN_FLIGHT", "64"))
+
+
+def pack_frame(seq: int, question: str, image_bytes: bytes) -> bytes:
+    question_bytes = question.encode("utf-8")
+    return FRAME_HEADER.pack(seq, len(question_bytes), len(image_bytes)) + question_bytes + image_bytes
+
+
+def unpack_frame(data: bytes) -> Tuple[int, str, bytes]:
+    if len(data) < FRAME_HEADER.size:
+        raise ValueError(f"Frame shorter than the {FRAME_HEADER.size}-byte header")
+    seq, question_length, image_length = FRAME_HEADER.unpack_from(data)
+    question_end = FRAME_HEADER.size + question_length
+    if len(data) != question_end + image_length:
+        raise ValueError(f"Frame {seq} length does not match its header")
+    question = data[FRAME_HEADER.size:question_end].decode("utf-8")
+    return seq, question, data[question_end:]
+
+
+async def serve_frame_stream(
+    websocket: WebSocket,
+    infer_batch,
+    max_batch_size: int = INFER_BATCH_MAX_SIZE,
+    max_in_flight: int = STREAM_MAX_IN_FLIGHT,
+):
+    """
+    Serve one long-lived frame stream. Frames are queued as they arrive, so a client can
+    pipeline without waiting; whatever is queued when the model frees up runs as one batch.
+    Results are sent back as JSON text messages tagged with the frame's sequence number.
+    """
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=max_in_flight)
+    receiver = asyncio.create_task(_receive_frames(websocket, queue))
+    worker = asyncio.create_task(_process_frames(websocket, queue, infer_batch, max_batch_size))
+    try:
+        # Whichever side stops first ends the stream: a crashed worker would otherwise leave
+        # the receiver queueing frames nobody answers.
+        done, _ = await asyncio.wait({receiver, worker}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        worker.cancel()
+    if worker in done and not worker.cancelled() and worker.exception() is not None:
+        error = worker.exception()
+        if not isinstance(error, WebSocketDisconnect):
+            logger.error("Frame stream worker failed: %s", error)
+            await websocket.close(code=1011)
+            return
+    logger.info("Frame stream client disconnected.")
+
+
+async def _receive_frames(websocket: WebSocket, queue: asyncio.Queue):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        data = message.get("bytes")
+        if data is None:
+            await _send_error(websocket, "Expected a binary frame, got a text message")
+            continue
+        try:
+            frame = unpack_frame(data)
+        except ValueError as e:
+            await _send_error(websocket, str(e))
+            continue
+        await queue.put(frame)
+
+
+async def _send_error(websocket: WebSocket, error: str):
+    await websocket.send_text(json.dumps({"seq": None, "prediction": None, "error": error}))
+
+
+async def _process_frames(websocket: WebSocket, queue: asyncio.Queue, infer_batch, max_batch_size: int):
+    while True:
+        frames = [await queue.get()]
+        while len(frames) < max_batch_size and not queue.empty():
+            frames.append(queue.get_nowait())
+        results = await run_in_threadpool(_infer_frames, frames, infer_batch)
+        for result in results:
+            await websocket.send_text(json.dumps(result))
+
+
+def _infer_frames(frames, infer_batch):
+    # Kept by position, not seq: clients may reuse or repeat sequence numbers
+    results = [None] * len(frames)
+    decoded = []  # (position, image, question)
+    for position, (seq, question, image_bytes) in enumerate(frames):
+        try:
+            decoded.append((position, decode_bytes_to_image(image_bytes), question))
+        except Exception as e:
+            results[position] = {"seq": seq, "prediction": None, "error": str(e)}
+
+    if decoded:
+        outcomes = infer_with_fallback(
+            infer_batch, [image for _, image, _ in decoded], [question for _, _, question in decoded]
+        )
+        for (position, _, _), (prediction, error) in zip(decoded, outcomes):
+            results[position] = {"seq": frames[position][0], "prediction": prediction, "error": error}
+
+    return results
+
+
+class FrameStreamClient:
+    """
+    Pipelining client for `/ws/infer`: `send` never waits for results, read them
+    back with `receive` in completion order. Requires the `websockets` package.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._websocket = None
+
+    async def __aenter__(self) -> "FrameStreamClient":
+        import websockets
+
+        # Frames are already compressed images, so skip permessage-deflate.
+        self._websocket = await websockets.connect(self.url, max_size=None, compression=None)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._websocket.close()
+
+    async def send(self, seq: int, question: str, image_bytes: bytes):
+        await self._websocket.send(pack_frame(seq, question, image_bytes))
+
+    async def receive(self) -> dict:
+        return json.loads(await self._websocket.recv())
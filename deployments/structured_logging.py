@@ -0,0 +1,107 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+# LogRecord attributes that aren't user-supplied `extra=` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are included as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records unformatted, so building the message (`%`-style args) and the formatter's
+    work happen on the listener thread instead of the request path. The stock QueueHandler
+    formats in the caller. Drops records rather than blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Per call site token bucket (`rate` records/s, bursts of `burst`) plus random sampling, for
+    INFO and below only: warnings and errors always pass. The next record let through from a
+    throttled call site carries `suppressed`, the number dropped since.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = 10, sample_rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self._buckets = {}  # (logger, path, line) -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [float(self.burst), now, 0])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+def install_queue_handler(logger: logging.Logger, handler: logging.Handler, queue_size: int = 10000,
+                          log_filter: logging.Filter = None) -> DeferredQueueHandler:
+    """Route `logger` through a bounded queue to `handler`, which runs on a background listener thread."""
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DeferredQueueHandler(log_queue)
+    if log_filter is not None:
+        # Filtered before enqueueing, so throttled records cost no queue traffic
+        queue_handler.addFilter(log_filter)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Drains what's queued on shutdown
+    logger.addHandler(queue_handler)
+    return queue_handler
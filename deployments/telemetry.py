@@ -0,0 +1,143 @@
+"""
+Per-request token accounting in compact append-only logs, one file per model under TELEMETRY_DIR.
+
+Each request is a fixed 28-byte record (time, camera hash, prompt/visual/output tokens and
+prompt/output characters), so a busy replica writes ~2.4 MB per day at 1 request/s.
+Fit the distributions the pricing models need with:
+
+    python -m deployments.telemetry calibrate --log-dir /var/log/dummy_server/tokens --output calibration.json
+
+and load them with `TextCount.from_calibration` in `pricing/cost_calculation.py`.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from deployments.utils import logger
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("camera", "<u4"),  # crc32 of the camera id, 0 when unknown
+    ("prompt_tokens", "<u4"),  # Text tokens of the prompt (system + question)
+    ("visual_tokens", "<u4"),
+    ("output_tokens", "<u4"),
+    ("prompt_chars", "<u2"),
+    ("output_chars", "<u2"),
+])
+LOG_SUFFIX = ".tokens"
+PERCENTILES = (50, 90, 99)
+
+
+def log_path(log_dir: str, model_name: str) -> str:
+    return os.path.join(log_dir, model_name.replace("/", "--") + LOG_SUFFIX)
+
+
+class TokenLog:
+    """Appends one record per request; writes are serialised and flushed so a crash loses at most one."""
+
+    def __init__(self, log_dir: str, model_name: str):
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = log_path(log_dir, model_name)
+        self._file = open(self.path, "ab")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model_name: str) -> Optional["TokenLog"]:
+        """None unless TELEMETRY_DIR is set."""
+        log_dir = os.getenv("TELEMETRY_DIR", "")
+        if not log_dir:
+            return None
+        logger.info("Token accounting for %s in %s", model_name, log_path(log_dir, model_name))
+        return cls(log_dir, model_name)
+
+    def record(
+        self,
+        prompt_tokens: int,
+        visual_tokens: int,
+        output_tokens: int,
+        prompt_chars: int = 0,
+        output_chars: int = 0,
+        camera_id: Optional[str] = None,
+    ):
+        record = np.array([(
+            time.time(),
+            zlib.crc32(camera_id.encode("utf-8")) if camera_id else 0,
+            prompt_tokens,
+            visual_tokens,
+            output_tokens,
+            min(prompt_chars, 0xFFFF),
+            min(output_chars, 0xFFFF),
+        )], dtype=RECORD_DTYPE)
+        with self._lock:
+            self._file.write(record.tobytes())
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_log(path: str) -> np.ndarray:
+    """All complete records of a log; a trailing partial record from a crash is ignored."""
+    size = os.path.getsize(path) // RECORD_DTYPE.itemsize
+    return np.fromfile(path, dtype=RECORD_DTYPE, count=size)
+
+
+def summarize(records: np.ndarray, cameras: Optional[int] = None) -> dict:
+    """Mean and percentiles of every count, plus the request rate per camera."""
+    summary = {"requests": int(len(records))}
+    for field in ("prompt_tokens", "visual_tokens", "output_tokens", "prompt_chars", "output_chars"):
+        values = records[field].astype(np.float64)
+        summary[field] = {"mean": float(values.mean())}
+        summary[field].update({f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+
+    span_s = float(records["time"].max() - records["time"].min()) if len(records) > 1 else 0.0
+    known = records["camera"][records["camera"] != 0]
+    cameras = cameras or (len(np.unique(known)) if len(known) else None)
+    summary["span_s"] = span_s
+    summary["cameras"] = cameras
+    # n records span n - 1 inter-arrival gaps
+    summary["requests_per_second"] = (len(records) - 1) / span_s if span_s else None
+    summary["requests_per_camera_per_second"] = (
+        summary["requests_per_second"] / cameras if summary["requests_per_second"] and cameras else None
+    )
+    return summary
+
+
+def calibrate(log_dir: str, since_s: Optional[float] = None, cameras: Optional[int] = None) -> dict:
+    """Summaries of every model log in `log_dir`, keyed by model name."""
+    calibration = {}
+    for name in sorted(os.listdir(log_dir)):
+        if not name.endswith(LOG_SUFFIX):
+            continue
+        records = read_log(os.path.join(log_dir, name))
+        if since_s is not None:
+            records = records[records["time"] >= time.time() - since_s]
+        if len(records):
+            calibration[name[:-len(LOG_SUFFIX)].replace("--", "/")] = summarize(records, cameras)
+    return calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit = subparsers.add_parser("calibrate", help="Fit token distributions and request rates from the logs")
+    fit.add_argument("--log-dir", default=os.getenv("TELEMETRY_DIR", ""))
+    fit.add_argument("--since-hours", type=float, help="Only use records from the last N hours")
+    fit.add_argument("--cameras", type=int, help="Fleet size, when requests don't carry camera ids")
+    fit.add_argument("--output", default="calibration.json")
+    args = parser.parse_args()
+
+    calibration = calibrate(args.log_dir, args.since_hours * 3600 if args.since_hours else None, args.cameras)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(calibration, f, indent=2)
+    print(json.dumps(calibration, indent=2))
+
+
+if __name__ == "__main__":
+    main()
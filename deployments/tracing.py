@@ -0,0 +1,189 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+TRACE_HEADER = "X-Trace-Id"
+
+
+@dataclass
+class TraceContext:
+    """
+    Travels with a request across the handle call; `sent_at` is wall clock so it compares across processes.
+    `parent_id` is the span that spans made from this context nest under.
+    """
+
+    trace_id: str
+    sent_at: float = 0.0
+    parent_id: Optional[str] = None
+
+    def handoff(self) -> "TraceContext":
+        """A copy stamped with the current time, to pass along with a handle call."""
+        return TraceContext(self.trace_id, time.time(), self.parent_id)
+
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@dataclass
+class Span:
+    trace_id: str
+    name: str
+    start: float  # Wall clock, seconds since the epoch
+    duration_ms: float
+    attributes: dict = field(default_factory=dict)
+    span_id: str = field(default_factory=new_span_id)
+    parent_id: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_span(context: TraceContext, name: str, start: float, end: float, **attributes) -> dict:
+    """A span as a plain dict, cheap to pickle back from a Ray replica with its result."""
+    return Span(context.trace_id, name, start, (end - start) * 1000, attributes, parent_id=context.parent_id).to_dict()
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one model batch so the same spans can be attached to every
+    traced request in it. Stages are recorded once per batch, not per request.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_id = uuid.uuid4().hex[:12]
+        self.batch_size = batch_size
+        self.started_at = time.time()
+        self.stages: List[tuple] = []  # (name, start, end)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start, time.time()))
+
+    def spans_for(self, context: Optional[TraceContext], arrived_at: Optional[float] = None, **attributes) -> List[dict]:
+        """Spans for one request in the batch: transit and batch wait (if `arrived_at` is known) then each stage."""
+        if context is None:
+            return []
+        attributes = {"batch_id": self.batch_id, "batch_size": self.batch_size, **attributes}
+        spans = []
+        if arrived_at is not None:
+            if context.sent_at:
+                spans.append(make_span(context, "handle.transit", context.sent_at, arrived_at, **attributes))
+            spans.append(make_span(context, "batch.wait", arrived_at, self.started_at, **attributes))
+        spans.extend(make_span(context, name, start, end, **attributes) for name, start, end in self.stages)
+        return spans
+
+
+class Tracer:
+    """
+    Keeps the spans of the last `buffer_size` traces in memory, grouped by trace id, and
+    optionally appends every span as a JSON line to `path`. `sample_rate` applies to traces
+    started here; an id supplied by the caller (`X-Trace-Id`) is always traced.
+    """
+
+    def __init__(self, buffer_size: int = 1000, sample_rate: float = 1.0, path: Optional[str] = None):
+        self.buffer_size = buffer_size
+        self.sample_rate = sample_rate
+        self.path = path
+        self._traces: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1) if path else None
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "1000")),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1")),
+            path=os.getenv("TRACE_FILE") or None,
+        )
+
+    def start_trace(self, trace_id: Optional[str] = None) -> Optional[TraceContext]:
+        """A context for a new request, or None when it isn't sampled."""
+        if trace_id is None:
+            if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+                return None
+            trace_id = uuid.uuid4().hex
+        return TraceContext(trace_id=trace_id, sent_at=time.time())
+
+    def record(self, spans: List[dict]):
+        if not spans:
+            return
+        with self._lock:
+            for span in spans:
+                trace = self._traces.get(span["trace_id"])
+                if trace is None:
+                    trace = self._traces[span["trace_id"]] = []
+                    if len(self._traces) > self.buffer_size:
+                        self._traces.popitem(last=False)
+                trace.append(span)
+                if self._file is not None:
+                    self._file.write(json.dumps(span, default=str) + "\n")
+
+    @contextmanager
+    def span(self, context: Optional[TraceContext], name: str, **attributes):
+        """
+        Record the enclosed block as a span of `context`; a no-op when the request isn't traced.
+        Yields the context for spans nested in this one (hand it off to link the replica's spans).
+        """
+        if context is None:
+            yield None
+            return
+        span_id = new_span_id()
+        start = time.time()
+        try:
+            yield TraceContext(context.trace_id, context.sent_at, parent_id=span_id)
+        finally:
+            span = Span(context.trace_id, name, start, (time.time() - start) * 1000, attributes,
+                        span_id=span_id, parent_id=context.parent_id)
+            self.record([span.to_dict()])
+
+    def traces(self, limit: int = 50, trace_id: Optional[str] = None, min_duration_ms: float = 0.0) -> List[dict]:
+        """Most recent traces first, each with its spans in start order and its end-to-end duration."""
+        with self._lock:
+            if trace_id is not None:
+                items = [(trace_id, list(self._traces.get(trace_id, [])))]
+            else:
+                items = [(key, list(spans)) for key, spans in reversed(self._traces.items())]
+        result = []
+        for key, spans in items:
+            if not spans:
+                continue
+            spans.sort(key=lambda span: span["start"])
+            start = spans[0]["start"]
+            end = max(span["start"] + span["duration_ms"] / 1000 for span in spans)
+            duration_ms = (end - start) * 1000
+            if duration_ms < min_duration_ms:
+                continue
+            result.append({"trace_id": key, "start": start, "duration_ms": duration_ms, "spans": spans})
+            if len(result) >= limit:
+                break
+        return result
+
+    def stage_summary(self) -> Dict[str, dict]:
+        """p50/p99/max per span name over the buffered traces, to see which hop a latency spike comes from."""
+        with self._lock:
+            durations: Dict[str, list] = {}
+            for spans in self._traces.values():
+                for span in spans:
+                    durations.setdefault(span["name"], []).append(span["duration_ms"])
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))],
+                "max_ms": values[-1],
+            }
+        return summary
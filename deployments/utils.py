@@ -2,9 +2,11 @@ from PIL import Image
 import base64
 from io import BytesIO
 import logging
+import os
 import time
 from colorlog import ColoredFormatter
 import functools
+from deployments.structured_logging import JsonFormatter, RateLimitFilter, install_queue_handler
 
 
 class SingletonMeta(type):
@@ -17,10 +19,27 @@ class SingletonMeta(type):
             cls._instances[cls] = super().__call__(*args, **kwargs)
         return cls._instances[cls]
 
+
+class SuppressedCountFormatter(ColoredFormatter):
+    """Color format that also shows the `suppressed` count RateLimitFilter puts on a throttled call site's next record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{message} ({suppressed} similar suppressed)" if suppressed else message
+
+
 class Logger(metaclass=SingletonMeta):
+    """
+    Configured from the environment: LOG_LEVEL, LOG_FORMAT ("color" or "json"), LOG_ASYNC=0 to
+    write synchronously, and LOG_RATE_LIMIT / LOG_RATE_BURST / LOG_SAMPLE_RATE to throttle
+    per-request INFO/DEBUG messages per call site (see deployments/structured_logging.py).
+    """
+
     def __init__(self, level=logging.INFO):
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(level)
+        self.logger.setLevel(os.getenv("LOG_LEVEL", "").upper() or level)
+        self.queue_handler = None
 
         # Check if the logger already has handlers to avoid duplicate logs
         if not self.logger.hasHandlers():
@@ -36,15 +55,28 @@ class Logger(metaclass=SingletonMeta):
                 "TIMER": "blue",
             }
 
-            formatter = ColoredFormatter(
-                "%(log_color)s%(levelname)-8s%(reset)s %(message)s [%(module)s/%(funcName)s/line %(lineno)d]",
-                datefmt=None,
-                reset=True,
-                log_colors=log_colors,
-            )
+            if os.getenv("LOG_FORMAT", "color") == "json":
+                formatter = JsonFormatter()
+            else:
+                formatter = SuppressedCountFormatter(
+                    "%(log_color)s%(levelname)-8s%(reset)s %(message)s [%(module)s/%(funcName)s/line %(lineno)d]",
+                    datefmt=None,
+                    reset=True,
+                    log_colors=log_colors,
+                )
 
             handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+            rate_limit = RateLimitFilter(
+                rate=float(os.getenv("LOG_RATE_LIMIT", "0")),
+                burst=int(os.getenv("LOG_RATE_BURST", "10")),
+                sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1")),
+            )
+            if os.getenv("LOG_ASYNC", "1") == "1":
+                # Formatting and stderr writes happen on a listener thread, off the request path
+                self.queue_handler = install_queue_handler(self.logger, handler, log_filter=rate_limit)
+            else:
+                handler.addFilter(rate_limit)
+                self.logger.addHandler(handler)
 
         logging.addLevelName(25, "TIMER")
 
@@ -56,7 +88,7 @@ class Logger(metaclass=SingletonMeta):
             self.logger._log(25, message, args, **kwargs)
 
 
-logger = Logger(logging.DEBUG).get_logger()
+logger = Logger().get_logger()
 
 
 def time_it(func):
@@ -75,8 +107,16 @@ def decode_base64_to_image(image_base64: str) -> Image.Image:
     try:
         image_data = base64.b64decode(image_base64)
         image = Image.open(BytesIO(image_data)).convert('RGB')
-        logger.info("Image decoded successfully")
+        logger.debug("Image decoded successfully")
         return image
     except Exception as e:
-        logger.error(f"Error decoding base64 image: {str(e)}")
+        logger.error("Error decoding base64 image: %s", e)
+        raise
+
+
+def decode_bytes_to_image(image_data: bytes) -> Image.Image:
+    try:
+        return Image.open(BytesIO(image_data)).convert('RGB')
+    except Exception as e:
+        logger.error("Error decoding image bytes: %s", e)
         raise
\ No newline at end of file
@@ -0,0 +1,38 @@
+import time
+
+from ray.serve import metrics
+
+
+class EngineMetrics:
+    """Time-to-first-token, prompt token and prefix cache metrics shared by the vLLM deployments, one per replica."""
+
+    def __init__(self):
+        self.ttft_histogram = metrics.Histogram(
+            "vllm_time_to_first_token_s",
+            description="Time from request submission to the first generated token.",
+            boundaries=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0],
+        )
+        self.prompt_tokens_counter = metrics.Counter(
+            "vllm_prompt_tokens", description="Prompt tokens submitted to the engine."
+        )
+        self.cached_prompt_tokens_counter = metrics.Counter(
+            "vllm_cached_prompt_tokens", description="Prompt tokens served from the prefix cache."
+        )
+        self.prefix_cache_hits_counter = metrics.Counter(
+            "vllm_prefix_cache_hits", description="Requests that reused at least one cached prefix block."
+        )
+
+    async def track_first_token(self, results_generator, start_time: float, stats: dict):
+        """Pass outputs through, recording time-to-first-token and prefix cache usage in `stats`."""
+        async for request_output in results_generator:
+            if "ttft_s" not in stats:
+                stats["ttft_s"] = time.perf_counter() - start_time
+                stats["prompt_tokens"] = len(request_output.prompt_token_ids or [])
+                # Only reported by vLLM versions that track prefix cache usage per request
+                stats["num_cached_tokens"] = getattr(request_output, "num_cached_tokens", None) or 0
+                self.ttft_histogram.observe(stats["ttft_s"])
+                self.prompt_tokens_counter.inc(stats["prompt_tokens"])
+                if stats["num_cached_tokens"]:
+                    self.cached_prompt_tokens_counter.inc(stats["num_cached_tokens"])
+                    self.prefix_cache_hits_counter.inc()
+            yield request_output
@@ -0,0 +1,154 @@
+"""
+Replicas and nodes needed to serve a camera fleet within a latency SLO, from measured
+throughput/latency curves, compared against sending the same traffic to an API model.
+
+Each curve point is a `benchmarks/harness.py` result: one deployment, one server batch size and
+one load level. A replica's capacity is the highest throughput it sustained while the chosen
+latency percentile stayed under the SLO; the fleet needs `cameras * fps * gate_ratio` requests
+per second, served at `--target-utilization` of that capacity.
+
+    python -m pricing.capacity_planner --results benchmarks/results/*.json --cameras 2000 --fps 1 --gate-ratio 0.3 \
+        --slo-ms 1000 --node-cores 16 --node-price-per-hour 0.68
+"""
+import argparse
+import json
+import math
+
+import pandas as pd
+
+from pricing.cost_calculation import (
+    DAYS_IN_MONTH, HOURS_IN_DAY, MINUTES_IN_HOUR, SECONDS_IN_MINUTE,
+    CostComponent, GPT4O, GPT4OMini, Gemini, apply_calibration,
+)
+
+API_CLASSES = {"gpt4o": GPT4O, "gpt4o-mini": GPT4OMini, "gemini": Gemini}
+
+
+def load_curves(paths) -> pd.DataFrame:
+    """One row per harness result: deployment, batch size, load level, throughput and latency percentiles."""
+    rows = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        config, summary, resources = report["config"], report["summary"], report.get("resources", {})
+        rows.append({
+            "deployment": report["deployment"],
+            "batch_size": config.get("batch_size") or 1,
+            "load": config.get("concurrency") or config.get("rps"),
+            "throughput_rps": summary["throughput_rps"],
+            "p50_ms": summary.get("p50_ms"),
+            "p95_ms": summary.get("p95_ms"),
+            "p99_ms": summary.get("p99_ms"),
+            "error_rate": summary.get("error_rate") or 0.0,
+            "cpu_cores_used": (resources.get("cpu_percent_mean") or 0.0) / 100,
+            "source": path,
+        })
+    return pd.DataFrame(rows)
+
+
+def replica_capacity(curves: pd.DataFrame, slo_ms: float, percentile: str, max_error_rate: float) -> pd.DataFrame:
+    """
+    Best point within the SLO per deployment and batch size (deployments that never meet it are dropped,
+    as are points that served nothing).
+    """
+    ok = curves[
+        (curves[percentile] <= slo_ms) & (curves["error_rate"] <= max_error_rate) & (curves["throughput_rps"] > 0)
+    ]
+    best = ok.loc[ok.groupby(["deployment", "batch_size"])["throughput_rps"].idxmax()]
+    return best.rename(columns={"throughput_rps": "capacity_rps", percentile: f"{percentile}_at_capacity"})
+
+
+class SelfHostedCost(CostComponent):
+    """Nodes running `replicas` model replicas, `replicas_per_node` to a node."""
+
+    def __init__(self, number_of_clients, number_of_cameras_per_client, replicas, replicas_per_node, node_price_per_hour):
+        super().__init__(number_of_clients, number_of_cameras_per_client)
+        self.replicas = replicas
+        self.nodes = math.ceil(replicas / replicas_per_node)
+        self.node_price_per_hour = node_price_per_hour
+
+    def get_price_per_hour(self):
+        return self.nodes * self.node_price_per_hour
+
+
+def api_price_per_hour(api_class, cameras: int, requests_per_second: float, low_resolution: bool) -> float:
+    if api_class in (GPT4O, GPT4OMini):
+        api = api_class(1, cameras, low_resolution=low_resolution)
+    else:
+        api = api_class(1, cameras)
+    return api.single_request_price * requests_per_second * SECONDS_IN_MINUTE * MINUTES_IN_HOUR
+
+
+def plan(args, curves: pd.DataFrame) -> pd.DataFrame:
+    """Every option that can serve the fleet, cheapest first; empty when none can."""
+    if not 0 < args.target_utilization <= 1:
+        raise ValueError(f"target_utilization must be in (0, 1], got {args.target_utilization}")
+    required_rps = args.cameras * args.fps * args.gate_ratio
+    capacity = replica_capacity(curves, args.slo_ms, args.percentile, args.max_error_rate)
+    rows = []
+    for _, point in capacity.iterrows():
+        cores_per_replica = args.cores_per_replica or max(math.ceil(point["cpu_cores_used"]), 1)
+        replicas = math.ceil(required_rps / (point["capacity_rps"] * args.target_utilization))
+        cost = SelfHostedCost(1, args.cameras, replicas, max(args.node_cores // cores_per_replica, 1),
+                              args.node_price_per_hour)
+        rows.append({
+            "option": f"{point['deployment']} (batch {point['batch_size']})",
+            "capacity_rps_per_replica": point["capacity_rps"],
+            args.percentile: point[f"{args.percentile}_at_capacity"],
+            "cores_per_replica": cores_per_replica,
+            "replicas": replicas,
+            "nodes": cost.nodes,
+            "price_per_hour": cost.get_price_per_hour(),
+            "monthly_cost": cost.get_avg_monthly_price(),
+        })
+    for name in args.api_models:
+        price_per_hour = api_price_per_hour(API_CLASSES[name], args.cameras, required_rps, args.low_resolution)
+        rows.append({
+            "option": f"API {name}",
+            "price_per_hour": price_per_hour,
+            "monthly_cost": price_per_hour * HOURS_IN_DAY * DAYS_IN_MONTH,
+        })
+    if not rows:
+        return pd.DataFrame(columns=["option", "price_per_hour", "monthly_cost", "monthly_cost_per_camera"])
+    df = pd.DataFrame(rows).sort_values("monthly_cost", ignore_index=True)
+    df["monthly_cost_per_camera"] = df["monthly_cost"] / args.cameras
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", nargs="+", required=True, help="benchmarks/harness.py result files")
+    parser.add_argument("--cameras", type=int, default=2000)
+    parser.add_argument("--fps", type=float, default=1.0, help="Frames per second per camera")
+    parser.add_argument("--gate-ratio", type=float, default=0.3, help="Share of frames left after motion gating")
+    parser.add_argument("--slo-ms", type=float, default=1000.0)
+    parser.add_argument("--percentile", choices=["p50_ms", "p95_ms", "p99_ms"], default="p95_ms")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--target-utilization", type=float, default=0.8, help="Headroom for bursts and failover")
+    parser.add_argument("--cores-per-replica", type=int, help="Default: measured mean CPU use of the run")
+    parser.add_argument("--node-cores", type=int, default=16)
+    parser.add_argument("--node-price-per-hour", type=float, default=0.68)
+    parser.add_argument("--api-models", nargs="*", choices=sorted(API_CLASSES), default=["gpt4o-mini", "gemini"])
+    parser.add_argument("--low-resolution", action="store_true")
+    parser.add_argument("--calibration", help="Measured token counts from `python -m deployments.telemetry calibrate`")
+    parser.add_argument("--calibration-model")
+    parser.add_argument("--output", help="Save the plan as CSV")
+    args = parser.parse_args()
+    if not 0 < args.target_utilization <= 1:
+        parser.error("--target-utilization must be in (0, 1]")
+    if args.calibration:
+        apply_calibration(args.calibration, args.calibration_model)
+
+    df = plan(args, load_curves(args.results))
+    print(f"Fleet: {args.cameras} cameras x {args.fps} fps x {args.gate_ratio} gated = "
+          f"{args.cameras * args.fps * args.gate_ratio:.1f} requests/s, SLO {args.percentile} <= {args.slo_ms} ms")
+    if df.empty:
+        raise SystemExit("No configuration meets the SLO (and no --api-models to compare).")
+    print(df.to_string(index=False))
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"Plan saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
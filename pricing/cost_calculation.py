@@ -1,4 +1,6 @@
+import argparse
 import dataclasses
+import json
 from abc import ABC, abstractmethod
 import pandas as pd
 
@@ -7,6 +9,8 @@ DAYS_IN_MONTH = 30
 HOURS_IN_DAY = 24
 MINUTES_IN_HOUR = 60
 SECONDS_IN_MINUTE = 60
+# LLM requests each camera sends; `apply_calibration` replaces it with the measured rate
+requests_per_camera_per_second = 1.0
 
 
 @dataclasses.dataclass
@@ -37,10 +41,50 @@ class TextCount:
     def total_output_char(self) -> float:
         return self.system_prompt_image_description_input_char + self.final_json_output_char
 
+    @classmethod
+    def from_calibration(cls, model_calibration: dict, statistic: str = "p90") -> "TextCount":
+        """
+        Counts measured by `deployments/telemetry.py` for one model (`mean`, `p50`, `p90` or `p99`).
+        The servers answer in a single call, so the whole prompt is the question and the whole
+        answer the final output; the two-stage description fields are zero.
+        """
+        return cls(
+            system_prompt_image_description_input_tokens=0,
+            system_prompt_llm_analysis_input_tokens=0,
+            user_prompt_question_input_tokens=model_calibration["prompt_tokens"][statistic],
+            image_description_output_tokens=0,
+            final_json_output_tokens=model_calibration["output_tokens"][statistic],
+            system_prompt_image_description_input_char=0,
+            system_prompt_llm_analysis_input_char=0,
+            user_prompt_question_input_char=model_calibration["prompt_chars"][statistic],
+            image_description_output_char=0,
+            final_json_output_char=model_calibration["output_chars"][statistic],
+        )
+
 
 text_count = TextCount()
 
 
+def load_calibration(path: str, model_name: str = None) -> dict:
+    """One model's entry of a `python -m deployments.telemetry calibrate` output (the only one if unnamed)."""
+    with open(path, "r", encoding="utf-8") as f:
+        calibration = json.load(f)
+    if model_name is None:
+        if len(calibration) != 1:
+            raise ValueError(f"Calibration has models {sorted(calibration)}; pick one")
+        return next(iter(calibration.values()))
+    return calibration[model_name]
+
+
+def apply_calibration(path: str, model_name: str = None, statistic: str = "p90"):
+    """Use measured token counts and request rate for every cost component created afterwards."""
+    global text_count, requests_per_camera_per_second
+    model_calibration = load_calibration(path, model_name)
+    text_count = TextCount.from_calibration(model_calibration, statistic)
+    if model_calibration.get("requests_per_camera_per_second"):
+        requests_per_camera_per_second = model_calibration["requests_per_camera_per_second"]
+
+
 class CostComponent(ABC):
     def __init__(self, number_of_clients, number_of_cameras_per_client):
         self.number_of_clients = number_of_clients
@@ -145,7 +189,8 @@ class Gemini(CostComponent):
         return input_price + output_price + self.cost_per_image
 
     def get_price_per_hour(self):
-        return self.single_request_price * SECONDS_IN_MINUTE * MINUTES_IN_HOUR * self.total_number_of_cameras
+        return (self.single_request_price * requests_per_camera_per_second * SECONDS_IN_MINUTE * MINUTES_IN_HOUR
+                * self.total_number_of_cameras)
 
 
 
@@ -182,7 +227,8 @@ class GPT4O(CostComponent):
         return input_price + output_price
 
     def get_price_per_hour(self):
-        return self.single_request_price * SECONDS_IN_MINUTE * MINUTES_IN_HOUR * self.total_number_of_cameras
+        return (self.single_request_price * requests_per_camera_per_second * SECONDS_IN_MINUTE * MINUTES_IN_HOUR
+                * self.total_number_of_cameras)
 
 
 class GPT4OMini(CostComponent):
@@ -218,7 +264,8 @@ class GPT4OMini(CostComponent):
         return input_price + output_price
 
     def get_price_per_hour(self):
-        return self.single_request_price * SECONDS_IN_MINUTE * MINUTES_IN_HOUR * self.total_number_of_cameras
+        return (self.single_request_price * requests_per_camera_per_second * SECONDS_IN_MINUTE * MINUTES_IN_HOUR
+                * self.total_number_of_cameras)
 
 
 class StartupCostCalculator:
@@ -341,6 +388,14 @@ class StartupCostCalculator:
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calibration", help="Measured counts from `python -m deployments.telemetry calibrate`")
+    parser.add_argument("--calibration-model", help="Model entry to use when the calibration has several")
+    parser.add_argument("--statistic", default="p90", choices=["mean", "p50", "p90", "p99"])
+    args = parser.parse_args()
+    if args.calibration:
+        apply_calibration(args.calibration, args.calibration_model, args.statistic)
+
     calculator = StartupCostCalculator(
         number_of_clients=2,
         number_of_cameras_per_client=10,
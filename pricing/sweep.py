@@ -0,0 +1,155 @@
+"""
+Cost sweep over many fleet configurations at once. Every combination of client count, cameras
+per client, frame rate, gating ratio (share of frames sent to the LLM) and model is evaluated
+with NumPy in one pass; the costs still come from the `CostComponent` classes, whose formulas
+work elementwise on arrays of client and camera counts.
+
+    python -m pricing.sweep --clients 1:200:10 --cameras-per-client 5,10,20 --fps 0.2,1 --gate-ratio 0.1:1:0.1 \
+        --models gpt4o-mini gemini --price-per-camera 30 --output sweep.parquet
+"""
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from pricing.cost_calculation import (
+    DAYS_IN_MONTH, HOURS_IN_DAY, MINUTES_IN_HOUR, SECONDS_IN_MINUTE,
+    GPT4O, GPT4OMini, Gemini, WebsiteCost, WhatsAppCost, apply_calibration,
+)
+
+LLM_CLASSES = {"gpt4o": GPT4O, "gpt4o-mini": GPT4OMini, "gemini": Gemini}
+
+
+def parse_axis(text: str) -> np.ndarray:
+    """`"1,2,5"` for a list of values or `"start:stop:step"` for an inclusive range."""
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        return np.round(np.arange(start, stop + step / 2, step), 10)
+    return np.array([float(part) for part in text.split(",")])
+
+
+def make_llm(llm_class, low_resolution: bool = False):
+    """A single-camera instance of an LLM cost component, for its model name and price per request."""
+    if llm_class in (GPT4O, GPT4OMini):
+        return llm_class(1, 1, low_resolution=low_resolution)
+    return llm_class(1, 1)
+
+
+def sweep(
+    clients,
+    cameras_per_client,
+    fps,
+    gate_ratio,
+    models=("gpt4o-mini",),
+    low_resolution=(False,),
+    alerts_per_camera_per_day: float = 1.0,
+    active_hours_per_day: float = HOURS_IN_DAY,
+) -> pd.DataFrame:
+    """Monthly cost of every combination, one row each."""
+    grid = np.meshgrid(
+        np.asarray(clients, dtype=float),
+        np.asarray(cameras_per_client, dtype=float),
+        np.asarray(fps, dtype=float),
+        np.asarray(gate_ratio, dtype=float),
+        indexing="ij",
+    )
+    n_clients, n_cameras_per_client, n_fps, n_gate = (axis.ravel() for axis in grid)
+    cameras = n_clients * n_cameras_per_client
+    llm_requests_per_hour = cameras * n_fps * n_gate * SECONDS_IN_MINUTE * MINUTES_IN_HOUR
+    # The components' own formulas, evaluated on the whole grid at once
+    whatsapp = WhatsAppCost(n_clients, n_cameras_per_client)
+    whatsapp_monthly = whatsapp.get_daily_price(alerts_per_camera_per_day) * DAYS_IN_MONTH
+    website_monthly = np.full_like(cameras, WebsiteCost(1, 1).get_avg_monthly_price())
+
+    frames = []
+    for model, low_res in itertools.product(models, low_resolution):
+        llm = make_llm(LLM_CLASSES[model], low_res)
+        # The request rate comes from the fps and gating axes rather than the module-wide rate get_price_per_hour uses
+        llm_monthly = llm_requests_per_hour * llm.single_request_price * active_hours_per_day * DAYS_IN_MONTH
+        total_monthly = llm_monthly + whatsapp_monthly + website_monthly
+        frames.append(pd.DataFrame({
+            "model": model,
+            "model_name": llm.model_name,
+            "low_resolution": low_res,
+            "clients": n_clients.astype(int),
+            "cameras_per_client": n_cameras_per_client.astype(int),
+            "cameras": cameras.astype(int),
+            "fps": n_fps,
+            "gate_ratio": n_gate,
+            "llm_requests_per_hour": llm_requests_per_hour,
+            "llm_monthly": llm_monthly,
+            "whatsapp_monthly": whatsapp_monthly,
+            "website_monthly": website_monthly,
+            "total_monthly": total_monthly,
+            "monthly_per_camera": total_monthly / cameras,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def break_even(df: pd.DataFrame, price_per_camera: float) -> pd.DataFrame:
+    """
+    For each model/resolution/frame rate/gating/fleet shape: the smallest client count whose
+    revenue (`price_per_camera` per camera-month) covers the cost, or NaN if none in the sweep.
+    """
+    df = df.assign(margin_monthly=df["cameras"] * price_per_camera - df["total_monthly"])
+    keys = ["model", "low_resolution", "fps", "gate_ratio", "cameras_per_client"]
+    profitable = df[df["margin_monthly"] >= 0]
+    first = profitable.loc[profitable.groupby(keys)["clients"].idxmin(), keys + ["clients"]]
+    summary = (
+        df.groupby(keys, as_index=False)
+        .agg(min_cost_per_camera=("monthly_per_camera", "min"), max_margin_monthly=("margin_monthly", "max"))
+        .merge(first.rename(columns={"clients": "break_even_clients"}), on=keys, how="left")
+    )
+    return summary
+
+
+def save(df: pd.DataFrame, path: str):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    print(f"Saved {len(df)} rows to '{path}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1:100:1")
+    parser.add_argument("--cameras-per-client", default="5,10,20")
+    parser.add_argument("--fps", default="1", help="LLM-eligible frames per second per camera")
+    parser.add_argument("--gate-ratio", default="0.1:1:0.1", help="Share of frames that pass motion/BLIP gating")
+    parser.add_argument("--models", nargs="+", choices=sorted(LLM_CLASSES), default=["gpt4o-mini"])
+    parser.add_argument("--low-resolution", choices=["yes", "no", "both"], default="yes")
+    parser.add_argument("--alerts-per-camera-per-day", type=float, default=1.0)
+    parser.add_argument("--active-hours-per-day", type=float, default=HOURS_IN_DAY)
+    parser.add_argument("--price-per-camera", type=float, help="Monthly revenue per camera, enables break-even summary")
+    parser.add_argument("--output", default="cost_sweep.csv", help=".csv or .parquet")
+    parser.add_argument("--calibration", help="Measured token counts from `python -m deployments.telemetry calibrate`")
+    parser.add_argument("--calibration-model", help="Model entry to use when the calibration has several")
+    parser.add_argument("--statistic", default="p90", choices=["mean", "p50", "p90", "p99"])
+    args = parser.parse_args()
+    if args.calibration:
+        # Token counts only; the request rate is swept through --fps and --gate-ratio
+        apply_calibration(args.calibration, args.calibration_model, args.statistic)
+
+    low_resolution = {"yes": (True,), "no": (False,), "both": (False, True)}[args.low_resolution]
+    df = sweep(
+        parse_axis(args.clients),
+        parse_axis(args.cameras_per_client),
+        parse_axis(args.fps),
+        parse_axis(args.gate_ratio),
+        models=args.models,
+        low_resolution=low_resolution,
+        alerts_per_camera_per_day=args.alerts_per_camera_per_day,
+        active_hours_per_day=args.active_hours_per_day,
+    )
+    save(df, args.output)
+    if args.price_per_camera is not None:
+        summary = break_even(df, args.price_per_camera)
+        print(summary.to_string(index=False))
+        stem = args.output.rsplit(".", 1)[0]
+        save(summary, f"{stem}_break_even.{args.output.rsplit('.', 1)[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import random
+import statistics
+
+from deployments.adaptive_batching import AdaptiveBatchController
+
+
+def poisson_rate_estimates(rate: float, arrivals: int, seed: int) -> list:
+    rng = random.Random(seed)
+    controller = AdaptiveBatchController(latency_slo_s=1.0)
+    now, estimates = 0.0, []
+    for _ in range(arrivals):
+        now += rng.expovariate(rate)
+        controller.record_arrival(now)
+        estimates.append(controller.arrival_rate)
+    return estimates[50:]
+
+
+def test_arrival_rate_is_not_biased_by_short_gaps():
+    estimates = poisson_rate_estimates(rate=50.0, arrivals=5000, seed=0)
+    assert 40 < statistics.median(estimates) < 60
+    assert 40 < statistics.mean(estimates) < 60
+    assert max(estimates) < 150
+
+
+def test_no_wait_before_any_arrivals():
+    controller = AdaptiveBatchController(latency_slo_s=1.0)
+    controller.record_batch(batch_size=4, service_time_s=0.1, queue_depth=0)
+    assert controller.wait_timeout_s == controller.min_wait_s
+
+
+def test_wait_timeout_lets_batches_fill_at_steady_traffic():
+    controller = AdaptiveBatchController(latency_slo_s=1.0, max_batch_size=8, max_wait_s=0.2)
+    for step in range(200):
+        controller.record_arrival(step * 0.02)  # 50 req/s
+    for _ in range(20):
+        controller.record_batch(batch_size=8, service_time_s=0.1, queue_depth=0)
+    assert controller.batch_size == 8
+    # Seven more requests at 50 req/s take ~0.14 s, which the timeout should allow for
+    assert abs(controller.wait_timeout_s - 7 / 50) < 0.01
+
+
+def test_batch_size_respects_latency_slo():
+    controller = AdaptiveBatchController(latency_slo_s=0.5, max_batch_size=32)
+    for batch_size in (1, 2, 4, 8, 16):
+        controller.record_batch(batch_size=batch_size, service_time_s=0.01 + 0.02 * batch_size, queue_depth=0)
+    assert 2 * controller.service_time(controller.batch_size) <= 0.5
+    assert 2 * controller.service_time(controller.batch_size + 1) > 0.5 - controller.min_wait_s
+
+
+def test_grows_past_one_when_fixed_overhead_dominates():
+    # 0.3 s per batch plus 0.01 s per item: one item costs more than SLO / 4, but batching is nearly free
+    controller = AdaptiveBatchController(latency_slo_s=1.0, max_batch_size=32)
+    assert controller.batch_size == 1
+    for _ in range(50):
+        batch_size = controller.batch_size  # Saturated queue: every batch is full
+        controller.record_batch(batch_size, 0.3 + 0.01 * batch_size, queue_depth=batch_size)
+    assert controller.batch_size > 10
+    assert 2 * (0.3 + 0.01 * controller.batch_size) <= 1.0
+
+
+def test_no_probe_when_one_item_already_uses_the_slo():
+    controller = AdaptiveBatchController(latency_slo_s=1.0)
+    for _ in range(10):
+        controller.record_batch(1, 0.6, queue_depth=5)
+    assert controller.batch_size == 1
@@ -0,0 +1,31 @@
+from deployments.alert_output import extract_json_object, parse_alert, validate
+
+
+def test_parse_alert_ignores_trailing_output():
+    text = 'Sure: {"severity": "high", "labels": ["fire"], "description": "smoke at gate"} and more'
+    alert, error = parse_alert(text)
+    assert error is None
+    assert alert == {"severity": "high", "labels": ["fire"], "description": "smoke at gate"}
+
+
+def test_extract_json_object_handles_braces_in_strings():
+    assert extract_json_object('{"a": "}{"} tail') == '{"a": "}{"}'
+    assert extract_json_object('{"a": 1') is None
+
+
+def test_parse_alert_reports_schema_errors():
+    alert, error = parse_alert('{"severity": "extreme", "labels": [], "description": ""}')
+    assert alert is None
+    assert "severity" in error
+
+
+def test_validate_null_and_unknown_types():
+    assert validate(None, {"type": "null"}) is None
+    assert validate(1, {"type": "null"}) == "$: expected null"
+    assert validate(1, {"type": "date"}) == "$: unsupported schema type 'date'"
+
+
+def test_validate_rejects_booleans_as_numbers():
+    assert validate(True, {"type": "integer"}) == "$: expected integer"
+    assert validate(True, {"type": "boolean"}) is None
+    assert validate(3, {"type": "number"}) is None
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from deployments.alerts import AlertDispatcher, AlertPolicy, AlertRule, Notifier
+
+HIGH = {"severity": "high", "labels": ["person"], "description": "person at the gate"}
+LOW = {"severity": "low", "labels": ["cat"], "description": "cat on the porch"}
+
+
+class StubNotifier(Notifier):
+    """Records messages; fails the first `failures` sends."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.messages = []
+        self.closed = False
+
+    async def send(self, client_id, alerts, text):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("stub send failure")
+        self.messages.append((client_id, [alert.camera_id for alert in alerts], text))
+
+    async def close(self):
+        self.closed = True
+
+
+def make_dispatcher(notifier, cooldown_s=300.0, **kwargs) -> AlertDispatcher:
+    policy = AlertPolicy([AlertRule("default", min_severity="medium", cooldown_s=cooldown_s)])
+    kwargs = {"flush_interval_s": 3600, "retry_backoff_s": 0, **kwargs}
+    return AlertDispatcher(policy, notifier, **kwargs)
+
+
+def test_policy_applies_severity_and_cooldown():
+    policy = AlertPolicy([AlertRule("default", min_severity="medium", cooldown_s=60)])
+    assert policy.evaluate("c1", "cam1", LOW, now=0) == []
+    assert len(policy.evaluate("c1", "cam1", HIGH, now=0)) == 1
+    assert policy.evaluate("c1", "cam1", HIGH, now=30) == []
+    assert policy.suppressed == 1
+    assert len(policy.evaluate("c1", "cam2", HIGH, now=30)) == 1  # Cooldowns are per camera
+    assert len(policy.evaluate("c1", "cam1", HIGH, now=61)) == 1
+
+
+def test_label_rules_only_fire_on_their_labels():
+    policy = AlertPolicy([AlertRule("vehicles", min_severity="low", labels=["car"])])
+    assert policy.evaluate("c1", "cam1", HIGH, now=0) == []
+    assert len(policy.evaluate("c1", "cam1", {**HIGH, "labels": ["car"]}, now=0)) == 1
+
+
+def test_from_env_rejects_unknown_severity(monkeypatch):
+    monkeypatch.setenv("ALERT_RULES", '[{"name": "typo", "min_severity": "hihg"}]')
+    with pytest.raises(ValueError, match="min_severity"):
+        AlertPolicy.from_env()
+
+
+def test_notifier_requires_send():
+    class Incomplete(Notifier):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_flush_groups_alerts_per_client():
+    async def scenario():
+        notifier = StubNotifier()
+        dispatcher = make_dispatcher(notifier)
+        for camera in ("cam1", "cam2", "cam3"):
+            dispatcher.submit("c1", camera, HIGH, now=0)
+        dispatcher.submit("c2", "cam1", HIGH, now=0)
+        await dispatcher.flush()
+        await dispatcher.close()
+        return notifier, dispatcher
+
+    notifier, dispatcher = asyncio.run(scenario())
+    assert sorted((client, sorted(cameras)) for client, cameras, _ in notifier.messages) == [
+        ("c1", ["cam1", "cam2", "cam3"]), ("c2", ["cam1"]),
+    ]
+    assert dispatcher.stats()["messages_sent"] == 2
+    assert dispatcher.stats()["alerts"] == 4
+
+
+def test_retries_until_delivered():
+    async def scenario():
+        notifier = StubNotifier(failures=2)
+        dispatcher = make_dispatcher(notifier, max_retries=3)
+        dispatcher.submit("c1", "cam1", HIGH, now=0)
+        await dispatcher.flush()
+        await dispatcher.close()
+        return notifier, dispatcher
+
+    notifier, dispatcher = asyncio.run(scenario())
+    assert notifier.attempts == 3
+    assert len(notifier.messages) == 1
+    assert dispatcher.send_failures == 0
+
+
+def test_failed_delivery_releases_cooldown():
+    async def scenario():
+        notifier = StubNotifier(failures=10)
+        dispatcher = make_dispatcher(notifier, max_retries=1)
+        dispatcher.submit("c1", "cam1", HIGH, now=0)
+        await dispatcher.flush()
+        assert dispatcher.send_failures == 1
+        # Never delivered, so the camera's next alert isn't held back by the cooldown
+        return dispatcher.submit("c1", "cam1", HIGH, now=10), dispatcher
+
+    refired, dispatcher = asyncio.run(scenario())
+    assert len(refired) == 1
+    assert dispatcher.policy.suppressed == 0
+
+
+def test_dropped_alert_releases_cooldown():
+    async def scenario():
+        dispatcher = make_dispatcher(StubNotifier(), queue_size=1)
+        dispatcher.submit("c1", "cam1", HIGH, now=0)
+        dispatcher.submit("c1", "cam2", HIGH, now=0)  # Queue full: dropped
+        assert dispatcher.dropped == 1
+        await dispatcher.flush()
+        # cam1 was queued and stays in cooldown; cam2 was dropped and may fire again
+        return dispatcher.submit("c1", "cam1", HIGH, now=10), dispatcher.submit("c1", "cam2", HIGH, now=10)
+
+    cam1, cam2 = asyncio.run(scenario())
+    assert cam1 == []
+    assert len(cam2) == 1
+
+
+def test_close_delivers_queued_alerts():
+    async def scenario():
+        notifier = StubNotifier()
+        dispatcher = make_dispatcher(notifier)
+        dispatcher.submit("c1", "cam1", HIGH, now=0)
+        await dispatcher.close()
+        return notifier
+
+    notifier = asyncio.run(scenario())
+    assert len(notifier.messages) == 1
+    assert notifier.closed
@@ -0,0 +1,76 @@
+import base64
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments.batching import BatchItem, iter_batch_results
+from deployments.cache import InMemoryCacheBackend, ResponseCache
+from deployments.models.dummy import main as dummy
+
+
+def image_b64(color=(0, 0, 0)) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(dummy, "response_cache", ResponseCache(InMemoryCacheBackend(), dummy.model_instance.model_name))
+    with TestClient(dummy.app) as client:
+        yield client
+
+
+def test_invalid_items_only_fail_themselves(client):
+    items = [
+        {"question": "q0", "base64_image": image_b64(), "camera_id": "cam0"},
+        {"question": "q1", "base64_image": "not an image", "camera_id": "cam1"},
+        {"question": "q2", "base64_image": image_b64((255, 0, 0)), "camera_id": "cam2"},
+    ]
+    response = client.post("/infer_batch", json={"items": items})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["camera_id"] for result in results] == ["cam0", "cam1", "cam2"]
+    assert results[0]["prediction"] and results[2]["prediction"]
+    assert results[1]["prediction"] is None and results[1]["error"]
+
+
+def test_repeated_items_hit_the_cache(client):
+    items = [{"question": "q", "base64_image": image_b64()}, {"question": "other", "base64_image": image_b64()}]
+    first = client.post("/infer_batch", json={"items": items}).json()["results"]
+    second = client.post("/infer_batch", json={"items": items}).json()["results"]
+    assert [result["cache_hit"] for result in first] == [False, False]
+    assert [result["cache_hit"] for result in second] == [True, True]
+    assert [result["prediction"] for result in second] == [result["prediction"] for result in first]
+
+
+def test_stream_yields_results_in_request_order(client):
+    client.post("/infer_batch", json={"items": [{"question": "q3", "base64_image": image_b64()}]})
+    # More items than one model batch, with an invalid item and a cache hit mixed in
+    items = [{"question": f"q{index}", "base64_image": image_b64()} for index in range(12)]
+    items[5]["base64_image"] = "not an image"
+    with client.stream("POST", "/infer_batch", json={"items": items, "stream": True}) as response:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in response.iter_lines() if line]
+    assert [result["index"] for result in results] == list(range(12))
+    assert results[3]["cache_hit"] and results[5]["error"]
+
+
+def test_mismatched_prediction_count_is_retried_per_item():
+    def drops_items(images, questions):
+        return [f"answer: {questions[0]}"]
+
+    items = [BatchItem(question=f"q{index}", base64_image=image_b64()) for index in range(3)]
+    results = list(iter_batch_results(items, drops_items))
+    assert [result.prediction for result in results] == ["answer: q0", "answer: q1", "answer: q2"]
+
+
+def test_missing_predictions_become_item_errors():
+    items = [BatchItem(question="q", base64_image=image_b64())]
+    result, = iter_batch_results(items, lambda images, questions: [])
+    assert result.prediction is None
+    assert "0 predictions for 1 inputs" in result.error
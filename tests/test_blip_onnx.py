@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from transformers import BlipConfig, BlipForQuestionAnswering
+
+from deployments.models.blip.onnx_backend import BlipOnnxGenerator, default_providers
+from deployments.models.blip.onnx_export import export
+
+
+def tiny_blip():
+    torch.manual_seed(0)
+    config = BlipConfig(
+        vision_config={
+            "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2, "num_attention_heads": 4,
+            "image_size": 32, "patch_size": 8,
+        },
+        text_config={
+            "vocab_size": 2048, "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2,
+            "num_attention_heads": 4, "encoder_hidden_size": 32, "bos_token_id": 30, "sep_token_id": 102,
+        },
+    )
+    return BlipForQuestionAnswering(config).eval()
+
+
+def test_default_providers_end_with_cpu():
+    providers = default_providers()
+    assert providers[-1] == "CPUExecutionProvider"
+    assert "AzureExecutionProvider" not in providers
+
+
+def test_onnx_generate_matches_pytorch(tmp_path):
+    model = tiny_blip()
+    model.save_pretrained(tmp_path / "model")
+    export(str(tmp_path / "model"), str(tmp_path / "onnx"))
+    generator = BlipOnnxGenerator(str(tmp_path / "onnx"))
+    assert generator.device == "cpu"
+
+    torch.manual_seed(1)
+    pixel_values = torch.randn(2, 3, 32, 32)
+    input_ids = torch.randint(1000, 2000, (2, 5))
+    attention_mask = torch.ones_like(input_ids)
+    with torch.no_grad():
+        expected = model.generate(
+            pixel_values=pixel_values, input_ids=input_ids, attention_mask=attention_mask, max_length=8
+        )
+    actual = generator.generate(pixel_values, input_ids, attention_mask, max_length=8)
+    np.testing.assert_array_equal(actual, expected.numpy())
@@ -0,0 +1,84 @@
+import os
+
+from deployments.cache import DiskCacheBackend, InMemoryCacheBackend, ResponseCache, build_response_cache
+
+
+def json_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".json")]
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set("a", "1", ttl_s=60)
+    backend.set("b", "2", ttl_s=60)
+    assert backend.get("a") == "1"
+    backend.set("c", "3", ttl_s=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+
+
+def test_disk_backend_round_trip_and_expiry(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path))
+    backend.set("key", "value", ttl_s=60)
+    assert backend.get("key") == "value"
+    backend.set("old", "value", ttl_s=-1)
+    assert backend.get("old") is None
+    assert backend.get("missing") is None
+
+
+def test_disk_backend_scans_only_when_needed(tmp_path, monkeypatch):
+    backend = DiskCacheBackend(str(tmp_path), max_entries=1000, scan_every=10)
+    scans = []
+    original = backend._evict
+    monkeypatch.setattr(backend, "_evict", lambda: scans.append(1) or original())
+    for index in range(25):
+        backend.set(f"key{index}", "value", ttl_s=60)
+    # First write, then every 10th write after it
+    assert len(scans) == 3
+
+
+def test_disk_backend_evicts_oldest_once_over_limit(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path), max_entries=5, scan_every=1000)
+    for index in range(12):
+        backend.set(f"key{index}", "value", ttl_s=60)
+        os.utime(backend._path(f"key{index}"), (index, index))
+    assert len(json_files(tmp_path)) <= 5
+    assert backend.get("key11") == "value"
+    assert backend.get("key0") is None
+
+
+def test_disk_backend_picks_up_other_writers(tmp_path):
+    other = DiskCacheBackend(str(tmp_path), max_entries=1000)
+    backend = DiskCacheBackend(str(tmp_path), max_entries=5, scan_every=3)
+    backend.set("mine", "value", ttl_s=60)
+    for index in range(10):
+        other.set(f"other{index}", "value", ttl_s=60)
+    for index in range(3):
+        backend.set(f"mine{index}", "value", ttl_s=60)
+    assert len(json_files(tmp_path)) <= 5
+
+
+def test_disk_backend_has_its_own_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "disk")
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("RESPONSE_CACHE_MAX_BYTES", "1000")
+    monkeypatch.delenv("RESPONSE_CACHE_DISK_MAX_BYTES", raising=False)
+    response_cache = build_response_cache("model")
+    assert isinstance(response_cache.backend, DiskCacheBackend)
+    assert response_cache.backend.max_bytes == 512 * 1024 * 1024
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "memory")
+    assert build_response_cache("model").backend.max_bytes == 1000
+
+
+def test_response_cache_key_depends_on_params():
+    response_cache = ResponseCache(InMemoryCacheBackend(), "model")
+    key = response_cache.make_key("aGVsbG8=", "question", {"sampling": False})
+    assert key == response_cache.make_key("aGVsbG8=", "question", {"sampling": False})
+    assert key != response_cache.make_key("aGVsbG8=", "question", {"sampling": True})
+
+
+def test_response_cache_key_depends_on_variant():
+    backend = InMemoryCacheBackend()
+    torch_key = ResponseCache(backend, "model", variant="torch-none").make_key("aGVsbG8=", "question")
+    int8_key = ResponseCache(backend, "model", variant="torch-int8").make_key("aGVsbG8=", "question")
+    assert torch_key != int8_key
@@ -0,0 +1,71 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+from pricing.capacity_planner import SelfHostedCost, plan, replica_capacity
+
+
+def curves() -> pd.DataFrame:
+    """Two batch sizes of one deployment at rising load, plus a deployment that never meets a 1 s SLO."""
+    rows = [
+        ("blip", 1, 1, 10.0, 200.0, 0.0, 1.0),
+        ("blip", 1, 4, 30.0, 800.0, 0.0, 2.0),
+        ("blip", 1, 8, 35.0, 1500.0, 0.0, 2.0),  # Over the SLO
+        ("blip", 4, 8, 60.0, 900.0, 0.0, 3.5),
+        ("blip", 4, 16, 80.0, 950.0, 0.2, 3.5),  # Too many errors
+        ("slow", 1, 1, 2.0, 3000.0, 0.0, 1.0),
+        ("broken", 1, 1, 0.0, 0.0, 1.0, 0.0),
+    ]
+    columns = ["deployment", "batch_size", "load", "throughput_rps", "p95_ms", "error_rate", "cpu_cores_used"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def make_args(**overrides) -> argparse.Namespace:
+    args = {
+        "cameras": 100, "fps": 1.0, "gate_ratio": 0.5, "slo_ms": 1000.0, "percentile": "p95_ms",
+        "max_error_rate": 0.01, "target_utilization": 0.8, "cores_per_replica": None, "node_cores": 8,
+        "node_price_per_hour": 1.0, "api_models": [], "low_resolution": True,
+    }
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_replica_capacity_takes_the_best_point_within_the_slo():
+    capacity = replica_capacity(curves(), 1000.0, "p95_ms", 0.01).set_index(["deployment", "batch_size"])
+    assert capacity["capacity_rps"].to_dict() == {("blip", 1): 30.0, ("blip", 4): 60.0}
+    assert capacity.loc[("blip", 1), "p95_ms_at_capacity"] == 800.0
+
+
+def test_replica_capacity_ignores_points_that_served_nothing():
+    capacity = replica_capacity(curves(), 10_000.0, "p95_ms", 1.0)
+    assert "broken" not in set(capacity["deployment"])
+
+
+def test_plan_sizes_replicas_and_nodes():
+    df = plan(make_args(), curves()).set_index("option")
+    # 50 requests/s at 80% of each replica's capacity
+    assert df.loc["blip (batch 1)", "replicas"] == 3  # ceil(50 / 24)
+    assert df.loc["blip (batch 4)", "replicas"] == 2  # ceil(50 / 48)
+    assert df.loc["blip (batch 4)", "cores_per_replica"] == 4
+    assert df.loc["blip (batch 4)", "nodes"] == 1  # 2 replicas of 4 cores on an 8-core node
+    expected = SelfHostedCost(1, 100, replicas=2, replicas_per_node=2, node_price_per_hour=1.0)
+    assert df.loc["blip (batch 4)", "monthly_cost"] == pytest.approx(expected.get_avg_monthly_price())
+    assert list(df["monthly_cost"]) == sorted(df["monthly_cost"])
+
+
+def test_plan_includes_api_models():
+    df = plan(make_args(api_models=["gemini"]), curves())
+    assert "API gemini" in set(df["option"])
+    assert (df["monthly_cost_per_camera"] == df["monthly_cost"] / 100).all()
+
+
+def test_plan_is_empty_when_nothing_meets_the_slo():
+    df = plan(make_args(slo_ms=100.0), curves())
+    assert df.empty
+    assert "monthly_cost" in df.columns
+
+
+def test_plan_rejects_zero_utilization():
+    with pytest.raises(ValueError):
+        plan(make_args(target_utilization=0), curves())
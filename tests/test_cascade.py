@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import importlib
+import io
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments.models.blip.model import BLIPVQAModel
+
+QUESTION = "is there a person?"
+
+
+class StubGate:
+    """P("yes") is the red channel of the frame, so red frames escalate and black ones don't."""
+
+    def yes_probability(self, images, questions):
+        return [image.getpixel((0, 0))[0] / 255 for image in images]
+
+
+def image_b64(red: int) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), (red, 0, 0)).save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class HeavyModel:
+    """Answers chat completions and records how many were in flight at once."""
+
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return httpx.Response(self.status_code, json={"choices": [{"message": {"content": "a person at the gate"}}]})
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    # The gate model loads at import; the stub replaces it
+    monkeypatch.setattr(BLIPVQAModel, "load", lambda self: None)
+    module = importlib.import_module("deployments.models.cascade.main")
+    monkeypatch.setattr(module, "gate_model", StubGate())
+    monkeypatch.setattr(module, "stats", module.CascadeStats())
+    monkeypatch.setattr(module, "CASCADE_GATES", [{"question": QUESTION, "threshold": 0.5}])
+    return module
+
+
+def client_for(cascade, monkeypatch, heavy: HeavyModel, max_concurrency: int = 8) -> TestClient:
+    heavy_client = cascade.HeavyModelClient(
+        "http://heavy/v1", "heavy", max_concurrency=max_concurrency, transport=httpx.MockTransport(heavy)
+    )
+    monkeypatch.setattr(cascade, "heavy_model", heavy_client)
+    return TestClient(cascade.app)
+
+
+def test_negative_frame_is_answered_by_the_gate(cascade, monkeypatch):
+    heavy = HeavyModel()
+    with client_for(cascade, monkeypatch, heavy) as client:
+        response = client.post("/infer", json={"question": "what is happening?", "base64_image": image_b64(0)})
+        assert response.status_code == 200
+        assert response.json()["stage"] == "gate"
+        assert response.json()["prediction"] == cascade.CASCADE_GATE_ANSWER
+        assert client.get("/stats").json()["heavy_calls_saved"] == 1
+    assert heavy.requests == []
+
+
+def test_positive_frame_escalates(cascade, monkeypatch):
+    heavy = HeavyModel()
+    with client_for(cascade, monkeypatch, heavy) as client:
+        response = client.post("/infer", json={"question": "what is happening?", "base64_image": image_b64(255)})
+        assert response.json()["stage"] == "heavy"
+        assert response.json()["prediction"] == "a person at the gate"
+        assert response.json()["gate_scores"] == {QUESTION: 1.0}
+    content = heavy.requests[0]["messages"][0]["content"]
+    assert content[0]["image_url"]["url"].startswith("data:image/png;base64,")
+    assert content[1]["text"] == "what is happening?"
+
+
+def test_heavy_failure_is_a_502_and_counted(cascade, monkeypatch):
+    with client_for(cascade, monkeypatch, HeavyModel(status_code=500)) as client:
+        response = client.post("/infer", json={"question": "q", "base64_image": image_b64(255)})
+        assert response.status_code == 502
+        assert client.get("/stats").json()["heavy_errors"] == 1
+
+
+def test_batch_stats_and_escalation_concurrency(cascade, monkeypatch):
+    heavy = HeavyModel()
+    items = [{"question": "q", "base64_image": image_b64(255)} for _ in range(5)]
+    items += [{"question": "q", "base64_image": image_b64(0)}, {"question": "q", "base64_image": "not an image"}]
+    with client_for(cascade, monkeypatch, heavy, max_concurrency=2) as client:
+        results = client.post("/infer_batch", json={"items": items}).json()["results"]
+        assert [result["stage"] for result in results] == ["heavy"] * 5 + ["gate", None]
+        assert results[-1]["error"].startswith("Invalid image")
+        assert client.get("/stats").json() == {
+            "frames": 6,
+            "escalated": 5,
+            "heavy_calls_saved": 1,
+            "escalation_rate": 5 / 6,
+            "heavy_errors": 0,
+        }
+    assert len(heavy.requests) == 5
+    assert heavy.max_in_flight == 2
+
+
+def test_shutdown_closes_the_heavy_client(cascade, monkeypatch):
+    with client_for(cascade, monkeypatch, HeavyModel()):
+        pass
+    assert cascade.heavy_model.client.is_closed
@@ -0,0 +1,50 @@
+import pytest
+from PIL import Image
+
+from deployments.clips import IMAGE_PLACEHOLDER, build_clip_prompt, downscale, lower_limit, select_frames
+
+
+def test_select_frames_keeps_first_and_last():
+    assert select_frames(list(range(10)), 3) == [0, 4, 9]
+    assert select_frames(list(range(10)), 1) == [9]
+    assert select_frames([0, 1], 5) == [0, 1]
+
+
+def test_downscale_only_shrinks():
+    image = Image.new("RGB", (800, 400))
+    assert downscale(image, 200).size == (200, 100)
+    assert downscale(image, None) is image
+    assert downscale(image, 1000) is image
+
+
+def test_clip_prompt_adds_one_placeholder_per_frame():
+    prompt = build_clip_prompt("What changed?", [0.0, 1.5])
+    assert prompt.count(IMAGE_PLACEHOLDER) == 2
+    assert "Frame 2 (t=1.50s)" in prompt
+    assert prompt.endswith("What changed?")
+
+
+def test_clip_prompt_fills_in_missing_placeholders():
+    template = f"Security camera frame: {IMAGE_PLACEHOLDER} Is there an intruder?"
+    prompt = build_clip_prompt(template, [0.0, 1.0, 2.0])
+    assert prompt.count(IMAGE_PLACEHOLDER) == 3
+    assert prompt.endswith(template)
+    assert build_clip_prompt(template, [0.0]) == template
+
+
+def test_clip_prompt_rejects_extra_placeholders():
+    with pytest.raises(ValueError):
+        build_clip_prompt(IMAGE_PLACEHOLDER * 2, [0.0])
+
+
+def test_lower_limit_only_tightens():
+    assert lower_limit(None, 8, "max_frames") == 8
+    assert lower_limit(3, 8, "max_frames") == 3
+    assert lower_limit(20, 8, "max_frames") == 8
+    assert lower_limit(640, None, "frame_max_side") == 640
+
+
+@pytest.mark.parametrize("requested", [0, -2, 1.5, "4", True])
+def test_lower_limit_rejects_invalid_values(requested):
+    with pytest.raises(ValueError):
+        lower_limit(requested, 8, "max_frames")
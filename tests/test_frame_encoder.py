@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+from demo_ui.frame_encoder import EncodeTarget, encode_frame, estimate_image_tokens
+
+
+def make_frame(width=1280, height=720) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def test_detail_only_with_a_tile_budget():
+    assert EncodeTarget().detail is None
+    assert EncodeTarget(max_long_side=1024).detail is None
+    assert EncodeTarget(max_tiles=0).detail == "low"
+    assert EncodeTarget(max_tiles=2).detail == "high"
+
+
+def test_default_target_matches_plain_opencv_encoding():
+    frame = make_frame()
+    encoded = encode_frame(frame)
+    assert (encoded.width, encoded.height, encoded.quality) == (1280, 720, 95)
+    assert encoded.data == cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+def test_byte_and_tile_budgets():
+    frame = make_frame()
+    encoded = encode_frame(frame, EncodeTarget(max_bytes=60_000))
+    assert encoded.num_bytes <= 60_000
+    encoded = encode_frame(frame, EncodeTarget(max_tiles=2))
+    assert encoded.image_tokens <= estimate_image_tokens(512, 1024)
+    assert encode_frame(frame, EncodeTarget(max_tiles=0)).image_tokens == 85
@@ -0,0 +1,68 @@
+import pytest
+from PIL import Image
+
+from deployments.image_budget import (
+    SLICE_PIXELS, TOKENS_PER_SLICE, ImageBudget, crop_to_roi, estimate_slices, estimate_visual_tokens, limit_pixels,
+)
+
+
+def test_resolve_keeps_the_lower_limit():
+    budget = ImageBudget(max_pixels=1_000_000, max_slices=4)
+    assert vars(budget.resolve(500_000, 9)) == {"max_pixels": 500_000, "max_slices": 4}
+    assert vars(budget.resolve(2_000_000, 2)) == {"max_pixels": 1_000_000, "max_slices": 2}
+    assert vars(budget.resolve()) == {"max_pixels": 1_000_000, "max_slices": 4}
+
+
+def test_resolve_without_deployment_limits_takes_the_request():
+    assert vars(ImageBudget().resolve(None, 3)) == {"max_pixels": None, "max_slices": 3}
+
+
+@pytest.mark.parametrize("value", [0, -1])
+def test_non_positive_limits_are_ignored(value):
+    assert vars(ImageBudget(value, value)) == {"max_pixels": None, "max_slices": None}
+    assert vars(ImageBudget(1000, 4).resolve(value, value)) == {"max_pixels": 1000, "max_slices": 4}
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("IMAGE_MAX_PIXELS", "0")
+    monkeypatch.setenv("IMAGE_MAX_SLICES", "2")
+    budget = ImageBudget.from_env()
+    assert budget.max_pixels is None
+    assert budget.pixel_limit() == 2 * SLICE_PIXELS
+
+
+def test_crop_to_roi_uses_fractions_and_clamps():
+    image = Image.new("RGB", (200, 100))
+    assert crop_to_roi(image, [0.25, 0.5, 0.75, 1.0]).size == (100, 50)
+    assert crop_to_roi(image, [-0.5, -1, 2, 3]).size == (200, 100)
+
+
+@pytest.mark.parametrize("roi", [[0.5, 0.0, 0.5, 1.0], [0.0, 0.8, 1.0, 0.2], [0.0, 0.0, 1.0]])
+def test_crop_to_roi_rejects_empty_or_malformed_regions(roi):
+    with pytest.raises(ValueError):
+        crop_to_roi(Image.new("RGB", (10, 10)), roi)
+
+
+def test_limit_pixels_keeps_aspect_ratio():
+    image = limit_pixels(Image.new("RGB", (1600, 900)), 160_000)
+    assert image.size[0] * image.size[1] <= 160_000
+    assert image.size[0] / image.size[1] == pytest.approx(16 / 9, rel=0.01)
+    small = Image.new("RGB", (10, 10))
+    assert limit_pixels(small, 160_000) is small
+
+
+def test_apply_crops_then_resizes():
+    budget = ImageBudget(max_slices=1)
+    image = budget.apply(Image.new("RGB", (1920, 1080)), roi=[0.0, 0.0, 0.5, 0.5])
+    assert image.size[0] * image.size[1] <= SLICE_PIXELS
+    assert image.size[0] / image.size[1] == pytest.approx(16 / 9, rel=0.01)
+
+
+def test_estimate_visual_tokens():
+    assert estimate_visual_tokens(Image.new("RGB", (448, 448))) == TOKENS_PER_SLICE
+    # 1920x1080 is ~10.3 slices: capped at 9 by default, plus the overview image
+    full_hd = Image.new("RGB", (1920, 1080))
+    assert estimate_slices(full_hd) == 9
+    assert estimate_visual_tokens(full_hd) == TOKENS_PER_SLICE * 10
+    assert estimate_visual_tokens(full_hd, max_slices=4) == TOKENS_PER_SLICE * 5
+    assert estimate_visual_tokens(full_hd, tokens_per_slice=96) == 96 * 10
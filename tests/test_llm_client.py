@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from demo_ui.llm_client import CallRecord, CallStats, LLMClient, LLMClientError, retry_delay
+from demo_ui.stub_server import build_app
+
+MESSAGES = [{"role": "user", "content": "What is in the frame?"}]
+
+
+def make_client(app: FastAPI, **kwargs) -> LLMClient:
+    kwargs = {"max_retries": 3, "backoff_s": 0.001, "max_backoff_s": 0.01, **kwargs}
+    return LLMClient(base_url="http://stub/v1", transport=httpx.ASGITransport(app=app), **kwargs)
+
+
+def run_chat(client: LLMClient):
+    async def call():
+        try:
+            return await client.achat(MESSAGES)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(call())
+
+
+def test_successful_call_records_usage():
+    client = make_client(build_app(latency_ms=0, rate_limit_rate=0, error_rate=0))
+    assert run_chat(client) == "A person is standing near the entrance."
+    summary = client.stats.summary()
+    assert summary["calls"] == 1 and summary["retries"] == 0 and summary["failures"] == 0
+    assert summary["prompt_tokens"] > 0 and summary["completion_tokens"] > 0
+
+
+def test_retries_on_503():
+    # Seed 1 answers the first call with an error and the second one normally
+    app = build_app(latency_ms=0, rate_limit_rate=0, error_rate=0.5, seed=1)
+    client = make_client(app)
+    assert run_chat(client)
+    assert app.state.calls == 2
+    assert client.stats.summary()["retries"] == 1
+
+
+def test_429_waits_for_retry_after_ms():
+    app = build_app(latency_ms=0, rate_limit_rate=0.5, error_rate=0, seed=1)
+    client = make_client(app)
+    start = time.perf_counter()
+    assert run_chat(client)
+    # The stub asks for 200 ms; the client's own backoff is capped at 10 ms
+    assert time.perf_counter() - start >= 0.2
+    assert app.state.calls == 2
+
+
+def test_gives_up_after_max_retries():
+    app = build_app(latency_ms=0, rate_limit_rate=0, error_rate=1.0)
+    client = make_client(app, max_retries=2)
+    with pytest.raises(LLMClientError) as error:
+        run_chat(client)
+    assert error.value.status == 503
+    assert app.state.calls == 3
+    summary = client.stats.summary()
+    assert summary["calls"] == 1 and summary["retries"] == 2 and summary["failures"] == 1
+
+
+def test_null_content_returns_empty_string():
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def refusal():
+        return {"choices": [{"message": {"role": "assistant", "content": None, "refusal": "No."}}]}
+
+    assert run_chat(make_client(app)) == ""
+
+
+def test_stats_keep_totals_with_bounded_history():
+    stats = CallStats(window=3)
+    for index in range(10):
+        stats.add(CallRecord(model="m", latency_s=float(index), attempts=2, status=200, prompt_tokens=1))
+    summary = stats.summary()
+    assert len(stats.recent) == 3
+    assert summary["calls"] == 10 and summary["retries"] == 10 and summary["prompt_tokens"] == 10
+    assert summary["latency_max_s"] == 9.0
+    assert summary["latency_p50_s"] == 8.0
+
+
+def test_retry_delay_headers():
+    assert retry_delay(httpx.Headers({"retry-after-ms": "250"})) == 0.25
+    assert retry_delay(httpx.Headers({"retry-after": "2"})) == 2.0
+    assert retry_delay(httpx.Headers({"x-ratelimit-reset-requests": "1m30s"})) == 90.0
+    assert retry_delay(httpx.Headers({})) is None
@@ -0,0 +1,72 @@
+import torch
+from transformers import BlipConfig, BlipForQuestionAnswering
+
+from deployments.model_cache import cache_path, is_prepared, load_model, prepare_model
+
+
+def save_tiny_blip(path) -> str:
+    torch.manual_seed(0)
+    config = BlipConfig(
+        vision_config={
+            "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2, "num_attention_heads": 4,
+            "image_size": 32, "patch_size": 8,
+        },
+        text_config={
+            "vocab_size": 2048, "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2,
+            "num_attention_heads": 4, "encoder_hidden_size": 32, "bos_token_id": 30, "sep_token_id": 102,
+        },
+    )
+    BlipForQuestionAnswering(config).save_pretrained(path)
+    return str(path)
+
+
+def decoder_logits(model) -> torch.Tensor:
+    """Answer-decoder logits through the vision encoder, text encoder and decoder."""
+    torch.manual_seed(1)
+    pixel_values = torch.randn(2, 3, 32, 32)
+    input_ids = torch.randint(1000, 2000, (2, 5))
+    with torch.no_grad():
+        image_embeds = model.vision_model(pixel_values=pixel_values)[0]
+        question_embeds = model.text_encoder(input_ids=input_ids, encoder_hidden_states=image_embeds)[0]
+        return model.text_decoder(input_ids=input_ids[:, :3], encoder_hidden_states=question_embeds).logits
+
+
+def test_prepared_model_matches_from_pretrained(tmp_path):
+    model_name = save_tiny_blip(tmp_path / "blip")
+    cache_dir = str(tmp_path / "cache")
+    prepare_model(BlipForQuestionAnswering, None, model_name, cache_dir=cache_dir)
+    assert is_prepared(model_name, "float32", cache_dir)
+
+    cached = load_model(BlipForQuestionAnswering, model_name, cache_dir=cache_dir)
+    expected = BlipForQuestionAnswering.from_pretrained(model_name).eval()
+    assert not any(tensor.is_meta for tensor in cached.state_dict().values())
+    torch.testing.assert_close(decoder_logits(cached), decoder_logits(expected), rtol=0, atol=0)
+    # Weights that share storage after from_pretrained (tied ones) still share it
+    def shared(model):
+        pointers = {}
+        for name, tensor in model.state_dict().items():
+            pointers.setdefault(tensor.data_ptr(), []).append(name)
+        return sorted(names for names in pointers.values() if len(names) > 1)
+
+    assert shared(cached) == shared(expected)
+
+
+def test_prepare_casts_to_the_serving_dtype(tmp_path):
+    model_name = save_tiny_blip(tmp_path / "blip")
+    cache_dir = str(tmp_path / "cache")
+    prepare_model(BlipForQuestionAnswering, None, model_name, dtype="bfloat16", cache_dir=cache_dir)
+    assert not is_prepared(model_name, "float32", cache_dir)
+    model = load_model(BlipForQuestionAnswering, model_name, dtype="bfloat16", cache_dir=cache_dir)
+    assert {param.dtype for param in model.parameters()} == {torch.bfloat16}
+
+
+def test_falls_back_to_from_pretrained_without_a_cache(tmp_path):
+    model_name = save_tiny_blip(tmp_path / "blip")
+    missing = str(tmp_path / "missing")
+    assert not is_prepared(model_name, "float32", missing)
+    model = load_model(BlipForQuestionAnswering, model_name, cache_dir=missing)
+    expected = BlipForQuestionAnswering.from_pretrained(model_name).eval()
+    torch.testing.assert_close(decoder_logits(model), decoder_logits(expected), rtol=0, atol=0)
+    assert not model.training
+    assert not (tmp_path / "missing").exists()
+    assert cache_path(model_name, "float32", missing).startswith(missing)
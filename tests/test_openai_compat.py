@@ -0,0 +1,91 @@
+import base64
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments.clips import IMAGE_PLACEHOLDER
+from deployments.models.dummy import main as dummy
+from deployments.openai_compat import ChatCompletionRequest, parse_messages
+
+
+def data_uri(size=(24, 16)) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def request_body(url=None, **extra) -> dict:
+    content = [{"type": "text", "text": "What is happening?"}]
+    if url is not None:
+        content.insert(0, {"type": "image_url", "image_url": {"url": url}})
+    return {
+        "model": "vision",
+        "messages": [{"role": "system", "content": "Be brief."}, {"role": "user", "content": content}],
+        **extra,
+    }
+
+
+def test_parse_messages_decodes_data_uri_images():
+    chat_request = ChatCompletionRequest(**request_body(data_uri()))
+    conversation, images = parse_messages(chat_request.messages)
+    assert [image.size for image in images] == [(24, 16)]
+    assert conversation[0] == {"role": "system", "content": "Be brief.", "images": []}
+    assert conversation[1]["content"] == f"{IMAGE_PLACEHOLDER}\nWhat is happening?"
+    assert conversation[1]["images"] == images
+
+
+@pytest.mark.parametrize("url", [None, "https://example.com/frame.jpg", "data:image/png;base64,not-an-image"])
+def test_parse_messages_rejects_missing_or_unusable_images(url):
+    chat_request = ChatCompletionRequest(**request_body(url))
+    with pytest.raises(HTTPException) as error:
+        parse_messages(chat_request.messages)
+    assert error.value.status_code == 400
+
+
+def test_parse_messages_rejects_unknown_parts():
+    chat_request = ChatCompletionRequest(messages=[{"role": "user", "content": [{"type": "audio", "audio": "..."}]}])
+    with pytest.raises(HTTPException) as error:
+        parse_messages(chat_request.messages)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def client():
+    with TestClient(dummy.app) as client:
+        yield client
+
+
+def test_chat_completion_response_shape(client):
+    response = client.post("/v1/chat/completions", json=request_body(data_uri()))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["object"] == "chat.completion"
+    assert body["id"].startswith("chatcmpl-")
+    assert body["model"] == "vision"
+    choice, = body["choices"]
+    assert choice["message"] == {"role": "assistant", "content": "this is a dummy response"}
+    assert choice["finish_reason"] == "stop"
+    usage = body["usage"]
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+
+def test_chat_completion_stream(client):
+    with client.stream("POST", "/v1/chat/completions", json=request_body(data_uri(), stream=True)) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line[len("data: "):] for line in response.iter_lines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert {chunk["object"] for chunk in chunks} == {"chat.completion.chunk"}
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert text.strip() == "this is a dummy response"
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_chat_completion_without_image_is_a_400(client):
+    response = client.post("/v1/chat/completions", json=request_body())
+    assert response.status_code == 400
+    assert "image_url" in response.json()["detail"]
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from pricing import cost_calculation
+from pricing.cost_calculation import GPT4OMini, Gemini, WebsiteCost, WhatsAppCost
+from pricing.sweep import break_even, parse_axis, sweep
+
+
+def test_parse_axis():
+    np.testing.assert_allclose(parse_axis("0.1:0.3:0.1"), [0.1, 0.2, 0.3])
+    np.testing.assert_allclose(parse_axis("5,10,20"), [5, 10, 20])
+
+
+@pytest.mark.parametrize("model, llm_class", [("gpt4o-mini", GPT4OMini), ("gemini", Gemini)])
+def test_sweep_matches_cost_components(model, llm_class):
+    # At the components' own request rate, a grid point costs what the components report
+    fps = cost_calculation.requests_per_camera_per_second
+    row = sweep([3], [7], [fps], [1.0], models=[model]).iloc[0]
+    assert row["whatsapp_monthly"] == pytest.approx(WhatsAppCost(3, 7).get_avg_monthly_price())
+    assert row["website_monthly"] == pytest.approx(WebsiteCost(3, 7).get_avg_monthly_price())
+    assert row["llm_monthly"] == pytest.approx(llm_class(3, 7).get_avg_monthly_price())
+    assert row["cameras"] == 21
+    assert row["monthly_per_camera"] == pytest.approx(row["total_monthly"] / 21)
+
+
+def test_sweep_covers_the_grid():
+    df = sweep([1, 2], [5, 10], [1.0], [0.5, 1.0], models=["gpt4o-mini", "gemini"], low_resolution=(False, True))
+    assert len(df) == (2 * 2 * 1 * 2) * (2 * 2)  # Grid points x model/resolution pairs
+    half, full = (df[(df["model"] == "gemini") & (df["clients"] == 1) & (df["cameras_per_client"] == 5)
+                     & (df["gate_ratio"] == ratio) & ~df["low_resolution"]].iloc[0] for ratio in (0.5, 1.0))
+    assert half["llm_monthly"] == pytest.approx(full["llm_monthly"] / 2)
+
+
+def test_break_even_finds_the_smallest_profitable_client_count():
+    df = sweep(range(1, 51), [10], [0.01], [1.0], models=["gemini"])
+    per_camera = df.set_index("clients")["monthly_per_camera"]
+    price = per_camera.loc[20]  # Website cost is fixed, so the per-camera cost falls with the fleet
+    summary = break_even(df, price)
+    assert summary["break_even_clients"].iloc[0] == per_camera[per_camera <= price].index.min()
+    assert np.isnan(break_even(df, 0.0)["break_even_clients"].iloc[0])
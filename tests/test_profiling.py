@@ -0,0 +1,138 @@
+import base64
+import io
+import marshal
+import pstats
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments.models.dummy import main as dummy
+from deployments.profiling import _Capture, profiler
+
+TOKEN = "test-token"
+HEADERS = {"X-Admin-Token": TOKEN}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiler, "token", TOKEN)
+    with TestClient(dummy.app) as client:
+        yield client
+
+
+def infer_payload() -> dict:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32)).save(buffer, "JPEG")
+    return {"question": "Is anyone there?", "base64_image": base64.b64encode(buffer.getvalue()).decode()}
+
+
+def run_in_background(client, path, params):
+    """Start a profiling run on another thread and wait until it is active."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(response=client.post(path, params=params, headers=HEADERS)))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not profiler._running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiler._running
+    return thread, result
+
+
+def test_endpoints_hidden_without_token(monkeypatch):
+    monkeypatch.setattr(profiler, "token", None)
+    with TestClient(dummy.app) as client:
+        assert client.get("/admin/stacks", headers=HEADERS).status_code == 404
+        assert client.post("/admin/profile", headers=HEADERS).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+def test_rejects_missing_or_wrong_token(client, headers):
+    assert client.get("/admin/stacks", headers=headers).status_code == 403
+    assert client.post("/admin/profile", params={"seconds": 0.1}, headers=headers).status_code == 403
+
+
+def test_sample_returns_collapsed_stacks(client):
+    response = client.post("/admin/profile", params={"mode": "sample", "seconds": 0.2, "interval_ms": 5},
+                           headers=HEADERS)
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
+
+
+def test_cprofile_next_requests_returns_loadable_pstats(client, tmp_path):
+    thread, result = run_in_background(client, "/admin/profile", {"mode": "cprofile", "requests": 3, "seconds": 10})
+    payload = infer_payload()
+    for _ in range(3):
+        assert client.post("/infer", json=payload).status_code == 200
+    thread.join(timeout=10)
+
+    response = result["response"]
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(response.content)
+    stats = pstats.Stats(str(path))
+    assert any(function == "infer" for _, _, function in stats.stats)
+    assert marshal.loads(response.content) == stats.stats
+
+
+def test_cprofile_text_report(client):
+    thread, result = run_in_background(client, "/admin/profile",
+                                       {"mode": "cprofile", "requests": 1, "seconds": 10, "output": "text"})
+    client.post("/infer", json=infer_payload())
+    thread.join(timeout=10)
+    response = result["response"]
+    assert response.status_code == 200
+    assert response.text.startswith("1 requests profiled")
+    assert "function calls" in response.text
+
+
+def test_cprofile_without_requests_times_out(client):
+    response = client.post("/admin/profile", params={"mode": "cprofile", "seconds": 0.2}, headers=HEADERS)
+    assert response.status_code == 504
+
+
+def test_concurrent_run_conflicts(client):
+    thread, result = run_in_background(client, "/admin/profile", {"mode": "sample", "seconds": 0.5})
+    assert client.post("/admin/profile", params={"seconds": 0.1}, headers=HEADERS).status_code == 409
+    thread.join(timeout=10)
+    assert result["response"].status_code == 200
+
+
+@pytest.mark.parametrize("params", [
+    {"mode": "bogus"},
+    {"output": "bogus"},
+    {"seconds": 0},
+    {"interval_ms": 0},
+    {"interval_ms": -5},
+    {"mode": "cprofile", "requests": -1},
+])
+def test_rejects_invalid_parameters(client, params):
+    assert client.post("/admin/profile", params=params, headers=HEADERS).status_code == 400
+
+
+def test_stacks_lists_threads_and_tasks(client):
+    response = client.get("/admin/stacks", headers=HEADERS)
+    assert response.status_code == 200
+    assert "Thread MainThread" in response.text
+    assert "Stack for <Task" in response.text
+
+
+def test_inactive_profiler_is_a_shared_no_op():
+    assert profiler.request() is profiler.request()
+
+
+def test_batched_work_counts_each_request():
+    capture = _Capture(requests=4, deadline=time.monotonic() + 60)
+    with capture.request(3):
+        pass
+    assert capture.profiled_requests == 3 and not capture.done
+    with capture.request():
+        pass
+    assert capture.done
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+from deployments.prompt_templates import PromptTemplateRegistry, load_prompt_templates
+
+TEMPLATES = {
+    "alert": "You watch camera {camera}. Question: {question}",
+    "json_example": 'Answer like {"severity": "low"}. Question: {question}',
+    "escaped": 'Answer like {{"severity": "low"}}. Question: {question}',
+    "positional": "Question: {}",
+}
+
+
+@pytest.fixture
+def registry():
+    return PromptTemplateRegistry.from_mapping(TEMPLATES)
+
+
+def test_render(registry):
+    assert registry.render("alert", {"camera": "gate", "question": "anyone?"}) == "You watch camera gate. Question: anyone?"
+    assert registry.render("escaped", {"question": "q"}) == 'Answer like {"severity": "low"}. Question: q'
+
+
+def test_resolve_pops_prompt_or_template(registry):
+    request = {"prompt": "raw", "max_tokens": 5}
+    assert registry.resolve(request) == "raw"
+    assert request == {"max_tokens": 5}
+    request = {"template_id": "alert", "variables": {"camera": "c", "question": "q"}, "max_tokens": 5}
+    assert registry.resolve(request) == "You watch camera c. Question: q"
+    assert request == {"max_tokens": 5}
+
+
+@pytest.mark.parametrize("template_id, variables", [
+    ("alert", {"camera": "c"}),  # Missing variable
+    ("alert", ["c", "q"]),  # Not an object
+    ("json_example", {"question": "q"}),  # Unescaped literal braces
+    ("positional", {}),
+])
+def test_render_errors_are_value_errors(registry, template_id, variables):
+    with pytest.raises(ValueError):
+        registry.render(template_id, variables)
+
+
+def test_unknown_template_and_missing_prompt(registry):
+    with pytest.raises(KeyError):
+        registry.resolve({"template_id": "nope"})
+    with pytest.raises(ValueError):
+        registry.resolve({"image": "b64"})
+
+
+def test_load_prompt_templates_falls_back_to_default(tmp_path, monkeypatch):
+    default = tmp_path / "default.json"
+    default.write_text('{"shipped": "Question: {question}"}')
+    override = tmp_path / "override.json"
+    override.write_text('{"custom": "Q: {question}"}')
+    monkeypatch.delenv("PROMPT_TEMPLATES_PATH", raising=False)
+    assert "shipped" in load_prompt_templates(default=str(default))
+    assert "custom" in load_prompt_templates(str(override), default=str(default))
+    monkeypatch.setenv("PROMPT_TEMPLATES_PATH", str(override))
+    assert "custom" in load_prompt_templates(default=str(default))
+    monkeypatch.delenv("PROMPT_TEMPLATES_PATH")
+    assert "shipped" not in load_prompt_templates()
+
+
+def test_shipped_templates_render():
+    path = Path(__file__).parent.parent / "deployments/models/MiniCPM-Llama3-V-2_5-vllm/prompt_templates.json"
+    registry = PromptTemplateRegistry.from_file(str(path))
+    assert registry.render("security_alert", {"camera_name": "gate", "question": "q"}).endswith("Question: q")
@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+import torch
+from transformers import DynamicCache
+
+from deployments.sessions import ChatSession, SessionStore, cache_length, cache_nbytes, decode_with_cache
+
+VOCAB = 32
+TERMINATOR = 9
+
+
+class StubLLM:
+    """Greedy stand-in for the LLM: always predicts the last input token + 1 and appends to the KV cache."""
+
+    def __init__(self):
+        self.prefill_lengths = []
+
+    def __call__(self, input_ids=None, inputs_embeds=None, past_key_values=None, use_cache=True):
+        length = input_ids.shape[1] if input_ids is not None else inputs_embeds.shape[1]
+        self.prefill_lengths.append(length)
+        states = torch.zeros(1, 1, length, 2)
+        past_key_values.update(states, states, 0)
+        last = int(input_ids[0, -1]) if input_ids is not None else 0
+        logits = torch.zeros(1, length, VOCAB)
+        logits[0, -1, (last + 1) % VOCAB] = 1.0
+        return SimpleNamespace(logits=logits, past_key_values=past_key_values)
+
+
+def make_session(session_id: str, tokens: int = 4) -> ChatSession:
+    cache = DynamicCache()
+    states = torch.zeros(1, 1, tokens, 2)
+    cache.update(states, states, 0)
+    return ChatSession(session_id, cache, "text", [], cache_length(cache))
+
+
+def test_follow_up_turn_prefills_only_new_tokens():
+    llm = StubLLM()
+    tokens, cache = decode_with_cache(llm, None, [TERMINATOR], max_new_tokens=16, input_ids=torch.tensor([[5, 6]]))
+    assert tokens == [7, 8, 9]
+    # The prompt and every generated token, terminator included, are in the cache
+    assert cache_length(cache) == 5
+    session = ChatSession("cam", cache, "turn 1", [], cache_length(cache))
+
+    llm.prefill_lengths.clear()
+    tokens, cache = decode_with_cache(
+        llm, session.past_key_values, [TERMINATOR], max_new_tokens=16, input_ids=torch.tensor([[7]])
+    )
+    session.update(cache, "turn 2", cache_length(cache))
+    assert tokens == [8, 9]
+    assert llm.prefill_lengths[0] == 1  # Only the new user turn, not the conversation so far
+    assert session.num_tokens == 5 + 1 + 2
+    assert session.nbytes == cache_nbytes(cache) > 0
+
+
+def test_decode_stops_at_max_new_tokens():
+    tokens, _ = decode_with_cache(StubLLM(), None, [TERMINATOR], max_new_tokens=2, input_ids=torch.tensor([[1]]))
+    assert tokens == [2, 3]
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    store.put(make_session("a"))
+    store.put(make_session("b"))
+    assert store.get("a") is not None  # "b" is now the least recently used
+    store.put(make_session("c"))
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_store_evicts_over_memory_cap_but_keeps_the_new_session():
+    session_bytes = make_session("x").nbytes
+    store = SessionStore(max_sessions=10, max_bytes=int(2.5 * session_bytes))
+    for session_id in ("a", "b", "c"):
+        store.put(make_session(session_id))
+    assert store.get("a") is None
+    assert store.stats()["cache_bytes"] <= store.max_bytes
+    # A session larger than the cap on its own is still kept, alone
+    store.put(make_session("big", tokens=64))
+    assert store.get("big") is not None
+    assert store.stats()["sessions"] == 1
+
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(ttl_s=0.05)
+    store.put(make_session("a"))
+    assert store.get("a") is not None
+    time.sleep(0.1)
+    assert store.get("a") is None
+    assert store.stats()["sessions"] == 0
+
+
+def test_delete():
+    store = SessionStore()
+    store.put(make_session("a"))
+    assert store.delete("a")
+    assert not store.delete("a")
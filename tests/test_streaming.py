@@ -0,0 +1,75 @@
+import io
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments import streaming
+from deployments.streaming import pack_frame, unpack_frame, serve_frame_stream
+
+
+def jpeg_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def make_app(infer_batch) -> FastAPI:
+    app = FastAPI()
+
+    @app.websocket("/ws/infer")
+    async def ws_infer(websocket: WebSocket):
+        await serve_frame_stream(websocket, infer_batch)
+
+    return app
+
+
+def echo_questions(images, questions):
+    return [f"answer: {question}" for question in questions]
+
+
+def test_pack_and_unpack_round_trip():
+    assert unpack_frame(pack_frame(7, "who?", b"image")) == (7, "who?", b"image")
+    with pytest.raises(ValueError):
+        unpack_frame(pack_frame(7, "who?", b"image")[:-1])
+
+
+def test_stream_returns_one_result_per_frame():
+    with TestClient(make_app(echo_questions)) as client, client.websocket_connect("/ws/infer") as websocket:
+        for seq in range(3):
+            websocket.send_bytes(pack_frame(seq, f"q{seq}", jpeg_bytes()))
+        results = sorted((json.loads(websocket.receive_text()) for _ in range(3)), key=lambda result: result["seq"])
+    assert [result["prediction"] for result in results] == ["answer: q0", "answer: q1", "answer: q2"]
+
+
+def test_duplicate_sequence_numbers_keep_every_result():
+    frames = [(1, "first", jpeg_bytes()), (1, "second", jpeg_bytes()), (1, "bad", b"not an image")]
+    results = streaming._infer_frames(frames, echo_questions)
+    assert [result["prediction"] for result in results] == ["answer: first", "answer: second", None]
+    assert all(result["seq"] == 1 for result in results)
+    assert results[2]["error"]
+
+
+def test_text_and_malformed_frames_get_an_error_reply():
+    with TestClient(make_app(echo_questions)) as client, client.websocket_connect("/ws/infer") as websocket:
+        websocket.send_text("hello")
+        assert "binary frame" in json.loads(websocket.receive_text())["error"]
+        websocket.send_bytes(b"\x00\x01")
+        assert "header" in json.loads(websocket.receive_text())["error"]
+        # The stream is still usable afterwards
+        websocket.send_bytes(pack_frame(5, "q", jpeg_bytes()))
+        assert json.loads(websocket.receive_text())["seq"] == 5
+
+
+def test_worker_failure_closes_the_socket(monkeypatch):
+    def fail(frames, infer_batch):
+        raise RuntimeError("worker crashed")
+
+    monkeypatch.setattr(streaming, "_infer_frames", fail)
+    with TestClient(make_app(echo_questions)) as client, client.websocket_connect("/ws/infer") as websocket:
+        websocket.send_bytes(pack_frame(1, "q", jpeg_bytes()))
+        with pytest.raises(WebSocketDisconnect) as error:
+            websocket.receive_text()
+    assert error.value.code == 1011
@@ -0,0 +1,51 @@
+import logging
+import time
+
+from deployments.structured_logging import RateLimitFilter
+from deployments.utils import SuppressedCountFormatter
+
+
+def make_record(message="frame processed", level=logging.INFO, lineno=10):
+    return logging.LogRecord("test", level, "worker.py", lineno, message, (), None)
+
+
+def test_rate_limit_counts_suppressed_records():
+    log_filter = RateLimitFilter(rate=1000.0, burst=1)
+    assert log_filter.filter(make_record())
+    assert not log_filter.filter(make_record())
+    assert not log_filter.filter(make_record())
+    time.sleep(0.01)
+    record = make_record()
+    assert log_filter.filter(record)
+    assert record.suppressed == 2
+
+
+def test_rate_limit_passes_warnings():
+    log_filter = RateLimitFilter(rate=1000.0, burst=1)
+    assert all(log_filter.filter(make_record(level=logging.WARNING)) for _ in range(5))
+
+
+def test_color_format_shows_suppressed_count():
+    formatter = SuppressedCountFormatter("%(message)s", no_color=True)
+    record = make_record()
+    assert formatter.format(record) == "frame processed"
+    record.suppressed = 3
+    assert formatter.format(record) == "frame processed (3 similar suppressed)"
+
+
+def test_logger_defaults_to_info(monkeypatch):
+    from deployments.utils import Logger
+
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    shared = logging.getLogger("deployments.utils")
+    previous = shared.level
+    try:
+        # Logger is a singleton: re-run __init__ on a bare instance to read the level it picks
+        instance = Logger.__new__(Logger)
+        instance.__init__()
+        assert shared.level == logging.INFO
+        monkeypatch.setenv("LOG_LEVEL", "debug")
+        instance.__init__()
+        assert shared.level == logging.DEBUG
+    finally:
+        shared.setLevel(previous)
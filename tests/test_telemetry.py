@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from deployments.telemetry import TokenLog, calibrate, read_log, summarize
+
+
+def write_log(tmp_path, times, camera_ids):
+    log = TokenLog(str(tmp_path), "org/model")
+    for camera_id in camera_ids:
+        log.record(prompt_tokens=20, visual_tokens=64, output_tokens=10, prompt_chars=80, output_chars=40,
+                   camera_id=camera_id)
+    log.close()
+    records = read_log(log.path)
+    records["time"] = times
+    records.tofile(log.path)
+    return log.path
+
+
+def test_rate_counts_gaps_not_records(tmp_path):
+    # 11 requests one second apart span 10 s: 1 request/s
+    path = write_log(tmp_path, np.arange(11, dtype=np.float64), ["cam-a", "cam-b"] * 5 + ["cam-a"])
+    summary = summarize(read_log(path))
+    assert summary["requests"] == 11
+    assert summary["requests_per_second"] == pytest.approx(1.0)
+    assert summary["cameras"] == 2
+    assert summary["requests_per_camera_per_second"] == pytest.approx(0.5)
+    assert summary["output_tokens"]["mean"] == 10
+
+
+def test_single_record_has_no_rate(tmp_path):
+    path = write_log(tmp_path, np.array([5.0]), [None])
+    summary = summarize(read_log(path))
+    assert summary["requests_per_second"] is None and summary["cameras"] is None
+
+
+def test_calibrate_keys_by_model_and_ignores_partial_record(tmp_path):
+    path = write_log(tmp_path, np.arange(3, dtype=np.float64), ["cam"] * 3)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 5)
+    calibration = calibrate(str(tmp_path))
+    assert list(calibration) == ["org/model"]
+    assert calibration["org/model"]["requests"] == 3
@@ -0,0 +1,77 @@
+import base64
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from deployments.models.dummy import main as dummy
+from deployments.tracing import TRACE_HEADER, StageTimer, Tracer
+
+
+def test_buffer_keeps_the_most_recent_traces():
+    tracer = Tracer(buffer_size=2)
+    for trace_id in ["a", "b", "c"]:
+        with tracer.span(tracer.start_trace(trace_id), "ingress"):
+            pass
+    assert [trace["trace_id"] for trace in tracer.traces()] == ["c", "b"]
+    assert tracer.traces(trace_id="a") == []
+
+
+def test_sample_rate_zero_only_traces_caller_ids():
+    tracer = Tracer(sample_rate=0)
+    assert tracer.start_trace() is None
+    assert tracer.start_trace("caller").trace_id == "caller"
+
+
+def test_replica_spans_nest_in_the_ingress_span():
+    tracer = Tracer()
+    trace = tracer.start_trace()
+    with tracer.span(trace, "ingress") as ingress:
+        context = ingress.handoff()  # What the handle call carries to the replica
+        stages = StageTimer(batch_size=2)
+        with stages.stage("generate"):
+            pass
+        replica_spans = stages.spans_for(context, arrived_at=context.sent_at)
+    tracer.record(replica_spans)
+
+    spans = {span["name"]: span for span in tracer.traces(trace_id=trace.trace_id)[0]["spans"]}
+    assert set(spans) == {"ingress", "handle.transit", "batch.wait", "generate"}
+    assert spans["ingress"]["parent_id"] is None
+    for name in ["handle.transit", "batch.wait", "generate"]:
+        assert spans[name]["parent_id"] == spans["ingress"]["span_id"]
+        assert spans[name]["attributes"]["batch_size"] == 2
+    assert len({span["span_id"] for span in spans.values()}) == 4
+
+
+def test_untraced_requests_record_nothing():
+    tracer = Tracer()
+    with tracer.span(None, "ingress") as ingress:
+        assert ingress is None
+    assert tracer.traces() == []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(dummy, "tracer", Tracer())
+    monkeypatch.setattr(dummy, "response_cache", None)
+    with TestClient(dummy.app) as client:
+        yield client
+
+
+def test_traces_endpoint_on_dummy(client):
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG")
+    payload = {"question": "q", "base64_image": base64.b64encode(buffer.getvalue()).decode()}
+    response = client.post("/infer", json=payload, headers={TRACE_HEADER: "trace-1"})
+    assert response.headers[TRACE_HEADER] == "trace-1"
+
+    body = client.get("/traces", params={"trace_id": "trace-1"}).json()
+    trace, = body["traces"]
+    assert [span["name"] for span in trace["spans"]] == ["ingress", "infer"]
+    ingress, infer = trace["spans"]
+    assert infer["parent_id"] == ingress["span_id"]
+    assert ingress["attributes"] == {"route": "/infer"}
+    assert trace["duration_ms"] >= infer["duration_ms"]
+    assert set(body["stages"]) == {"ingress", "infer"}
+    assert client.get("/traces", params={"min_duration_ms": 60_000}).json()["traces"] == []
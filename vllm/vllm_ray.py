@@ -1,4 +1,5 @@
 import json
+import time
 from typing import AsyncGenerator
 
 from fastapi import BackgroundTasks, HTTPException
@@ -14,6 +15,9 @@ from PIL import Image
 import base64
 import io
 
+from deployments.prompt_templates import PromptTemplateRegistry
+from deployments.vllm_metrics import EngineMetrics
+
 
 @serve.deployment(ray_actor_options={"num_gpus": 1})
 class VLLMPredictDeployment:
@@ -50,13 +54,29 @@ class VLLMPredictDeployment:
             engine_use_ray: use Ray to start the LLM engine in a separate
                 process as the server process.
             disable_log_requests: disable logging requests.
+            enable_prefix_caching: reuse KV blocks of shared prompt prefixes, default False: only
+                enable it on vLLM versions whose prefix cache hashes image inputs.
+            prompt_templates: dict of template id to `str.format` template, registered at
+                startup. Put the fixed system prompt first so its KV blocks are shared.
         """
+        self.prompt_templates = PromptTemplateRegistry.from_mapping(kwargs.pop("prompt_templates", None) or {})
         kwargs["gpu_memory_utilization"] = kwargs.get("gpu_memory_utilization", 0.9)
         kwargs["trust_remote_code"] = True
+        kwargs["enable_prefix_caching"] = kwargs.get("enable_prefix_caching", False)
         args = AsyncEngineArgs(**kwargs)
         self.engine = AsyncLLMEngine.from_engine_args(args)
         self.model_name = kwargs.get('model', 'openbmb/MiniCPM-Llama3-V-2_5')
 
+        # Same TTFT, prompt token and prefix cache metrics as the MiniCPM vLLM deployment
+        self.engine_metrics = EngineMetrics()
+
+    def resolve_prompt(self, request_dict: dict) -> str:
+        """Return the raw `prompt`, or render `template_id` with `variables`."""
+        try:
+            return self.prompt_templates.resolve(request_dict)
+        except (KeyError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+
     async def stream_results(self, results_generator) -> AsyncGenerator[bytes, None]:
         num_returned = 0
         async for request_output in results_generator:
@@ -82,13 +102,14 @@ class VLLMPredictDeployment:
         """Generate completion for the request.
 
         The request should be a JSON object with the following fields:
-        - prompt: the prompt to use for the generation.
+        - prompt: the prompt to use for the generation, or
+        - template_id + variables: a registered prompt template and its values.
         - image: the image as a base64 encoded string.
         - stream: whether to stream the results or not.
         - other fields: the sampling parameters (See `SamplingParams` for details).
         """
         request_dict = await request.json()
-        prompt = request_dict.pop("prompt")
+        prompt = self.resolve_prompt(request_dict)
         image_base64 = request_dict.pop("image", None)
         stream = request_dict.pop("stream", False)
 
@@ -108,7 +129,12 @@ class VLLMPredictDeployment:
             }
         }
 
-        results_generator = self.engine.generate(inputs, sampling_params=sampling_params)
+        stats = {}
+        results_generator = self.engine_metrics.track_first_token(
+            self.engine.generate(inputs, sampling_params=sampling_params, request_id=request_id),
+            time.perf_counter(),
+            stats,
+        )
 
         if stream:
             background_tasks = BackgroundTasks()
@@ -129,7 +155,7 @@ class VLLMPredictDeployment:
 
         assert final_output is not None
         text_outputs = [output.text for output in final_output.outputs]
-        ret = {"text": text_outputs}
+        ret = {"text": text_outputs, **stats}
         return Response(content=json.dumps(ret))
 
 